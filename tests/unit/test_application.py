@@ -1,6 +1,10 @@
 # Copyright Vespa.ai. Licensed under the terms of the Apache 2.0 license. See LICENSE in the project root.
 
+import asyncio
+import io
 import json
+import os
+import tempfile
 import unittest
 
 import pytest
@@ -9,19 +13,33 @@ from unittest.mock import MagicMock, AsyncMock
 
 from requests.models import HTTPError, Response
 
-from vespa.package import ApplicationPackage, Schema, Document
+from vespa.package import ApplicationPackage, Schema, Document, Field
 from vespa.application import Vespa, raise_for_status
 from vespa.exceptions import VespaError
-from vespa.io import VespaQueryResponse, VespaResponse
+from vespa.io import FeedStats, VespaQueryResponse, VespaResponse, VespaVisitResponse
 import requests_mock
 from unittest.mock import Mock
 from requests import Request, Session
 import gzip
 from vespa.application import (
+    AdaptiveThrottler,
     CustomHTTPAdapter,
+    DeadLetterQueue,
+    Instrumentation,
+    JsonCodec,
+    OpenTelemetryInstrumentation,
+    QueryCache,
     VespaAsync,
+    VespaSync,
+    _DocumentRateLimiter,
+    _complete_operation,
+    _SelectionOperation,
+    _instrument_retry,
+    _operation_type,
 )
 import httpx
+from urllib3 import HTTPConnectionPool
+from tenacity import RetryError
 
 
 class TestVespaRequestsUsage(unittest.TestCase):
@@ -117,6 +135,307 @@ class TestVespaRequestsUsage(unittest.TestCase):
                 timeout="200s",
             )
 
+    def test_delete_where(self):
+        app = Vespa(url="http://localhost", port=8080)
+        reports = []
+        with requests_mock.Mocker() as m:
+            m.delete(
+                "http://localhost:8080/document/v1/foo/foo/docid/",
+                [
+                    {
+                        "status_code": 200,
+                        "json": {"documentCount": 3, "continuation": "c1"},
+                    },
+                    {"status_code": 200, "json": {"documentCount": 2}},
+                ],
+            )
+            summary = app.delete_where(
+                content_cluster_name="content",
+                selection="foo.year < 1990",
+                schema="foo",
+                progress=lambda s: reports.append(
+                    (s.documents, dict(s.slice_documents))
+                ),
+            )
+            first, second = m.request_history
+        self.assertEqual(first.qs["selection"], ["foo.year < 1990"])
+        self.assertEqual(first.qs["sliceid"], ["0"])
+        self.assertNotIn("continuation", first.qs)
+        self.assertEqual(second.qs["continuation"], ["c1"])
+        self.assertTrue(summary.succeeded)
+        self.assertEqual(summary.documents, 5)
+        self.assertEqual(summary.requests, 2)
+        self.assertEqual(summary.completed_slices, [0])
+        self.assertEqual(reports, [(3, {0: 3}), (5, {0: 5})])
+
+    def test_delete_where_reports_failed_slices(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with requests_mock.Mocker() as m, patch("vespa.application.sleep"):
+            m.delete(
+                "http://localhost:8080/document/v1/",
+                status_code=400,
+                json={"message": "Illegal selection"},
+            )
+            summary = app.delete_where(
+                content_cluster_name="content", selection="foo.bar ==", slices=2
+            )
+        # A bad request is not retried
+        self.assertEqual(m.call_count, 2)
+        self.assertFalse(summary.succeeded)
+        self.assertEqual(
+            summary.failed_slices, {0: "Illegal selection", 1: "Illegal selection"}
+        )
+
+    def test_delete_where_retries_transient_errors(self):
+        app = Vespa(url="http://localhost", port=8080)
+        responses = [
+            {"status_code": 200, "json": {"documentCount": 1, "continuation": "c"}}
+        ] * 10
+        responses[3] = {"status_code": 503, "json": {"message": "Busy"}}
+        responses[-1] = {"status_code": 200, "json": {"documentCount": 1}}
+        with requests_mock.Mocker() as m, patch("vespa.application.sleep"):
+            m.delete("http://localhost:8080/document/v1/foo/foo/docid/", responses)
+            summary = app.delete_all_docs(content_cluster_name="content", schema="foo")
+        self.assertTrue(summary.succeeded)
+        self.assertEqual(summary.documents, 9)
+        self.assertEqual(summary.requests, 10)
+
+    def test_delete_where_limits_documents_per_second(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with requests_mock.Mocker() as m, patch(
+            "vespa.application.sleep"
+        ) as mock_sleep:
+            m.delete(
+                "http://localhost:8080/document/v1/foo/foo/docid/",
+                [
+                    {
+                        "status_code": 200,
+                        "json": {"documentCount": 100, "continuation": "c"},
+                    },
+                    {"status_code": 200, "json": {"documentCount": 100}},
+                ],
+            )
+            app.delete_all_docs(
+                content_cluster_name="content",
+                schema="foo",
+                max_documents_per_second=50,
+            )
+        # Waits for the first 100 documents before sending the next request
+        (delay,), _ = mock_sleep.call_args
+        self.assertAlmostEqual(delay, 2.0, places=1)
+
+    def test_update_where(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with requests_mock.Mocker() as m:
+            m.put(
+                "http://localhost:8080/document/v1/foo/foo/docid/",
+                status_code=200,
+                json={"documentCount": 4},
+            )
+            summary = app.update_where(
+                content_cluster_name="content",
+                selection="foo.year == null",
+                fields={"year": 0},
+                schema="foo",
+                slices=2,
+                timeout="60s",
+            )
+            requests = sorted(m.request_history, key=lambda r: r.qs["sliceid"])
+        self.assertTrue(summary.succeeded)
+        self.assertEqual(summary.documents, 8)
+        self.assertEqual([r.qs["sliceid"] for r in requests], [["0"], ["1"]])
+        self.assertEqual(requests[0].qs["selection"], ["foo.year == null"])
+        self.assertEqual(requests[0].qs["timeout"], ["60s"])
+        self.assertEqual(requests[0].json(), {"fields": {"year": {"assign": 0}}})
+
+    def test_document_rate_limiter(self):
+        limiter = _DocumentRateLimiter(documents_per_second=100)
+        self.assertAlmostEqual(limiter.delay(50), 0.5, places=1)
+        # Charges accumulate across slices
+        self.assertAlmostEqual(limiter.delay(50), 1.0, places=1)
+        with self.assertRaises(ValueError):
+            _DocumentRateLimiter(documents_per_second=0)
+
+    def test_selection_operation_policy(self):
+        progress = MagicMock()
+        operation = _SelectionOperation(
+            "delete", "content", "true", 2, None, progress, {"timeout": "10s"}
+        )
+        first, second = operation.slices
+        self.assertEqual(
+            first.params,
+            {
+                "cluster": "content",
+                "selection": "true",
+                "slices": 2,
+                "sliceId": 0,
+                "timeout": "10s",
+            },
+        )
+        first.on_request()
+        self.assertEqual(first.on_result({"documentCount": 3, "continuation": "A"}), 0)
+        self.assertEqual(first.params["continuation"], "A")
+        # A transient error is retried, until three errors are more than one in ten requests
+        for _ in range(2):
+            first.on_request()
+            self.assertEqual(first.on_error(503, "Overloaded"), 1.0)
+        first.on_request()
+        self.assertIsNone(first.on_error(503, "Overloaded"))
+        # A non-transient error gives up at once
+        second.on_request()
+        self.assertIsNone(second.on_error(400, "Bad selection"))
+        summary = operation.summary
+        self.assertEqual(summary.documents, 3)
+        self.assertEqual(summary.requests, 5)
+        self.assertEqual(summary.failed_slices, {0: "Overloaded", 1: "Bad selection"})
+        progress.assert_called_once_with(summary)
+
+    def test_get_many(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with requests_mock.Mocker() as m:
+            for data_id in ["1", "2"]:
+                m.get(
+                    "http://localhost:8080/document/v1/foo/foo/docid/" + data_id,
+                    status_code=200,
+                    json={"id": "id:foo:foo::" + data_id, "fields": {"title": data_id}},
+                )
+            m.get(
+                "http://localhost:8080/document/v1/foo/foo/docid/3",
+                status_code=404,
+                json={"id": "id:foo:foo::3"},
+            )
+            m.get(
+                "http://localhost:8080/document/v1/foo/foo/docid/4",
+                status_code=500,
+                json={"message": "Internal error"},
+            )
+            responses = app.get_many(
+                ids=["2", "3", "1", "4"], schema="foo", fields=["title"], max_workers=4
+            )
+            self.assertEqual(
+                {tuple(r.qs["fieldset"]) for r in m.request_history}, {("foo:title",)}
+            )
+        self.assertEqual([r.status_code for r in responses], [200, 404, 200, 500])
+        self.assertEqual(responses[0].json["fields"], {"title": "2"})
+        self.assertEqual(responses[2].json["fields"], {"title": "1"})
+        self.assertEqual(responses[3].json["id"], "4")
+        self.assertEqual(responses[3].json["Exception"], "Internal error")
+
+    def test_get_many_uses_connection_pool(self):
+        with Vespa(url="http://localhost", port=8080) as app:
+            app.open_connection_pool(connections=4)
+            with requests_mock.Mocker() as m, patch(
+                "vespa.application.VespaSync"
+            ) as mock_sync:
+                m.get(
+                    "http://localhost:8080/document/v1/foo/foo/docid/1",
+                    status_code=200,
+                    json={"id": "id:foo:foo::1", "fields": {}},
+                )
+                responses = app.get_many(ids=["1"], schema="foo")
+                mock_sync.assert_not_called()
+        self.assertEqual([r.status_code for r in responses], [200])
+
+    def test_connection_pool(self):
+        with Vespa(url="http://localhost", port=8080) as app:
+            app.open_connection_pool(connections=4)
+            pool = app._sync_pool
+            self.assertIsNotNone(pool)
+            with requests_mock.Mocker() as m, patch(
+                "vespa.application.VespaSync"
+            ) as mock_sync:
+                m.post("http://localhost:8080/search/", status_code=200, text="{}")
+                m.get(
+                    "http://localhost:8080/document/v1/foo/foo/docid/0",
+                    status_code=200,
+                    text="{}",
+                )
+                app.query(query="this is a test")
+                app.get_data(schema="foo", data_id="0")
+                # Different compression setting than the pool does not use it
+                app.feed_data_point(
+                    schema="foo", data_id="0", fields={}, compress=False
+                )
+                mock_sync.assert_called_once()
+                self.assertEqual(m.call_count, 2)
+            # Opening again keeps the existing pool
+            app.open_connection_pool()
+            self.assertIs(app._sync_pool, pool)
+        self.assertIsNone(app._sync_pool)
+
+    def test_feed_iterable_stats(self):
+        app = Vespa(url="http://localhost", port=8080)
+        docs = [
+            {"id": "0", "fields": {"text": "short"}},
+            {"id": "1", "fields": {"text": "test_data" * 200}},
+            {"id": "2", "fields": {"text": "short"}},
+        ]
+        progress = MagicMock()
+        with requests_mock.Mocker() as m:
+            m.post(requests_mock.ANY, status_code=200, text="{}")
+            m.post(
+                "http://localhost:8080/document/v1/foo/foo/docid/2",
+                status_code=404,
+                text="{}",
+            )
+            stats = app.feed_iterable(
+                docs, schema="foo", progress=progress, progress_interval=60
+            )
+        self.assertIsInstance(stats, FeedStats)
+        self.assertEqual(stats.operations, 3)
+        self.assertEqual(stats.status_codes, {200: 2, 404: 1})
+        self.assertGreater(stats.bytes_raw, stats.bytes_sent)
+        self.assertGreaterEqual(stats.peak_in_flight, 1)
+        self.assertEqual(stats.in_flight, 0)
+        self.assertEqual(set(stats.latency_percentiles()), {"p50", "p95", "p99"})
+        # Only the final report, as the feed is shorter than the interval
+        progress.assert_called_once_with(stats)
+
+    def test_feed_iterable_encode_processes(self):
+        app = Vespa(url="http://localhost", port=8080)
+        docs = [
+            {"id": "0", "fields": {"text": "short"}},
+            {"id": "1", "fields": {"text": "test_data" * 200}},
+        ]
+        responses = []
+        with requests_mock.Mocker() as m:
+            m.post(requests_mock.ANY, status_code=200, text="{}")
+            app.feed_iterable(
+                docs,
+                schema="foo",
+                encode_processes=2,
+                callback=lambda response, id: responses.append(response),
+            )
+            requests = sorted(m.request_history, key=lambda r: r.url)
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        self.assertNotIn("Content-Encoding", requests[0].headers)
+        self.assertEqual(json.loads(requests[0].body), {"fields": docs[0]["fields"]})
+        self.assertEqual(requests[1].headers["Content-Encoding"], "gzip")
+        self.assertEqual(
+            json.loads(gzip.decompress(requests[1].body)), {"fields": docs[1]["fields"]}
+        )
+
+    def test_feed_iterable_encode_processes_matches_threads(self):
+        app = Vespa(url="http://localhost", port=8080)
+        docs = [
+            {"id": str(i), "fields": {"text": "test_data" * (i * 50), "n": i}}
+            for i in range(6)
+        ]
+
+        def sent(encode_processes):
+            with requests_mock.Mocker() as m:
+                m.post(requests_mock.ANY, status_code=200, text="{}")
+                stats = app.feed_iterable(
+                    docs, schema="foo", encode_processes=encode_processes
+                )
+                requests = {
+                    r.url: (r.headers.get("Content-Encoding"), r.body)
+                    for r in m.request_history
+                }
+            return requests, (stats.bytes_raw, stats.bytes_sent)
+
+        self.assertEqual(sent(2), sent(None))
+
     def test_visit(self):
         app = Vespa(url="http://localhost", port=8080)
         with requests_mock.Mocker() as m:
@@ -165,6 +484,208 @@ class TestVespaRequestsUsage(unittest.TestCase):
                 "&timeout=200s"
             ) in urls
 
+    @staticmethod
+    def _visit_response(pages=2):
+        # `pages` pages per slice, with the slice id and page in the document ids
+        def response(request, context):
+            slice_id = request.qs["sliceid"][0]
+            page = int(request.qs.get("continuation", ["0"])[0])
+            result = {
+                "documents": [
+                    {"id": "{}-{}".format(slice_id, page), "fields": {}},
+                ],
+                "documentCount": 1,
+            }
+            if page + 1 < pages:
+                result["continuation"] = str(page + 1)
+            return result
+
+        return response
+
+    def test_visit_slices_in_order(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with requests_mock.Mocker() as m:
+            m.get(
+                "http://localhost:8080/document/v1/foo/foo/docid/",
+                json=self._visit_response(),
+            )
+            results = [
+                [response.documents[0]["id"] for response in slice]
+                for slice in app.visit(
+                    schema="foo", content_cluster_name="content", slices=3
+                )
+            ]
+        self.assertEqual(results, [["0-0", "0-1"], ["1-0", "1-1"], ["2-0", "2-1"]])
+
+    def test_visit_documents(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with requests_mock.Mocker() as m:
+            m.get(
+                "http://localhost:8080/document/v1/foo/foo/docid/",
+                json=self._visit_response(pages=3),
+            )
+            documents = list(
+                app.visit_documents(
+                    schema="foo", content_cluster_name="content", slices=4
+                )
+            )
+        self.assertEqual(
+            sorted(document["id"] for document in documents),
+            sorted("{}-{}".format(s, p) for s in range(4) for p in range(3)),
+        )
+
+    def test_visit_checkpoint_resume(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_file = os.path.join(tmp_dir, "visit.checkpoint")
+            visit = {
+                "cluster": "content",
+                "schema": "foo",
+                "namespace": "foo",
+                "selection": "true",
+                "slices": 3,
+            }
+            with open(checkpoint_file, "w") as f:
+                json.dump({"visit": visit, "continuations": {"0": None, "1": "1"}}, f)
+            with requests_mock.Mocker() as m:
+                m.get(
+                    "http://localhost:8080/document/v1/foo/foo/docid/",
+                    json=self._visit_response(),
+                )
+                results = [
+                    [response.documents[0]["id"] for response in slice]
+                    for slice in app.visit(
+                        schema="foo",
+                        content_cluster_name="content",
+                        slices=3,
+                        checkpoint_file=checkpoint_file,
+                    )
+                ]
+                # Slice 0 is done, slice 1 resumes at its second page
+                self.assertEqual(results, [[], ["1-1"], ["2-0", "2-1"]])
+                self.assertEqual(m.call_count, 3)
+            with open(checkpoint_file) as f:
+                self.assertEqual(
+                    json.load(f),
+                    {
+                        "visit": visit,
+                        "continuations": {"0": None, "1": None, "2": None},
+                    },
+                )
+            # A completed visit is not visited again
+            with requests_mock.Mocker() as m:
+                documents = list(
+                    app.visit_documents(
+                        schema="foo",
+                        content_cluster_name="content",
+                        slices=3,
+                        checkpoint_file=checkpoint_file,
+                    )
+                )
+                self.assertEqual((documents, m.call_count), ([], 0))
+            # Another visit does not resume from the checkpoint
+            with self.assertRaises(ValueError):
+                list(
+                    app.visit_documents(
+                        schema="foo",
+                        content_cluster_name="content",
+                        slices=3,
+                        selection="foo.year > 2000",
+                        checkpoint_file=checkpoint_file,
+                    )
+                )
+
+    def test_export_documents(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+        app_package = ApplicationPackage(
+            name="foo",
+            schema=[
+                Schema(
+                    name="foo",
+                    document=Document(
+                        fields=[
+                            Field(name="title", type="string"),
+                            Field(name="year", type="int"),
+                        ]
+                    ),
+                )
+            ],
+        )
+        app = Vespa(url="http://localhost", port=8080, application_package=app_package)
+
+        def response(request, context):
+            slice_id = request.qs["sliceid"][0]
+            return {
+                "documents": [
+                    {"id": "id:foo:foo::{}".format(slice_id), "fields": {"year": 2000}}
+                ]
+            }
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "foo.parquet")
+            with requests_mock.Mocker() as m:
+                m.get("http://localhost:8080/document/v1/foo/foo/docid/", json=response)
+                rows = app.export_documents(
+                    path,
+                    content_cluster_name="content",
+                    schema="foo",
+                    fields=["year"],
+                    slices=2,
+                )
+                self.assertEqual(m.request_history[0].qs["fieldset"], ["foo:year"])
+            table = pq.read_table(path)
+        self.assertEqual(rows, 2)
+        self.assertEqual(table.schema.names, ["id", "year"])
+        self.assertEqual(str(table.schema.field("year").type), "int32")
+        self.assertEqual(
+            sorted(table.column("id").to_pylist()), ["id:foo:foo::0", "id:foo:foo::1"]
+        )
+
+    def test_visit_documents_prefetches_slices_concurrently(self):
+        import threading
+        import time
+
+        lock = threading.Lock()
+        state = {"in_flight": 0, "peak": 0, "fetched": 0}
+
+        def visit_slice(slice_id):
+            for page in range(10):
+                with lock:
+                    state["in_flight"] += 1
+                    state["peak"] = max(state["peak"], state["in_flight"])
+                time.sleep(0.01)
+                with lock:
+                    state["in_flight"] -= 1
+                    state["fetched"] += 1
+                yield VespaVisitResponse(
+                    json={"documents": [{"id": "{}-{}".format(slice_id, page)}]},
+                    status_code=200,
+                    url="n/a",
+                )
+
+        app = Vespa(url="http://localhost", port=8080)
+        with patch.object(VespaSync, "_visit_slices", return_value=visit_slice):
+            documents = app.visit_documents(
+                content_cluster_name="content", slices=3, read_ahead=1
+            )
+            self.assertEqual(len([next(documents) for _ in range(6)]), 6)
+            time.sleep(0.1)
+            # Bounded by the pages consumed and one page buffered and one fetched per slice
+            self.assertLessEqual(state["fetched"], 6 + 3 + 3)
+            documents.close()
+        self.assertGreater(state["peak"], 1)
+
+    def test_visit_documents_raises_error_of_slice(self):
+        app = Vespa(url="http://localhost", port=8080)
+        with requests_mock.Mocker() as m:
+            m.get("http://localhost:8080/document/v1/foo/foo/docid/", status_code=500)
+            with self.assertRaises(RetryError):
+                list(
+                    app.visit_documents(
+                        schema="foo", content_cluster_name="content", slices=2
+                    )
+                )
+
 
 class TestVespa(unittest.TestCase):
     def test_end_point(self):
@@ -524,7 +1045,7 @@ class TestFeedAsyncIterable(unittest.TestCase):
         callback = MagicMock()
 
         # Act
-        self.vespa.feed_async_iterable(
+        stats = self.vespa.feed_async_iterable(
             iter=iter_data,
             schema="test_schema",
             namespace="test_namespace",
@@ -543,6 +1064,7 @@ class TestFeedAsyncIterable(unittest.TestCase):
                     groupname=None,
                     data_id="doc1",
                     fields={"title": "Document 1"},
+                    stats=stats,
                 ),
                 unittest.mock.call(
                     schema="test_schema",
@@ -550,12 +1072,207 @@ class TestFeedAsyncIterable(unittest.TestCase):
                     groupname=None,
                     data_id="doc2",
                     fields={"title": "Document 2"},
+                    stats=stats,
                 ),
             ],
             any_order=True,
         )
         self.assertEqual(callback.call_count, 2)
 
+    def test_feed_async_iterable_bounds_in_flight(self):
+        import asyncio
+
+        state = {"in_flight": 0, "peak": 0}
+
+        async def feed_data_point(**kwargs):
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.001)
+            state["in_flight"] -= 1
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        callback = MagicMock()
+
+        self.vespa.feed_async_iterable(
+            iter=({"id": str(i), "fields": {}} for i in range(100)),
+            schema="test_schema",
+            callback=callback,
+            max_workers=5,
+        )
+
+        self.assertEqual(callback.call_count, 100)
+        self.assertEqual(state["peak"], 5)
+
+    def test_feed_async_iterable_same_document_in_order(self):
+        import asyncio
+
+        state = {"in_flight": set(), "peak": 0, "order": []}
+
+        async def operation(data_id, fields=None, **kwargs):
+            assert data_id not in state["in_flight"]
+            state["in_flight"].add(data_id)
+            state["peak"] = max(state["peak"], len(state["in_flight"]))
+            await asyncio.sleep(0.001)
+            state["in_flight"].remove(data_id)
+            state["order"].append((data_id, fields))
+            return VespaResponse(json={}, status_code=200, url="n/a", operation_type="")
+
+        self.mock_session.feed_data_point.side_effect = operation
+        self.mock_session.update_data.side_effect = operation
+        docs = []
+        for i in range(10):
+            docs.append({"id": "a", "fields": {"n": i}})
+            docs.append({"id": "a", "operation": "update", "fields": {"n": -i}})
+            docs.append({"id": str(i), "fields": {"n": i}})
+        callback = MagicMock()
+
+        self.vespa.feed_async_iterable(
+            iter=docs, schema="test_schema", callback=callback
+        )
+
+        self.assertEqual(callback.call_count, 30)
+        self.assertEqual(
+            [fields for id, fields in state["order"] if id == "a"],
+            [doc["fields"] for doc in docs if doc["id"] == "a"],
+        )
+        self.assertGreater(state["peak"], 1)
+
+    def test_feed_async_iterable_hot_document_does_not_stall(self):
+        import asyncio
+
+        completed = []
+
+        async def feed_data_point(data_id, **kwargs):
+            await asyncio.sleep(0.002)
+            completed.append(data_id)
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        docs = [{"id": "hot", "fields": {"n": i}} for i in range(20)]
+        docs += [{"id": str(i), "fields": {}} for i in range(8)]
+
+        self.vespa.feed_async_iterable(iter=docs, schema="test_schema", max_workers=4)
+
+        self.assertEqual(len(completed), 28)
+        # The other documents are fed while the operations on "hot" are still queued
+        self.assertEqual(completed[-1], "hot")
+        self.assertLess(
+            max(completed.index(str(i)) for i in range(8)),
+            len(completed) - 5,
+        )
+
+    def test_feed_async_iterable_without_order(self):
+        callback = MagicMock()
+
+        self.vespa.feed_async_iterable(
+            iter=[{"id": "a", "fields": {}} for _ in range(5)],
+            schema="test_schema",
+            callback=callback,
+            preserve_order=False,
+        )
+
+        self.assertEqual(self.mock_session.feed_data_point.call_count, 5)
+        self.assertEqual(callback.call_count, 5)
+
+    def test_feed_async_iterable_compress(self):
+        self.vespa.feed_async_iterable(
+            iter=[{"id": "doc1", "fields": {}}], schema="test_schema", compress=True
+        )
+        self.assertEqual(self.mock_asyncio.call_args.kwargs["compress"], True)
+
+    def test_feed_async_iterable_stats(self):
+        async def feed_data_point(**kwargs):
+            if kwargs["data_id"] == "2":
+                raise httpx.ConnectError("Connection refused")
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        progress = MagicMock()
+
+        stats = self.vespa.feed_async_iterable(
+            iter=[{"id": str(i), "fields": {}} for i in range(3)] + [{"fields": {}}],
+            schema="test_schema",
+            progress=progress,
+        )
+
+        self.assertEqual(stats.operations, 4)
+        self.assertEqual(stats.status_codes, {200: 2, 599: 1, 499: 1})
+        self.assertEqual(stats.in_flight, 0)
+        self.assertIs(self.mock_asyncio.call_args.kwargs["stats"], stats)
+        progress.assert_called_once_with(stats)
+
+    def test_feed_async_iterable_on_complete_error_releases_held_operations(self):
+        async def feed_data_point(**kwargs):
+            await asyncio.sleep(0.01)
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        def on_complete(doc, response):
+            if doc["fields"]["v"] == 1:
+                raise OSError("No space left on device")
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+
+        with self.assertRaises(OSError):
+            self.vespa._feed_async_iterable(
+                # The second operation on "1" is held back until the first completes
+                iter=[
+                    {"id": "1", "fields": {"v": 1}},
+                    {"id": "1", "fields": {"v": 2}},
+                    {"id": "2", "fields": {"v": 3}},
+                ],
+                schema="test_schema",
+                namespace="test_schema",
+                on_complete=on_complete,
+            )
+        sent = [
+            call.kwargs["fields"]["v"]
+            for call in self.mock_session.feed_data_point.call_args_list
+        ]
+        self.assertEqual(sorted(sent), [1, 2, 3])
+
+    def test_feed_async_iterable_dead_letter_file(self):
+        async def feed_data_point(**kwargs):
+            return VespaResponse(
+                json={"message": "Overloaded"} if kwargs["data_id"] == "1" else {},
+                status_code=503 if kwargs["data_id"] == "1" else 200,
+                url="n/a",
+                operation_type="feed",
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "dead-letter.jsonl")
+            self.vespa.feed_async_iterable(
+                iter=[{"id": str(i), "fields": {}} for i in range(3)],
+                schema="test_schema",
+                dead_letter=path,
+                redrive=True,
+                max_workers=64,
+            )
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+
+        self.assertEqual(self.mock_session.feed_data_point.call_count, 4)
+        self.assertEqual(
+            records,
+            [
+                {
+                    "operation": {"id": "1", "fields": {}},
+                    "status_code": 503,
+                    "error": {"message": "Overloaded"},
+                }
+            ],
+        )
+
     def test_feed_async_iterable_missing_id(self):
         # Arrange
         iter_data = [
@@ -609,48 +1326,1346 @@ class TestFeedAsyncIterable(unittest.TestCase):
         )
 
 
-class TestCustomHTTPAdapterCompression(unittest.TestCase):
+class TestFeedFile(unittest.TestCase):
+    operations = [
+        {"put": "id:ns:music::1", "fields": {"title": "one"}},
+        {
+            "update": "id:ns:music:g=group:2",
+            "fields": {"title": {"assign": "two"}},
+            "create": True,
+        },
+        {"remove": "id:ns:music::3", "condition": "music.title=='three'"},
+    ]
+
     def setUp(self):
-        """Set up the CustomHTTPAdapter for testing."""
-        self.adapter = CustomHTTPAdapter(compress="auto")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.app = Vespa(url="http://localhost", port=8080)
 
-    def test_compression_auto_with_large_body(self):
-        """Test auto compression with a large request body."""
-        request = Request(method="POST", url="http://test.com", data=b"test_data" * 300)
-        self.adapter.check_size = Mock(return_value=5000)  # Simulate large content
-        prepared_request = request.prepare()
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, lines, open_file=open):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open_file(path, "wb") as f:
+            for line in lines:
+                f.write(line.encode("utf-8") + b"\n")
+        return path
+
+    def _mock_document_api(self, m):
+        for method in ("POST", "PUT", "DELETE"):
+            m.register_uri(method, requests_mock.ANY, status_code=200, text="{}")
+
+    def test_feed_file_operations(self):
+        lines = [json.dumps(op) for op in self.operations]
+        path = self._write("feed.jsonl.gz", lines, open_file=gzip.open)
+        responses = []
+        with requests_mock.Mocker() as m:
+            self._mock_document_api(m)
+            self.app.feed_file(
+                path, callback=lambda response, id: responses.append((id, response))
+            )
+            requests = {r.method: r for r in m.request_history}
+        self.assertEqual(sorted(id for id, _ in responses), ["1", "2", "3"])
+        self.assertEqual(requests["POST"].path, "/document/v1/ns/music/docid/1")
+        self.assertEqual(requests["POST"].json(), {"fields": {"title": "one"}})
+        self.assertEqual(requests["PUT"].path, "/document/v1/ns/music/group/group/2")
+        self.assertEqual(requests["PUT"].qs["create"], ["true"])
+        self.assertEqual(
+            requests["PUT"].json(), {"fields": {"title": {"assign": "two"}}}
+        )
+        self.assertEqual(requests["DELETE"].path, "/document/v1/ns/music/docid/3")
+        self.assertEqual(requests["DELETE"].qs["condition"], ["music.title=='three'"])
 
-        self.adapter._maybe_compress_request(prepared_request)
-        self.assertIn("Content-Encoding", prepared_request.headers)
-        self.assertEqual(prepared_request.headers["Content-Encoding"], "gzip")
+    def test_feed_file_numeric_group(self):
+        path = self._write(
+            "feed.jsonl",
+            [
+                json.dumps({"put": "id:ns:music:n=42:1", "fields": {"title": "one"}}),
+                json.dumps({"put": "id:ns:music:n=x:2", "fields": {"title": "two"}}),
+            ],
+        )
+        responses = []
+        with requests_mock.Mocker() as m:
+            self._mock_document_api(m)
+            self.app.feed_file(
+                path, callback=lambda response, id: responses.append((id, response))
+            )
+            self.assertEqual(
+                [r.path for r in m.request_history],
+                ["/document/v1/ns/music/number/42/1"],
+            )
+        statuses = sorted((r.status_code, id) for id, r in responses)
+        self.assertEqual(statuses, [(200, "1"), (499, None)])
+
+    def test_feed_file_rejects_schema(self):
+        path = self._write("feed.jsonl", [json.dumps(self.operations[0])])
+        for key in ("schema", "namespace"):
+            with self.assertRaisesRegex(ValueError, "document id"):
+                self.app.feed_file(path, **{key: "music"})
+
+    def test_feed_file_zstd(self):
+        zstandard = pytest.importorskip("zstandard")
+        content = "\n".join(json.dumps(op) for op in self.operations).encode("utf-8")
+        path = os.path.join(self.tmp_dir.name, "feed.jsonl.zst")
+        with open(path, "wb") as f:
+            f.write(zstandard.ZstdCompressor().compress(content))
+        with requests_mock.Mocker() as m:
+            self._mock_document_api(m)
+            self.app.feed_file(path)
+            self.assertEqual(m.call_count, 3)
 
-    def test_no_compression_auto_with_small_body(self):
-        """Test no compression with a small request body."""
-        request = Request(method="POST", url="http://test.com", data=b"test_data")
-        self.adapter.check_size = Mock(return_value=10)  # Simulate small content
-        prepared_request = request.prepare()
+    def test_feed_file_invalid_line(self):
+        path = self._write("feed.jsonl", ["{not json", json.dumps(self.operations[0])])
+        responses = []
+        with requests_mock.Mocker() as m:
+            self._mock_document_api(m)
+            self.app.feed_file(
+                path, callback=lambda response, id: responses.append((id, response))
+            )
+        statuses = sorted((r.status_code, id) for id, r in responses)
+        self.assertEqual(statuses, [(200, "1"), (499, None)])
 
-        self.adapter._maybe_compress_request(prepared_request)
-        self.assertNotIn("Content-Encoding", prepared_request.headers)
+    def test_feed_file_dead_letter(self):
+        path = self._write("feed.jsonl", [json.dumps(op) for op in self.operations])
+        dead_letter = DeadLetterQueue()
+        with requests_mock.Mocker() as m:
+            self._mock_document_api(m)
+            m.register_uri("DELETE", requests_mock.ANY, status_code=412, text="{}")
+            self.app.feed_file(path, dead_letter=dead_letter)
+        (record,) = list(dead_letter)
+        self.assertEqual(record["status_code"], 412)
+        self.assertEqual(record["operation"]["id"], "3")
+        self.assertEqual(record["operation"]["operation"], "delete")
+
+    def test_feed_file_checkpoint_resume(self):
+        lines = [json.dumps(op) for op in self.operations]
+        path = self._write("feed.jsonl", lines)
+        checkpoint_file = os.path.join(self.tmp_dir.name, "feed.checkpoint")
+        with open(checkpoint_file, "w") as f:
+            json.dump({"path": os.path.abspath(path), "offset": len(lines[0]) + 1}, f)
+        with requests_mock.Mocker() as m:
+            self._mock_document_api(m)
+            self.app.feed_file(path, checkpoint_file=checkpoint_file)
+            methods = sorted(r.method for r in m.request_history)
+        self.assertEqual(methods, ["DELETE", "PUT"])
+        with open(checkpoint_file) as f:
+            self.assertEqual(json.load(f)["offset"], os.path.getsize(path))
+        # A completed feed is not fed again
+        with requests_mock.Mocker() as m:
+            self._mock_document_api(m)
+            self.app.feed_file(path, checkpoint_file=checkpoint_file)
+            self.assertEqual(m.call_count, 0)
+
+    def test_feed_file_checkpoint_other_file(self):
+        path = self._write("feed.jsonl", [])
+        checkpoint_file = os.path.join(self.tmp_dir.name, "feed.checkpoint")
+        with open(checkpoint_file, "w") as f:
+            json.dump({"path": "/some/other/file.jsonl", "offset": 10}, f)
+        with self.assertRaises(ValueError):
+            self.app.feed_file(path, checkpoint_file=checkpoint_file)
+
+    def test_feed_file_async(self):
+        received = []
+
+        def handler(request):
+            received.append((request.method, request.url.path))
+            return httpx.Response(200, json={})
+
+        path = self._write("feed.jsonl", [json.dumps(op) for op in self.operations])
+        original_asyncio = self.app.asyncio
+        with patch.object(
+            self.app,
+            "asyncio",
+            side_effect=lambda **kwargs: original_asyncio(
+                transport=httpx.MockTransport(handler), **kwargs
+            ),
+        ):
+            self.app.feed_file(path, use_async=True)
+        self.assertEqual(
+            sorted(received),
+            [
+                ("DELETE", "/document/v1/ns/music/docid/3"),
+                ("POST", "/document/v1/ns/music/docid/1"),
+                ("PUT", "/document/v1/ns/music/group/group/2"),
+            ],
+        )
 
-    def test_force_compression(self):
-        """Test forced compression when compress=True."""
-        self.adapter = CustomHTTPAdapter(compress=True)
-        request = Request(method="POST", url="http://test.com", data=b"test_data")
-        prepared_request = request.prepare()
 
-        self.adapter._maybe_compress_request(prepared_request)
-        self.assertIn("Content-Encoding", prepared_request.headers)
-        self.assertEqual(prepared_request.headers["Content-Encoding"], "gzip")
+class TestFeedIterable(unittest.TestCase):
+    def setUp(self):
+        self.mock_session = MagicMock()
+        self.mock_sync_patcher = patch("vespa.application.VespaSync")
+        self.mock_sync = self.mock_sync_patcher.start()
+        self.mock_sync.return_value.__enter__.return_value = self.mock_session
 
-    def test_disable_compression(self):
-        """Test no compression when compress=False."""
-        self.adapter = CustomHTTPAdapter(compress=False)
-        request = Request(method="POST", url="http://test.com", data=b"test_data")
-        prepared_request = request.prepare()
+        self.vespa = Vespa(url="http://localhost", port=8080)
 
-        self.adapter._maybe_compress_request(prepared_request)
-        self.assertNotIn("Content-Encoding", prepared_request.headers)
+    def tearDown(self):
+        self.mock_sync_patcher.stop()
+
+    def test_feed_iterable_happy_path(self):
+        iter_data = [
+            {"id": f"doc{i}", "fields": {"title": f"Document {i}"}} for i in range(50)
+        ]
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=iter_data,
+            schema="test_schema",
+            namespace="test_namespace",
+            callback=callback,
+            max_queue_size=4,
+            max_workers=4,
+        )
+
+        self.assertEqual(self.mock_session.feed_data_point.call_count, 50)
+        self.assertEqual(callback.call_count, 50)
+        self.assertEqual(
+            sorted(call.args[1] for call in callback.call_args_list),
+            sorted(doc["id"] for doc in iter_data),
+        )
+
+    def test_feed_iterable_bounds_in_flight(self):
+        import threading
+        import time
+
+        lock = threading.Lock()
+        state = {"in_flight": 0, "peak": 0}
+
+        def feed_data_point(**kwargs):
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.005)
+            with lock:
+                state["in_flight"] -= 1
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=({"id": str(i), "fields": {}} for i in range(40)),
+            schema="test_schema",
+            callback=callback,
+            max_queue_size=3,
+            max_workers=8,
+        )
+
+        self.assertEqual(callback.call_count, 40)
+        self.assertLessEqual(state["peak"], 3)
+
+    def test_feed_iterable_adaptive_concurrency(self):
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=({"id": str(i), "fields": {}} for i in range(20)),
+            schema="test_schema",
+            callback=callback,
+            adaptive_concurrency=True,
+        )
+
+        self.assertEqual(callback.call_count, 20)
+        throttler = self.mock_sync.call_args.kwargs["throttler"]
+        self.assertIsInstance(throttler, AdaptiveThrottler)
+        self.assertEqual(throttler.max_concurrency, 8)
+
+    def test_feed_iterable_missing_id(self):
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=[{"fields": {"title": "Document 1"}}],
+            schema="test_schema",
+            callback=callback,
+        )
+
+        self.mock_session.feed_data_point.assert_not_called()
+        callback.assert_called_once_with(unittest.mock.ANY, None)
+        self.assertEqual(callback.call_args[0][0].status_code, 499)
+
+    def test_feed_iterable_exception_is_reported(self):
+        self.mock_session.feed_data_point.side_effect = ConnectionError("boom")
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=[{"id": "doc1", "fields": {}}],
+            schema="test_schema",
+            callback=callback,
+        )
+
+        callback.assert_called_once_with(unittest.mock.ANY, "doc1")
+        self.assertEqual(callback.call_args[0][0].status_code, 599)
+
+    def test_feed_iterable_handler_error_is_raised(self):
+        class StopFeed(BaseException):
+            pass
+
+        callback = MagicMock(side_effect=StopFeed())
+
+        with self.assertRaises(StopFeed):
+            self.vespa.feed_iterable(
+                iter=({"id": str(i), "fields": {}} for i in range(1000)),
+                schema="test_schema",
+                callback=callback,
+                max_queue_size=4,
+            )
+        # The feed stops reading once the handler failed
+        self.assertLess(self.mock_session.feed_data_point.call_count, 1000)
+
+    def test_complete_operation(self):
+        response = Response()
+        response.status_code = 413
+        error = VespaError("Request too large")
+        error.__cause__ = HTTPError(response=response)
+        callback = MagicMock(side_effect=ValueError("callback bug"))
+        on_complete = MagicMock()
+
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            _complete_operation(
+                {"id": "1", "operation": "update"}, error, "feed", callback, on_complete
+            )
+        reported = callback.call_args.args[0]
+        self.assertEqual(reported.status_code, 413)
+        self.assertEqual(reported.operation_type, "update")
+        self.assertEqual(reported.json["Exception"], "Request too large")
+        self.assertIn("Exception in user callback for id 1", stderr.getvalue())
+        # on_complete is called after a failing callback, and its errors propagate
+        on_complete.assert_called_once_with(
+            {"id": "1", "operation": "update"}, reported
+        )
+        on_complete.side_effect = OSError("disk full")
+        with self.assertRaises(OSError):
+            _complete_operation({"id": "1"}, reported, "feed", None, on_complete)
+
+    def test_feed_iterable_on_complete_error_releases_held_operations(self):
+        import time
+
+        def feed_data_point(**kwargs):
+            time.sleep(0.01)
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        def on_complete(doc, response):
+            if doc["fields"]["v"] == 1:
+                raise OSError("No space left on device")
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+
+        with self.assertRaises(OSError):
+            self.vespa._feed_iterable(
+                # The second operation on "1" is held back until the first completes
+                iter=[
+                    {"id": "1", "fields": {"v": 1}},
+                    {"id": "1", "fields": {"v": 2}},
+                    {"id": "2", "fields": {"v": 3}},
+                ],
+                schema="test_schema",
+                namespace="test_schema",
+                on_complete=on_complete,
+            )
+        self.assertEqual(
+            sorted(
+                call.kwargs["fields"]["v"]
+                for call in self.mock_session.feed_data_point.call_args_list
+            ),
+            [1, 2, 3],
+        )
+
+    def test_feed_iterable_operation_abort_is_raised(self):
+        class StopFeed(BaseException):
+            pass
+
+        self.mock_session.feed_data_point.side_effect = StopFeed()
+
+        with self.assertRaises(StopFeed):
+            self.vespa.feed_iterable(
+                iter=[{"id": "1", "fields": {}}, {"id": "1", "fields": {}}],
+                schema="test_schema",
+            )
+        self.assertEqual(self.mock_session.feed_data_point.call_count, 2)
+
+    def test_feed_iterable_source_error_reports_read_operations(self):
+        import time
+
+        def feed_data_point(**kwargs):
+            time.sleep(0.01)
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        def source():
+            yield {"id": "1", "fields": {"v": 1}}
+            # Held back until the first operation on "1" completes
+            yield {"id": "1", "fields": {"v": 2}}
+            yield {"id": "2", "fields": {}}
+            raise ValueError("bad input")
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        callback = MagicMock()
+
+        with self.assertRaises(ValueError):
+            self.vespa.feed_iterable(
+                iter=source(), schema="test_schema", callback=callback
+            )
+        self.assertEqual(
+            sorted(call.args[1] for call in callback.call_args_list), ["1", "1", "2"]
+        )
+        self.assertEqual(
+            [call.args[0].status_code for call in callback.call_args_list],
+            [200, 200, 200],
+        )
+
+    def test_feed_iterable_mixed_operations(self):
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=[
+                {"id": "1", "fields": {"title": "one"}},
+                {
+                    "id": "2",
+                    "operation": "update",
+                    "fields": {"title": "two"},
+                    "create": True,
+                    "condition": "test_schema.title=='one'",
+                },
+                {"id": "3", "operation": "delete", "schema": "other_schema"},
+                {"id": "4", "operation": "visit", "fields": {}},
+            ],
+            schema="test_schema",
+            callback=callback,
+        )
+
+        self.mock_session.feed_data_point.assert_called_once()
+        update_kwargs = self.mock_session.update_data.call_args.kwargs
+        self.assertEqual(update_kwargs["create"], True)
+        self.assertEqual(update_kwargs["condition"], "test_schema.title=='one'")
+        delete_kwargs = self.mock_session.delete_data.call_args.kwargs
+        self.assertEqual(delete_kwargs["schema"], "other_schema")
+        self.assertEqual(delete_kwargs["namespace"], "test_schema")
+        statuses = {c.args[1]: c.args[0] for c in callback.call_args_list}
+        self.assertEqual(statuses["4"].status_code, 499)
+
+    def test_feed_iterable_mixed_operations_update_arguments(self):
+        self.vespa.feed_iterable(
+            iter=[
+                {"id": "1", "fields": {"title": "one"}},
+                {"id": "2", "operation": "update", "fields": {"title": "two"}},
+                {"id": "3", "operation": "delete"},
+            ],
+            schema="test_schema",
+            create=True,
+            auto_assign=False,
+            timeout="10s",
+        )
+
+        feed_kwargs = self.mock_session.feed_data_point.call_args.kwargs
+        delete_kwargs = self.mock_session.delete_data.call_args.kwargs
+        update_kwargs = self.mock_session.update_data.call_args.kwargs
+        for kwargs in (feed_kwargs, delete_kwargs):
+            self.assertNotIn("create", kwargs)
+            self.assertNotIn("auto_assign", kwargs)
+            self.assertEqual(kwargs["timeout"], "10s")
+        self.assertEqual(update_kwargs["create"], True)
+        self.assertEqual(update_kwargs["auto_assign"], False)
+        self.assertEqual(update_kwargs["timeout"], "10s")
+
+    def test_feed_iterable_without_order(self):
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=[{"id": "a", "fields": {}} for _ in range(5)],
+            schema="test_schema",
+            callback=callback,
+            preserve_order=False,
+        )
+
+        self.assertEqual(self.mock_session.feed_data_point.call_count, 5)
+        self.assertEqual(callback.call_count, 5)
+
+    def test_feed_iterable_dead_letter(self):
+        def feed_data_point(**kwargs):
+            if kwargs["data_id"] == "bad":
+                response = Response()
+                response.status_code = 400
+                raise VespaError("Bad request") from HTTPError(response=response)
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        dead_letter = DeadLetterQueue()
+        callback = MagicMock()
+
+        self.vespa.feed_iterable(
+            iter=[{"id": "good", "fields": {}}, {"id": "bad", "fields": {"a": 1}}],
+            schema="test_schema",
+            callback=callback,
+            dead_letter=dead_letter,
+            redrive=True,
+        )
+
+        # 400 is not transient, so it is dead-lettered without a re-drive
+        self.assertEqual(self.mock_session.feed_data_point.call_count, 2)
+        self.assertEqual(callback.call_count, 2)
+        (record,) = list(dead_letter)
+        self.assertEqual(record["operation"], {"id": "bad", "fields": {"a": 1}})
+        self.assertEqual(record["status_code"], 400)
+        self.assertEqual(record["error"]["Exception"], "Bad request")
+
+    def test_feed_iterable_redrive(self):
+        attempts = {}
+
+        def feed_data_point(**kwargs):
+            data_id = kwargs["data_id"]
+            attempts[data_id] = attempts.get(data_id, 0) + 1
+            if data_id == "down" or (data_id == "flaky" and attempts[data_id] == 1):
+                raise ConnectionError("Connection reset")
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        dead_letter = DeadLetterQueue()
+
+        stats = self.vespa.feed_iterable(
+            iter=[{"id": id, "fields": {}} for id in ["ok", "flaky", "down"]],
+            schema="test_schema",
+            dead_letter=dead_letter,
+            redrive=True,
+            max_workers=8,
+        )
+
+        self.assertEqual(attempts, {"ok": 1, "flaky": 2, "down": 2})
+        self.assertEqual(dead_letter.operations(), [{"id": "down", "fields": {}}])
+        self.assertEqual(stats.operations, 5)
+        self.assertEqual(stats.status_codes, {200: 2, 599: 3})
+
+    def test_feed_iterable_redrive_superseded(self):
+        sent = []
+
+        def feed_data_point(**kwargs):
+            v = kwargs["fields"]["v"]
+            sent.append((kwargs["data_id"], v))
+            # a=1 always fails, b=3 and b=4 fail on the first attempt
+            if v == 1 or (v in (3, 4) and sent.count(("b", v)) == 1):
+                raise ConnectionError("Connection reset")
+            return VespaResponse(
+                json={}, status_code=200, url="n/a", operation_type="feed"
+            )
+
+        self.mock_session.feed_data_point.side_effect = feed_data_point
+        dead_letter = DeadLetterQueue()
+        progress = MagicMock()
+
+        stats = self.vespa.feed_iterable(
+            iter=[
+                {"id": "a", "fields": {"v": 1}},
+                {"id": "a", "fields": {"v": 2}},
+                {"id": "b", "fields": {"v": 3}},
+                {"id": "b", "fields": {"v": 4}},
+            ],
+            schema="test_schema",
+            dead_letter=dead_letter,
+            redrive=True,
+            progress=progress,
+            progress_interval=60,
+        )
+
+        # The failed a=1 is superseded by a=2, so it is dead-lettered instead of being
+        # re-driven after it, while b=3 and b=4 both failed and are re-driven in order
+        self.assertEqual([v for id, v in sent if id == "a"], [1, 2])
+        self.assertEqual([v for id, v in sent if id == "b"], [3, 4, 3, 4])
+        self.assertEqual(dead_letter.operations(), [{"id": "a", "fields": {"v": 1}}])
+        self.assertEqual(stats.operations, 6)
+        self.assertEqual(stats.status_codes, {200: 3, 599: 3})
+        progress.assert_called_once_with(stats)
+
+    def test_feed_iterable_same_document_in_order(self):
+        import threading
+        import time
+
+        lock = threading.Lock()
+        state = {"in_flight": set(), "peak": 0, "order": []}
+
+        def operation(data_id, fields=None, **kwargs):
+            with lock:
+                self.assertNotIn(data_id, state["in_flight"])
+                state["in_flight"].add(data_id)
+                state["peak"] = max(state["peak"], len(state["in_flight"]))
+            time.sleep(0.002)
+            with lock:
+                state["in_flight"].remove(data_id)
+                state["order"].append((data_id, fields))
+            return VespaResponse(json={}, status_code=200, url="n/a", operation_type="")
+
+        self.mock_session.feed_data_point.side_effect = operation
+        self.mock_session.update_data.side_effect = operation
+        self.mock_session.delete_data.side_effect = operation
+        docs = []
+        for i in range(10):
+            docs.append({"id": "a", "fields": {"n": i}})
+            docs.append({"id": "a", "operation": "update", "fields": {"n": -i}})
+            docs.append({"id": str(i), "fields": {"n": i}})
+
+        self.vespa.feed_iterable(iter=docs, schema="test_schema", max_workers=8)
+
+        self.assertEqual(
+            [fields for id, fields in state["order"] if id == "a"],
+            [doc["fields"] for doc in docs if doc["id"] == "a"],
+        )
+        self.assertEqual(len(state["order"]), 30)
+        self.assertGreater(state["peak"], 1)
+
+
+class TestQueryMany(unittest.TestCase):
+    def setUp(self):
+        self.app = Vespa(url="http://localhost", port=8080)
+
+    @staticmethod
+    def _search_response(request, context):
+        body = request.json()
+        if body["query"] == "fail":
+            context.status_code = 400
+            return {"root": {"errors": [{"code": 3, "message": "bad query"}]}}
+        context.status_code = 200
+        return {"root": {"children": [{"id": body["query"]}]}}
+
+    def test_query_many_ordered(self):
+        bodies = ({"query": str(i)} for i in range(20))
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:8080/search/", json=self._search_response)
+            with self.app.syncio() as sync_app:
+                responses = list(sync_app.query_many(bodies, max_workers=4))
+        self.assertEqual(
+            [r.hits[0]["id"] for r in responses], [str(i) for i in range(20)]
+        )
+        self.assertEqual(responses[3].request_body, {"query": "3"})
+
+    def test_query_many_captures_errors(self):
+        bodies = [{"query": "1"}, {"query": "fail"}, {"query": "2"}]
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:8080/search/", json=self._search_response)
+            with self.app.syncio() as sync_app:
+                responses = list(sync_app.query_many(bodies, ordered=False))
+        self.assertEqual(len(responses), 3)
+        failed = [r for r in responses if r.status_code == 599]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(failed[0].request_body, {"query": "fail"})
+
+    def test_query_many_does_not_modify_cached_responses(self):
+        app = Vespa(url="http://localhost", port=8080, query_cache=QueryCache())
+        first, second = {"query": "1"}, {"query": "1"}
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:8080/search/", json=self._search_response)
+            with app.syncio() as sync_app:
+                responses = list(sync_app.query_many([first, second], max_workers=1))
+                cached = sync_app.query(body={"query": "1"})
+        self.assertEqual(m.call_count, 1)
+        self.assertIs(responses[0].request_body, first)
+        self.assertIs(responses[1].request_body, second)
+        self.assertIsNone(cached.request_body)
+
+
+class TestAsyncQueryMany(unittest.IsolatedAsyncioTestCase):
+    async def test_query_many_bounded_and_ordered(self):
+        state = {"in_flight": 0, "peak": 0}
+
+        async def handler(request):
+            import asyncio
+
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            body = json.loads(request.content)
+            await asyncio.sleep(0.001 * (int(body["query"]) % 3))
+            state["in_flight"] -= 1
+            return httpx.Response(
+                200, json={"root": {"children": [{"id": body["query"]}]}}
+            )
+
+        app = Vespa(url="http://localhost", port=8080)
+        bodies = ({"query": str(i)} for i in range(30))
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            responses = [r async for r in async_app.query_many(bodies, max_workers=5)]
+        self.assertEqual(
+            [r.hits[0]["id"] for r in responses], [str(i) for i in range(30)]
+        )
+        self.assertLessEqual(state["peak"], 5)
+
+    async def test_query_many_unordered_captures_errors(self):
+        def handler(request):
+            body = json.loads(request.content)
+            if body["query"] == "fail":
+                raise httpx.ConnectError("connection refused")
+            return httpx.Response(200, json={"root": {}})
+
+        app = Vespa(url="http://localhost", port=8080)
+        bodies = [{"query": "1"}, {"query": "fail"}]
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            with patch("asyncio.sleep", new=AsyncMock()):
+                responses = [
+                    r async for r in async_app.query_many(bodies, ordered=False)
+                ]
+        self.assertEqual(
+            sorted(r.status_code for r in responses),
+            [200, 599],
+        )
+
+
+class TestAsyncFeed(unittest.IsolatedAsyncioTestCase):
+    async def test_feed_async_generator_with_backpressure(self):
+        state = {"produced": 0, "completed": 0, "ahead": 0}
+
+        async def handler(request):
+            await asyncio.sleep(0.001)
+            state["completed"] += 1
+            return httpx.Response(200, json={"id": request.url.path})
+
+        async def documents():
+            for i in range(30):
+                state["produced"] += 1
+                state["ahead"] = max(
+                    state["ahead"], state["produced"] - state["completed"]
+                )
+                yield {"id": str(i), "fields": {"title": str(i)}}
+
+        app = Vespa(url="http://localhost", port=8080)
+        callback = MagicMock()
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            stats = await async_app.feed(
+                documents(), schema="foo", callback=callback, max_queue_size=4
+            )
+            self.assertIsNone(async_app.stats)
+        self.assertEqual(callback.call_count, 30)
+        self.assertEqual(stats.status_codes, {200: 30})
+        self.assertEqual(stats.requests, 30)
+        # At most max_queue_size pending operations and the one being read
+        self.assertLessEqual(state["ahead"], 5)
+
+    async def test_concurrent_feeds_have_own_stats(self):
+        async def handler(request):
+            await asyncio.sleep(0.001)
+            return httpx.Response(200, json={})
+
+        def documents(prefix, count):
+            return [
+                {"id": f"{prefix}{i}", "fields": {"title": "x" * (i + 1)}}
+                for i in range(count)
+            ]
+
+        app = Vespa(url="http://localhost", port=8080)
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            first, second = await asyncio.gather(
+                async_app.feed(documents("a", 5), schema="foo", max_workers=2),
+                async_app.feed(documents("b", 8), schema="foo", max_workers=2),
+            )
+            self.assertIsNone(async_app.stats)
+        self.assertIsNot(first, second)
+        self.assertEqual((first.operations, first.requests), (5, 5))
+        self.assertEqual((second.operations, second.requests), (8, 8))
+        body_size = len(json.dumps({"fields": {"title": ""}}, separators=(",", ":")))
+        self.assertEqual(first.bytes_raw, 5 * body_size + sum(range(1, 6)))
+        self.assertEqual(second.bytes_raw, 8 * body_size + sum(range(1, 9)))
+
+    async def test_feed_mixed_operations(self):
+        requests = []
+
+        def handler(request):
+            requests.append((request.method, request.url.path))
+            return httpx.Response(200, json={})
+
+        app = Vespa(url="http://localhost", port=8080)
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            await async_app.feed(
+                [
+                    {"id": "1", "fields": {"title": "one"}},
+                    {"id": "1", "operation": "update", "fields": {"title": "two"}},
+                    {"id": "2", "operation": "delete"},
+                ],
+                schema="foo",
+            )
+            with self.assertRaises(ValueError):
+                await async_app.feed([], schema="foo", operation_type="upsert")
+        self.assertEqual(
+            requests,
+            [
+                ("POST", "/document/v1/foo/foo/docid/1"),
+                ("DELETE", "/document/v1/foo/foo/docid/2"),
+                ("PUT", "/document/v1/foo/foo/docid/1"),
+            ],
+        )
+
+    async def test_feed_exception_status_code(self):
+        def fail(**kwargs):
+            response = Response()
+            response.status_code = 413
+            raise VespaError("Request too large") from HTTPError(response=response)
+
+        app = Vespa(url="http://localhost", port=8080)
+        callback = MagicMock()
+        async with app.asyncio(transport=httpx.MockTransport(MagicMock())) as async_app:
+            with patch.object(async_app, "feed_data_point", side_effect=fail):
+                stats = await async_app.feed(
+                    [{"id": "1", "fields": {}}], schema="foo", callback=callback
+                )
+        response = callback.call_args.args[0]
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json["Exception"], "Request too large")
+        self.assertEqual(stats.status_codes, {413: 1})
+
+
+class TestAsyncVisit(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.app = Vespa(url="http://localhost", port=8080)
+        self.requests = []
+        self.state = {"in_flight": 0, "peak": 0}
+
+    async def handler(self, request):
+        # Two pages per slice, with the slice id and page in the document ids
+        self.requests.append(request)
+        self.state["in_flight"] += 1
+        self.state["peak"] = max(self.state["peak"], self.state["in_flight"])
+        await asyncio.sleep(0.001)
+        self.state["in_flight"] -= 1
+        slice_id = request.url.params["sliceId"]
+        page = int(request.url.params.get("continuation", "0"))
+        result = {"documents": [{"id": "{}-{}".format(slice_id, page), "fields": {}}]}
+        if page == 0:
+            result["continuation"] = "1"
+        return httpx.Response(200, json=result)
+
+    async def test_visit(self):
+        continuations = []
+        async with self.app.asyncio(
+            transport=httpx.MockTransport(self.handler)
+        ) as async_app:
+            documents = [
+                document["id"]
+                async for document in async_app.visit(
+                    content_cluster_name="content",
+                    schema="foo",
+                    slices=4,
+                    field_set="[id]",
+                    wanted_document_count=100,
+                    max_concurrency=2,
+                    on_continuation=lambda *args: continuations.append(args),
+                )
+            ]
+        self.assertEqual(
+            sorted(documents), sorted(f"{s}-{p}" for s in range(4) for p in range(2))
+        )
+        self.assertLessEqual(self.state["peak"], 2)
+        self.assertEqual(
+            sorted(continuations, key=str),
+            sorted(
+                [(s, "1") for s in range(4)] + [(s, None) for s in range(4)], key=str
+            ),
+        )
+        params = self.requests[0].url.params
+        self.assertEqual(params["fieldSet"], "[id]")
+        self.assertEqual(params["wantedDocumentCount"], "100")
+        self.assertEqual(params["cluster"], "content")
+        self.assertEqual(params["slices"], "4")
+        self.assertEqual(self.requests[0].url.path, "/document/v1/foo/foo/docid/")
+
+    async def test_visit_resumes_from_continuations(self):
+        async with self.app.asyncio(
+            transport=httpx.MockTransport(self.handler)
+        ) as async_app:
+            documents = [
+                document["id"]
+                async for document in async_app.visit(
+                    content_cluster_name="content",
+                    schema="foo",
+                    slices=3,
+                    continuations={0: None, 1: "1"},
+                )
+            ]
+        # Slice 0 is done, slice 1 resumes at its second page, slice 2 starts over
+        self.assertEqual(sorted(documents), ["1-1", "2-0", "2-1"])
+
+    async def test_visit_checkpoint_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_file = os.path.join(tmp_dir, "visit.checkpoint")
+            async with self.app.asyncio(
+                transport=httpx.MockTransport(self.handler)
+            ) as async_app:
+                visit = async_app.visit(
+                    content_cluster_name="content",
+                    schema="foo",
+                    slices=1,
+                    wanted_document_count=1,
+                    checkpoint_file=checkpoint_file,
+                )
+                # Stop after the first page, as if the job was killed
+                self.assertEqual((await visit.__anext__())["id"], "0-0")
+                self.assertEqual((await visit.__anext__())["id"], "0-1")
+                await visit.aclose()
+                documents = [
+                    document["id"]
+                    async for document in async_app.visit(
+                        content_cluster_name="content",
+                        schema="foo",
+                        slices=1,
+                        checkpoint_file=checkpoint_file,
+                    )
+                ]
+            self.assertEqual(documents, ["0-1"])
+            with open(checkpoint_file) as f:
+                self.assertEqual(json.load(f)["continuations"], {"0": None})
+
+    async def test_visit_raises_error_of_slice(self):
+        def handler(request):
+            return httpx.Response(500, json={"message": "Internal error"})
+
+        async with self.app.asyncio(
+            transport=httpx.MockTransport(handler)
+        ) as async_app:
+            with self.assertRaises(RetryError):
+                async for _ in async_app.visit(
+                    content_cluster_name="content", schema="foo", slices=2
+                ):
+                    pass
+
+
+class TestAsyncUpdateWhere(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.app = Vespa(url="http://localhost", port=8080)
+        self.requests = []
+
+    def handler(self, request):
+        # Two pages per slice, slice 1 has a bad selection
+        self.requests.append(request)
+        if request.url.params["sliceId"] == "1":
+            return httpx.Response(400, json={"message": "Illegal selection"})
+        if "continuation" in request.url.params:
+            return httpx.Response(200, json={"documentCount": 2})
+        return httpx.Response(200, json={"documentCount": 3, "continuation": "c"})
+
+    async def test_update_where(self):
+        reports = []
+        async with self.app.asyncio(
+            transport=httpx.MockTransport(self.handler)
+        ) as async_app:
+            summary = await async_app.update_where(
+                content_cluster_name="content",
+                selection="true",
+                fields={"year": {"increment": 1}},
+                schema="foo",
+                slices=2,
+                auto_assign=False,
+                progress=lambda s: reports.append(s.documents),
+            )
+        self.assertFalse(summary.succeeded)
+        self.assertEqual(summary.completed_slices, [0])
+        self.assertEqual(summary.failed_slices, {1: "Illegal selection"})
+        self.assertEqual(summary.slice_documents, {0: 5})
+        self.assertEqual(reports, [3, 5])
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(
+            json.loads(self.requests[0].content),
+            {"fields": {"year": {"increment": 1}}},
+        )
+        self.assertEqual(self.requests[0].url.path, "/document/v1/foo/foo/docid/")
+
+
+class TestAsyncGetMany(unittest.IsolatedAsyncioTestCase):
+    async def test_get_many(self):
+        app = Vespa(url="http://localhost", port=8080)
+        state = {"in_flight": 0, "peak": 0}
+
+        async def handler(request):
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.001)
+            state["in_flight"] -= 1
+            data_id = request.url.path.rsplit("/", 1)[-1]
+            self.assertEqual(request.url.params["fieldSet"], "foo:title,year")
+            if data_id == "missing":
+                return httpx.Response(404, json={"id": "id:foo:foo::missing"})
+            return httpx.Response(
+                200, json={"id": "id:foo:foo::" + data_id, "fields": {}}
+            )
+
+        ids = [str(i) for i in range(20)] + ["missing"]
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            responses = await async_app.get_many(
+                ids=ids, schema="foo", fields=["title", "year"], max_workers=4
+            )
+        self.assertEqual(
+            [r.json["id"] for r in responses], ["id:foo:foo::" + i for i in ids]
+        )
+        self.assertEqual(responses[-1].status_code, 404)
+        self.assertLessEqual(state["peak"], 4)
+
+
+class TestAsyncInstrumentation(unittest.IsolatedAsyncioTestCase):
+    async def test_requests(self):
+        instrumentation = RecordingInstrumentation()
+        app = Vespa(url="http://localhost", port=8080, instrumentation=instrumentation)
+
+        def handler(request):
+            return httpx.Response(200, json={"root": {"children": []}})
+
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            await async_app.query(body={"yql": "select * from sources * where true"})
+        ((operation, method, status_code, latency, bytes_sent, bytes_received),) = (
+            instrumentation.requests
+        )
+        self.assertEqual((operation, method, status_code), ("query", "POST", 200))
+        self.assertGreater(bytes_sent, 0)
+        self.assertEqual(bytes_received, len(b'{"root":{"children":[]}}'))
+
+    async def test_disabled(self):
+        app = Vespa(url="http://localhost", port=8080)
+        async with app.asyncio(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200))
+        ) as async_app:
+            self.assertEqual(async_app.httpx_client.event_hooks["response"], [])
+
+    def test_retry(self):
+        instrumentation = RecordingInstrumentation()
+        state = MagicMock()
+        state.args = (Mock(instrumentation=instrumentation),)
+        state.fn.__name__ = "update_data"
+        state.outcome.failed = False
+        state.outcome.result.return_value = VespaResponse(
+            json={}, status_code=429, url="n/a", operation_type="update"
+        )
+        state.next_action.sleep = 0.5
+        _instrument_retry(state)
+        state.outcome.failed = True
+        _instrument_retry(state)
+        self.assertEqual(
+            instrumentation.retries, [("update", 429, 0.5), ("update", 599, 0.5)]
+        )
+
+
+class TestAsyncCompression(unittest.IsolatedAsyncioTestCase):
+    async def test_encode_body(self):
+        app = MockVespa()
+        body = {"fields": {"text": "test_data" * 200}}
+        content, headers = await VespaAsync(app)._encode_body(body, "feed")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(content)), body)
+        content, headers = await VespaAsync(app, compress=False)._encode_body(
+            body, "feed"
+        )
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(json.loads(content), body)
+        content, headers = await VespaAsync(
+            app, compress_larger_than={"update": 10}
+        )._encode_body({"fields": {}}, "update")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+
+    async def test_large_body_compressed_off_loop(self):
+        app = MockVespa()
+        body = {"fields": {"text": "test_data" * 10000}}
+        vespa_async = VespaAsync(app)
+        with patch("asyncio.BaseEventLoop.run_in_executor") as run_in_executor:
+            run_in_executor.return_value = asyncio.sleep(
+                0, result=(b"compressed", "gzip")
+            )
+            content, headers = await vespa_async._encode_body(body, "feed")
+        self.assertEqual(content, b"compressed")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(run_in_executor.call_args.args[1].__name__, "_compress_body")
+        content, headers = await vespa_async._encode_body(body, "feed")
+        self.assertEqual(json.loads(gzip.decompress(content)), body)
+
+
+class TestDeadLetterQueue(unittest.TestCase):
+    def test_bounded(self):
+        dead_letter = DeadLetterQueue(maxsize=2)
+        for i in range(3):
+            dead_letter.put(
+                {"id": str(i)},
+                VespaResponse(
+                    json={}, status_code=503, url="n/a", operation_type="feed"
+                ),
+            )
+        self.assertEqual(len(dead_letter), 2)
+        self.assertEqual(dead_letter.dropped, 1)
+        self.assertEqual(dead_letter.operations(), [{"id": "0"}, {"id": "1"}])
+        self.assertEqual(dead_letter.get()["operation"], {"id": "0"})
+        self.assertEqual(dead_letter.get()["operation"], {"id": "1"})
+        self.assertIsNone(dead_letter.get())
+
+    def test_invalid_maxsize(self):
+        with self.assertRaises(ValueError):
+            DeadLetterQueue(maxsize=0)
+
+
+class TestQueryCache(unittest.TestCase):
+    @staticmethod
+    def _response(status_code=200):
+        return VespaQueryResponse(json={}, status_code=status_code, url="n/a")
+
+    def test_key_is_canonical(self):
+        self.assertEqual(
+            QueryCache.key({"a": 1, "b": {"c": 2, "d": 3}}, None, {"x": 1, "y": 2}),
+            QueryCache.key({"b": {"d": 3, "c": 2}, "a": 1}, None, {"y": 2, "x": 1}),
+        )
+        self.assertNotEqual(
+            QueryCache.key({"a": 1}, None, {}), QueryCache.key({"a": 1}, "g", {})
+        )
+
+    def test_lru_eviction(self):
+        cache = QueryCache(max_size=2)
+        cache.put("a", self._response())
+        cache.put("b", self._response())
+        cache.get("a")
+        cache.put("c", self._response())
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl_expiry_and_errors_not_cached(self):
+        cache = QueryCache(ttl=10)
+        with patch("vespa.application.time.monotonic", return_value=100.0):
+            cache.put("a", self._response())
+            cache.put("b", self._response(status_code=504))
+        with patch("vespa.application.time.monotonic", return_value=105.0):
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+        with patch("vespa.application.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+
+    def test_single_flight(self):
+        import threading
+        import time
+
+        cache = QueryCache()
+        compute = Mock(side_effect=lambda: time.sleep(0.05) or self._response())
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_compute("a", compute))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        compute.assert_called_once()
+        self.assertEqual(len(results), 8)
+        self.assertEqual((cache.hits, cache.misses), (7, 1))
+
+    def test_query_uses_cache(self):
+        app = Vespa(url="http://localhost", port=8080, query_cache=QueryCache())
+        with requests_mock.Mocker() as m:
+            m.post("http://localhost:8080/search/", status_code=200, text="{}")
+            app.query(body={"yql": "select * from sources * where true", "hits": 1})
+            app.query(body={"hits": 1, "yql": "select * from sources * where true"})
+            self.assertEqual(m.call_count, 1)
+            app.query(
+                body={"yql": "select * from sources * where true", "hits": 1},
+                use_cache=False,
+            )
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual((app.query_cache.hits, app.query_cache.misses), (1, 1))
+
+
+class TestAsyncQueryCache(unittest.IsolatedAsyncioTestCase):
+    async def test_single_flight(self):
+        import asyncio
+
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"root": {}})
+
+        app = Vespa(url="http://localhost", port=8080, query_cache=QueryCache())
+        async with app.asyncio(transport=httpx.MockTransport(handler)) as async_app:
+            responses = await asyncio.gather(
+                *[async_app.query(body={"yql": "select"}) for _ in range(5)]
+            )
+            await async_app.query(body={"yql": "select"})
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is responses[0] for r in responses))
+        self.assertEqual((app.query_cache.hits, app.query_cache.misses), (5, 1))
+
+
+class TestAdaptiveThrottler(unittest.TestCase):
+    def test_slow_start_grows_to_max(self):
+        throttler = AdaptiveThrottler(max_concurrency=16)
+        self.assertEqual(throttler.concurrency, 1)
+        for _ in range(100):
+            throttler.on_response(200)
+        self.assertEqual(throttler.concurrency, 16)
+
+    def test_decrease_on_throttling(self):
+        throttler = AdaptiveThrottler(max_concurrency=32, initial_concurrency=32)
+        for _ in range(32):
+            throttler.on_response(200)
+        throttler.on_response(429)
+        self.assertEqual(throttler.concurrency, 16)
+        # Throttled responses from the same window do not decrease further
+        throttler.on_response(503)
+        self.assertEqual(throttler.concurrency, 16)
+        # Additive increase after the first decrease
+        for _ in range(20):
+            throttler.on_response(200)
+        self.assertEqual(throttler.concurrency, 17)
+
+    def test_never_below_min(self):
+        throttler = AdaptiveThrottler(max_concurrency=8, min_concurrency=2)
+        for _ in range(100):
+            throttler.on_response(429)
+        self.assertEqual(throttler.concurrency, 2)
+
+    def test_decrease_on_rising_latency(self):
+        throttler = AdaptiveThrottler(max_concurrency=64, initial_concurrency=8)
+        for _ in range(20):
+            throttler.on_response(200, latency=0.01)
+        before = throttler.concurrency
+        for _ in range(50):
+            throttler.on_response(200, latency=1.0)
+        self.assertLess(throttler.concurrency, before)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            AdaptiveThrottler(max_concurrency=4, min_concurrency=8)
+        with self.assertRaises(ValueError):
+            AdaptiveThrottler(max_concurrency=4, decrease_factor=1.5)
+
+    def test_adapter_notifies_throttler(self):
+        throttler = Mock()
+        adapter = CustomHTTPAdapter(num_retries_429=1, throttler=throttler)
+        session = Session()
+        session.mount("http://", adapter)
+        prepared_request = session.prepare_request(
+            Request(method="GET", url="http://test.com")
+        )
+        with patch.object(adapter, "_wait_with_backoff"), patch(
+            "requests.adapters.HTTPAdapter.send"
+        ) as mock_send:
+            throttled, ok = Mock(status_code=429), Mock(status_code=200)
+            mock_send.side_effect = [throttled, ok]
+            adapter.send(prepared_request)
+        self.assertEqual(
+            [call.args[0] for call in throttler.on_response.call_args_list],
+            [429, 200],
+        )
+
+    def test_adapter_counts_requests(self):
+        stats = FeedStats()
+        adapter = CustomHTTPAdapter(num_retries_429=1, stats=stats)
+        session = Session()
+        session.mount("http://", adapter)
+        prepared_request = session.prepare_request(
+            Request(method="GET", url="http://test.com")
+        )
+        with patch.object(adapter, "_wait_with_backoff"), patch(
+            "requests.adapters.HTTPAdapter.send"
+        ) as mock_send:
+            mock_send.side_effect = [Mock(status_code=429), Mock(status_code=200)]
+            adapter.send(prepared_request)
+        stats.on_operation(200)
+        self.assertEqual(stats.requests, 2)
+        self.assertEqual(stats.retries, 1)
+
+
+class TestJsonCodec(unittest.TestCase):
+    def test_backends_roundtrip(self):
+        document = {"fields": {"title": "Smørbrød", "embedding": [0.5, 1.25]}}
+        for backend in ["json", "orjson", "msgspec"]:
+            try:
+                codec = JsonCodec(backend)
+            except ImportError:
+                continue
+            encoded = codec.dumps(document)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(json.loads(encoded), document)
+            self.assertEqual(codec.loads(encoded), document)
+            self.assertEqual(codec.backend, backend)
+
+    def test_auto_falls_back_to_json(self):
+        with patch.dict("sys.modules", {"orjson": None, "msgspec": None}):
+            self.assertEqual(JsonCodec("auto").backend, "json")
+
+    def test_default_is_json(self):
+        # orjson and msgspec are opt-in, as they encode NaN as null
+        self.assertEqual(JsonCodec().backend, "json")
+        app = Vespa(url="http://localhost", port=8080)
+        self.assertEqual(app.json_codec.backend, "json")
+        self.assertEqual(
+            json.loads(
+                app.json_codec.dumps({"score": float("nan")}), parse_constant=str
+            ),
+            {"score": "NaN"},
+        )
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            JsonCodec("yaml")
+
+    def test_request_body_is_encoded_by_codec(self):
+        codec = JsonCodec("json")
+        codec.dumps = Mock(side_effect=codec.dumps)
+        app = Vespa(url="http://localhost", port=8080, json_codec=codec)
+        with requests_mock.Mocker() as m:
+            m.post(
+                "http://localhost:8080/document/v1/foo/foo/docid/0",
+                status_code=200,
+                text='{"id": "id:foo:foo::0"}',
+            )
+            response = app.feed_data_point(
+                schema="foo", data_id="0", fields={"title": "test"}
+            )
+            self.assertEqual(m.last_request.json(), {"fields": {"title": "test"}})
+            self.assertEqual(m.last_request.headers["Content-Type"], "application/json")
+        codec.dumps.assert_called_once_with({"fields": {"title": "test"}})
+        self.assertEqual(response.json, {"id": "id:foo:foo::0"})
+
+
+class TestCustomHTTPAdapterCompression(unittest.TestCase):
+    def setUp(self):
+        """Set up the CustomHTTPAdapter for testing."""
+        self.adapter = CustomHTTPAdapter(compress="auto")
+
+    def test_compression_auto_with_large_body(self):
+        """Test auto compression with a large request body."""
+        request = Request(method="POST", url="http://test.com", data=b"test_data" * 300)
+        self.adapter.check_size = Mock(return_value=5000)  # Simulate large content
+        prepared_request = request.prepare()
+
+        self.adapter._maybe_compress_request(prepared_request)
+        self.assertIn("Content-Encoding", prepared_request.headers)
+        self.assertEqual(prepared_request.headers["Content-Encoding"], "gzip")
+
+    def test_no_compression_auto_with_small_body(self):
+        """Test no compression with a small request body."""
+        request = Request(method="POST", url="http://test.com", data=b"test_data")
+        self.adapter.check_size = Mock(return_value=10)  # Simulate small content
+        prepared_request = request.prepare()
+
+        self.adapter._maybe_compress_request(prepared_request)
+        self.assertNotIn("Content-Encoding", prepared_request.headers)
+
+    def test_force_compression(self):
+        """Test forced compression when compress=True."""
+        self.adapter = CustomHTTPAdapter(compress=True)
+        request = Request(method="POST", url="http://test.com", data=b"test_data")
+        prepared_request = request.prepare()
+
+        self.adapter._maybe_compress_request(prepared_request)
+        self.assertIn("Content-Encoding", prepared_request.headers)
+        self.assertEqual(prepared_request.headers["Content-Encoding"], "gzip")
+
+    def test_disable_compression(self):
+        """Test no compression when compress=False."""
+        self.adapter = CustomHTTPAdapter(compress=False)
+        request = Request(method="POST", url="http://test.com", data=b"test_data")
+        prepared_request = request.prepare()
+
+        self.adapter._maybe_compress_request(prepared_request)
+        self.assertNotIn("Content-Encoding", prepared_request.headers)
 
     def test_invalid_compression_value(self):
         """Test invalid compress value raises error."""
@@ -671,7 +2686,61 @@ class TestCustomHTTPAdapterCompression(unittest.TestCase):
 
             mock_send.assert_called_once()
             args, _ = mock_send.call_args
-            self.assertEqual(args[0].body, gzip.compress(b"test_data"))
+            self.assertEqual(gzip.decompress(args[0].body), b"test_data")
+
+    def test_compression_level(self):
+        """Test that the compression level is applied to the body."""
+        data = b"".join(str(i).encode() for i in range(5000))
+        # The gzip header XFL byte flags the fastest (4) and best (2) levels
+        for level, xfl in [(1, 4), (9, 2)]:
+            adapter = CustomHTTPAdapter(compress=True, compress_level=level)
+            prepared_request = Request(
+                method="POST", url="http://test.com", data=data
+            ).prepare()
+            adapter._maybe_compress_request(prepared_request)
+            self.assertEqual(gzip.decompress(prepared_request.body), data)
+            self.assertEqual(prepared_request.body[8], xfl)
+
+    def test_pool_size_passed_to_adapter(self):
+        """Test that the pool sizes reach the underlying HTTPAdapter."""
+        adapter = CustomHTTPAdapter(pool_connections=3, pool_maxsize=7)
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertEqual(adapter._pool_maxsize, 7)
+
+    def test_invalid_compression_encoding(self):
+        """Test invalid compress_encoding raises error."""
+        with self.assertRaises(ValueError):
+            CustomHTTPAdapter(compress_encoding="br")
+
+    def test_compression_threshold_per_operation(self):
+        """Test that compress_larger_than can be set per operation type."""
+        adapter = CustomHTTPAdapter(
+            compress="auto", compress_larger_than={"feed": 10, "query": 100000}
+        )
+        feed_request = Request(
+            method="POST",
+            url="http://test.com/document/v1/ns/doc/docid/1",
+            data=b"test_data" * 10,
+        ).prepare()
+        query_request = Request(
+            method="POST", url="http://test.com/search/", data=b"test_data" * 10
+        ).prepare()
+        adapter._maybe_compress_request(feed_request)
+        adapter._maybe_compress_request(query_request)
+        self.assertEqual(feed_request.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Encoding", query_request.headers)
+
+    def test_already_encoded_body_not_compressed_again(self):
+        """Test that a body with a Content-Encoding header is left as is."""
+        adapter = CustomHTTPAdapter(compress=True)
+        request = Request(
+            method="POST",
+            url="http://test.com",
+            data=b"test_data",
+            headers={"Content-Encoding": "gzip"},
+        ).prepare()
+        adapter._maybe_compress_request(request)
+        self.assertEqual(request.body, b"test_data")
 
     def test_retry_on_429_status(self):
         """Test retry logic when response status is 429."""
@@ -695,6 +2764,123 @@ class TestCustomHTTPAdapterCompression(unittest.TestCase):
             self.assertEqual(mock_backoff.call_count, mock_send.call_count)
 
 
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self.retries = []
+        self.pool_waits = []
+
+    def on_request(
+        self, operation, method, status_code, latency, bytes_sent, bytes_received
+    ):
+        self.requests.append(
+            (operation, method, status_code, latency, bytes_sent, bytes_received)
+        )
+
+    def on_retry(self, operation, status_code, wait):
+        self.retries.append((operation, status_code, wait))
+
+    def on_pool_wait(self, wait):
+        self.pool_waits.append(wait)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def response(self, status_code, content):
+        response = Response()
+        response.status_code = status_code
+        response._content = content
+        return response
+
+    def test_sync_requests_and_retries(self):
+        instrumentation = RecordingInstrumentation()
+        app = Vespa(url="http://localhost", port=8080, instrumentation=instrumentation)
+        with patch("requests.adapters.HTTPAdapter.send") as mock_send, patch.object(
+            CustomHTTPAdapter, "_wait_with_backoff", return_value=0.5
+        ):
+            mock_send.side_effect = [
+                self.response(429, b"{}"),
+                self.response(200, b'{"id": "id:foo:foo::1"}'),
+            ]
+            with app.syncio() as sync_app:
+                sync_app.feed_data_point(
+                    schema="foo", data_id="1", fields={"title": "x"}
+                )
+        self.assertEqual(instrumentation.retries, [("feed", 429, 0.5)])
+        self.assertEqual(
+            [r[:3] for r in instrumentation.requests],
+            [("feed", "POST", 429), ("feed", "POST", 200)],
+        )
+        operation, method, status_code, latency, bytes_sent, bytes_received = (
+            instrumentation.requests[1]
+        )
+        self.assertGreaterEqual(latency, 0)
+        self.assertEqual(bytes_sent, len(b'{"fields":{"title":"x"}}'))
+        self.assertEqual(bytes_received, len(b'{"id": "id:foo:foo::1"}'))
+
+    def test_sync_bytes_sent_of_str_body(self):
+        instrumentation = RecordingInstrumentation()
+        session = Session()
+        session.mount(
+            "http://",
+            CustomHTTPAdapter(compress=False, instrumentation=instrumentation),
+        )
+        body = '{"yql": "select * from sources * where title contains \'æøå\'"}'
+        with patch("requests.adapters.HTTPAdapter.send") as mock_send:
+            mock_send.return_value = self.response(200, b"{}")
+            session.post("http://localhost:8080/search/", data=body)
+        self.assertEqual(instrumentation.requests[0][0], "query")
+        self.assertEqual(instrumentation.requests[0][4], len(body.encode("utf-8")))
+
+    def test_sync_pool_wait(self):
+        instrumentation = RecordingInstrumentation()
+        adapter = CustomHTTPAdapter(instrumentation=instrumentation)
+        pool = adapter.poolmanager.connection_from_url("http://localhost:8080")
+        pool._put_conn(pool._get_conn())
+        self.assertEqual(len(instrumentation.pool_waits), 1)
+        # Without instrumentation, the pools are not wrapped
+        pool_classes = CustomHTTPAdapter().poolmanager.pool_classes_by_scheme
+        self.assertIs(pool_classes["http"], HTTPConnectionPool)
+
+    def test_operation_type(self):
+        for method, path, operation in [
+            ("POST", "/search/", "query"),
+            ("POST", "/document/v1/ns/foo/docid/1", "feed"),
+            ("PUT", "/document/v1/ns/foo/docid/", "update"),
+            ("GET", "/document/v1/ns/foo/docid/1", "get"),
+            ("GET", "/document/v1/ns/foo/docid/", "visit"),
+            ("GET", "/document/v1/", "visit"),
+            ("DELETE", "/document/v1/ns/foo/docid/1", "delete"),
+            ("GET", "/ApplicationStatus", "other"),
+        ]:
+            self.assertEqual(_operation_type(method, path), operation)
+
+    def test_opentelemetry(self):
+        meter = MagicMock()
+        instrumentation = OpenTelemetryInstrumentation(meter=meter)
+        created = [c.args[0] for c in meter.create_histogram.call_args_list]
+        self.assertEqual(
+            created,
+            [
+                "vespa.client.request.duration",
+                "vespa.client.retry.wait",
+                "vespa.client.pool.wait",
+            ],
+        )
+        instrumentation.on_request("query", "POST", 200, 0.01, 100, 1000)
+        meter.create_histogram.return_value.record.assert_any_call(
+            0.01,
+            {
+                "vespa.operation": "query",
+                "http.request.method": "POST",
+                "http.response.status_code": 200,
+            },
+        )
+        meter.create_counter.return_value.add.assert_any_call(
+            1000, {"vespa.operation": "query"}
+        )
+
+
 class MockVespa:
     def __init__(
         self,
@@ -709,6 +2895,8 @@ class MockVespa:
         self.vespa_cloud_secret_token = vespa_cloud_secret_token
         self.cert = cert
         self.key = key
+        self.json_codec = JsonCodec()
+        self.instrumentation = None
 
 
 # Test class
@@ -755,6 +2943,11 @@ class TestVespaAsync:
         limits = httpx.Limits(keepalive_expiry=1)
         _vespa_async = VespaAsync(app, limits=limits)
 
+    def test_init_invalid_compress(self):
+        app = MockVespa()
+        with pytest.raises(ValueError):
+            VespaAsync(app, compress="invalid_value")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,24 @@
 # Copyright Vespa.ai. Licensed under the terms of the Apache 2.0 license. See LICENSE in the project root.
 
+import os
+import tempfile
 import unittest
-from vespa.io import VespaVisitResponse, VespaQueryResponse
+
+import pytest
+
+from vespa.package import Document, Field, Schema
+
+from vespa.io import (
+    BulkOperationSummary,
+    FeedStats,
+    documents_to_record_batches,
+    vespa_schema_to_arrow,
+    write_documents,
+    VespaVisitResponse,
+    VespaQueryResponse,
+    hits_to_arrow,
+    hits_to_columns,
+)
 
 
 class TestVespaVisitResult(unittest.TestCase):
@@ -158,3 +175,331 @@ class TestVespaQueryResult(unittest.TestCase):
                 }
             ],
         )
+
+
+class TestHitsToColumns(unittest.TestCase):
+    def setUp(self) -> None:
+        self.np = pytest.importorskip("numpy")
+        self.responses = [
+            VespaQueryResponse(
+                json={
+                    "root": {
+                        "children": [
+                            {
+                                "id": "id:doc:doc::1",
+                                "relevance": 2.5,
+                                "fields": {
+                                    "title": "first",
+                                    "year": 2020,
+                                    "matchfeatures": {
+                                        "bm25(title)": 1.5,
+                                        "embedding": {
+                                            "type": "tensor<float>(x[3])",
+                                            "values": [0.1, 0.2, 0.3],
+                                        },
+                                    },
+                                    "summaryfeatures": {
+                                        "bm25(title)": 1.5,
+                                        "nativeRank": 0.3,
+                                    },
+                                },
+                            },
+                            {
+                                "id": "id:doc:doc::2",
+                                "relevance": 1,
+                                "fields": {
+                                    "title": "second",
+                                    "matchfeatures": {
+                                        "bm25(title)": 0.5,
+                                        "embedding": {
+                                            "type": "tensor<float>(x[3])",
+                                            "values": [0.4, 0.5, 0.6],
+                                        },
+                                    },
+                                },
+                            },
+                        ]
+                    }
+                },
+                status_code=200,
+                url="n/a",
+            ),
+            VespaQueryResponse(
+                json={
+                    "root": {
+                        "children": [
+                            {
+                                "id": "id:doc:doc::3",
+                                "relevance": 0.5,
+                                "fields": {"title": "third", "year": 2021},
+                            }
+                        ]
+                    }
+                },
+                status_code=200,
+                url="n/a",
+            ),
+        ]
+
+    def test_columns(self):
+        np = self.np
+        columns = hits_to_columns(self.responses)
+        np.testing.assert_array_equal(columns["query_index"], [0, 0, 1])
+        np.testing.assert_array_equal(
+            columns["id"], ["id:doc:doc::1", "id:doc:doc::2", "id:doc:doc::3"]
+        )
+        self.assertEqual(columns["relevance"].dtype, np.float64)
+        np.testing.assert_array_equal(columns["relevance"], [2.5, 1.0, 0.5])
+        np.testing.assert_array_equal(columns["title"], ["first", "second", "third"])
+        np.testing.assert_array_equal(columns["year"], [2020, np.nan, 2021])
+        np.testing.assert_array_equal(columns["bm25(title)"], [1.5, 0.5, np.nan])
+        np.testing.assert_array_equal(columns["nativeRank"], [0.3, np.nan, np.nan])
+        self.assertEqual(columns["embedding"].shape, (3, 3))
+        np.testing.assert_array_equal(columns["embedding"][1], [0.4, 0.5, 0.6])
+        self.assertTrue(np.isnan(columns["embedding"][2]).all())
+
+    def test_selected_fields(self):
+        columns = self.responses[0].to_columns(fields=["bm25(title)"])
+        self.assertEqual(
+            set(columns), {"query_index", "id", "relevance", "bm25(title)"}
+        )
+
+    def test_meta_column_collision(self):
+        response = VespaQueryResponse(
+            json={
+                "root": {
+                    "children": [
+                        {"id": "id:doc:doc::1", "relevance": 1.0, "fields": {"id": 7}}
+                    ]
+                }
+            },
+            status_code=200,
+            url="n/a",
+        )
+        with self.assertRaises(ValueError):
+            hits_to_columns(response)
+        columns = response.to_columns(meta_prefix="_")
+        self.assertEqual(set(columns), {"_query_index", "_id", "_relevance", "id"})
+        self.assertEqual(columns["_id"][0], "id:doc:doc::1")
+        self.assertEqual(columns["id"][0], 7)
+
+    def test_column_types(self):
+        np = self.np
+        hits = [
+            {"id": "1", "fields": {"a": 1, "b": True, "c": {"values": [1.0, 2.0]}}},
+            {"id": "2", "fields": {"a": 2.5, "b": 1, "c": {"values": [1.0]}}},
+            {"id": "3", "fields": {}},
+        ]
+        columns = hits_to_columns(
+            VespaQueryResponse(
+                json={"root": {"children": hits}}, status_code=200, url="n/a"
+            )
+        )
+        self.assertEqual(columns["a"].dtype, np.float64)
+        np.testing.assert_array_equal(columns["a"], [1.0, 2.5, np.nan])
+        self.assertEqual(list(columns["b"]), [True, 1, None])
+        self.assertEqual(columns["c"].dtype, object)
+
+    def test_arrow(self):
+        pytest.importorskip("pyarrow")
+        table = hits_to_arrow(self.responses)
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column("embedding").type.list_size, 3)
+        self.assertEqual(
+            table.column("title").to_pylist(), ["first", "second", "third"]
+        )
+
+
+class TestFeedStats(unittest.TestCase):
+    def test_latency_percentiles(self):
+        stats = FeedStats()
+        self.assertEqual(stats.latency_percentiles(), {})
+        for latency in [0.01] * 90 + [0.1] * 9 + [1.0]:
+            start = stats.on_operation_start()
+            stats.on_operation(200, start - latency)
+        percentiles = stats.latency_percentiles()
+        self.assertAlmostEqual(percentiles["p50"], 0.01, delta=0.01 * 0.05)
+        self.assertAlmostEqual(percentiles["p95"], 0.1, delta=0.1 * 0.05)
+        self.assertAlmostEqual(percentiles["p99"], 0.1, delta=0.1 * 0.05)
+        self.assertAlmostEqual(
+            stats.latency_percentiles((100,))["p100"], 1.0, delta=1.0 * 0.05
+        )
+        self.assertEqual(stats.peak_in_flight, 1)
+        self.assertEqual(stats.in_flight, 0)
+
+    def test_retries(self):
+        stats = FeedStats()
+        for status_code in [200, 200, 429, 499]:
+            stats.on_operation(status_code)
+        for _ in range(5):
+            stats.on_request()
+        # 499 operations were never sent
+        self.assertEqual(stats.retries, 2)
+        self.assertEqual(stats.status_codes, {200: 2, 429: 1, 499: 1})
+
+    def test_throughput(self):
+        stats = FeedStats(interval=0.5)
+        stats.start_time -= 1.2
+        stats.on_operation(200)
+        stats.on_operation(200)
+        stats.finish()
+        self.assertEqual(stats.throughput, [(0.0, 0.0), (0.5, 0.0), (1.0, 4.0)])
+        self.assertAlmostEqual(stats.operations_per_second, 2 / stats.elapsed)
+
+    def test_to_dict(self):
+        stats = FeedStats()
+        stats.on_body(1000, 100)
+        stats.on_request()
+        stats.on_operation(200, stats.on_operation_start())
+        stats.finish()
+        result = stats.to_dict()
+        self.assertEqual(result["operations"], 1)
+        self.assertEqual(result["bytes_raw"], 1000)
+        self.assertEqual(result["bytes_sent"], 100)
+        self.assertEqual(result["retries"], 0)
+        self.assertEqual(set(result["latency"]), {"p50", "p95", "p99"})
+
+
+class TestBulkOperationSummary(unittest.TestCase):
+    def test_summary(self):
+        summary = BulkOperationSummary("delete", "true", slices=2)
+        summary.on_request()
+        summary.on_page(0, 10)
+        summary.on_page(1, 5)
+        summary.on_page(0, 2)
+        summary.on_slice_done(0)
+        self.assertFalse(summary.succeeded)
+        summary.on_slice_done(1)
+        summary.finish()
+        self.assertTrue(summary.succeeded)
+        self.assertEqual(summary.documents, 17)
+        self.assertEqual(summary.slice_documents, {0: 12, 1: 5})
+        self.assertAlmostEqual(summary.documents_per_second, 17 / summary.elapsed)
+
+    def test_failed_slices(self):
+        summary = BulkOperationSummary("delete", "true", slices=1)
+        summary.on_slice_failed(0, "Illegal selection")
+        result = summary.to_dict()
+        self.assertFalse(summary.succeeded)
+        self.assertEqual(result["failed_slices"], {0: "Illegal selection"})
+        self.assertEqual(result["completed_slices"], [])
+
+
+class TestDocumentsToArrow(unittest.TestCase):
+    def setUp(self):
+        self.pa = pytest.importorskip("pyarrow")
+        self.schema = Schema(
+            name="music",
+            document=Document(
+                fields=[
+                    Field(name="title", type="string"),
+                    Field(name="year", type="int"),
+                    Field(name="tags", type="array<string>"),
+                    Field(name="weights", type="weightedset<string>"),
+                    Field(name="embedding", type="tensor<float>(x[2])"),
+                    Field(name="meta", type="map<string,array<string>>"),
+                ]
+            ),
+        )
+        self.documents = [
+            {
+                "id": "id:music:music::{}".format(i),
+                "fields": {
+                    "title": "title {}".format(i),
+                    "year": 2000 + i,
+                    "tags": ["a", "b"],
+                    "weights": {"a": 1},
+                    "embedding": {"type": "tensor<float>(x[2])", "values": [i, 1.0]},
+                    "meta": {"k": ["v"]},
+                },
+            }
+            for i in range(5)
+        ]
+
+    def test_vespa_schema_to_arrow(self):
+        pa = self.pa
+        arrow_schema = vespa_schema_to_arrow(self.schema)
+        self.assertEqual(
+            [(field.name, field.type) for field in arrow_schema],
+            [
+                ("id", pa.string()),
+                ("title", pa.string()),
+                ("year", pa.int32()),
+                ("tags", pa.list_(pa.string())),
+                ("weights", pa.map_(pa.string(), pa.int32())),
+                ("embedding", pa.list_(pa.float32(), 2)),
+                ("meta", pa.string()),
+            ],
+        )
+        self.assertEqual(
+            vespa_schema_to_arrow(self.schema, fields=["year"]).names, ["id", "year"]
+        )
+        with self.assertRaises(ValueError):
+            vespa_schema_to_arrow(self.schema, fields=["unknown"])
+
+    def test_documents_to_record_batches(self):
+        arrow_schema = vespa_schema_to_arrow(self.schema)
+        documents = self.documents + [{"id": "id:music:music::5", "fields": {}}]
+        batches = list(
+            documents_to_record_batches(documents, schema=arrow_schema, batch_size=4)
+        )
+        self.assertEqual([batch.num_rows for batch in batches], [4, 2])
+        rows = batches[0].to_pylist()
+        self.assertEqual(rows[1]["embedding"], [1.0, 1.0])
+        self.assertEqual(rows[1]["weights"], [("a", 1)])
+        self.assertEqual(rows[1]["meta"], '{"k": ["v"]}')
+        self.assertEqual(batches[1].to_pylist()[1]["title"], None)
+
+    def test_documents_to_record_batches_infers_schema(self):
+        documents = [
+            {"id": str(i), "fields": {"title": str(i), "year": i}} for i in range(3)
+        ]
+        batches = list(documents_to_record_batches(documents, batch_size=2))
+        self.assertEqual(batches[0].schema.names, ["id", "title", "year"])
+        self.assertEqual(batches[1].schema, batches[0].schema)
+
+    def test_write_documents(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+        arrow_schema = vespa_schema_to_arrow(self.schema)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "music.parquet")
+            rows = write_documents(
+                iter(self.documents), path, schema=arrow_schema, row_group_size=2
+            )
+            self.assertEqual(rows, 5)
+            parquet_file = pq.ParquetFile(path)
+            self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+            table = parquet_file.read()
+            self.assertEqual(table.column("year").to_pylist(), list(range(2000, 2005)))
+
+            path = os.path.join(tmp_dir, "music.arrow")
+            write_documents(self.documents, path, schema=arrow_schema, format="arrow")
+            with self.pa.OSFile(path) as f:
+                table = self.pa.ipc.open_file(f).read_all()
+            self.assertEqual(table.num_rows, 5)
+
+            # Without documents, the file has the schema and no rows
+            path = os.path.join(tmp_dir, "empty.parquet")
+            self.assertEqual(write_documents([], path, schema=arrow_schema), 0)
+            self.assertEqual(pq.read_table(path).schema.names, arrow_schema.names)
+
+            # Without documents and schema, the file has an empty schema
+            path = os.path.join(tmp_dir, "empty.arrow")
+            self.assertEqual(write_documents([], path, format="arrow"), 0)
+            with self.pa.OSFile(path) as f:
+                self.assertEqual(len(self.pa.ipc.open_file(f).schema), 0)
+
+    def test_write_documents_compression(self):
+        pytest.importorskip("pyarrow.parquet")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "music.arrow")
+            with self.assertRaisesRegex(ValueError, "lz4, zstd"):
+                write_documents(
+                    self.documents, path, format="arrow", compression="snappy"
+                )
+            self.assertFalse(os.path.exists(path))
+            write_documents(self.documents, path, format="arrow", compression="LZ4")
+            path = os.path.join(tmp_dir, "music.parquet")
+            self.assertEqual(
+                write_documents(self.documents, path, compression="snappy"), 5
+            )
@@ -4,11 +4,38 @@ import sys
 import asyncio
 import traceback
 import concurrent.futures
+import multiprocessing
+import copy
 import warnings
-from typing import Optional, Dict, Generator, List, IO, Iterable, Callable, Tuple, Union
-from concurrent.futures import ThreadPoolExecutor, Future, as_completed
-from queue import Queue, Empty
+from typing import (
+    Optional,
+    Dict,
+    Generator,
+    List,
+    IO,
+    Iterable,
+    Callable,
+    Tuple,
+    Union,
+    Set,
+    Coroutine,
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Any,
+)
+from concurrent.futures import ThreadPoolExecutor, Future
+from queue import Full, Queue
+from collections import deque
 import threading
+import weakref
+import hashlib
+import json
+import gzip
+import io
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
 from requests import Session
 from requests.models import Response
 from requests.exceptions import ConnectionError, HTTPError, JSONDecodeError
@@ -26,18 +53,25 @@ from tenacity import (
     RetryCallState,
 )
 from time import sleep
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
 import random
 import time
 
 from vespa.exceptions import VespaError
-from vespa.io import VespaQueryResponse, VespaResponse, VespaVisitResponse
+from vespa.io import (
+    BulkOperationSummary,
+    FeedStats,
+    VespaQueryResponse,
+    VespaResponse,
+    VespaVisitResponse,
+    vespa_schema_to_arrow,
+    write_documents,
+)
 from vespa.package import ApplicationPackage
 import httpx
 import vespa
-import gzip
+import zlib
 from requests.models import PreparedRequest
-from io import BytesIO
 import logging
 
 logging.getLogger("urllib3").setLevel(logging.ERROR)
@@ -76,6 +110,1543 @@ def raise_for_status(
         raise HTTPError(http_error) from http_error
 
 
+def _query_exception_response(
+    exception: Exception, body: Optional[Dict]
+) -> VespaQueryResponse:
+    # Captures a failed query in a batch as a response, instead of aborting the batch
+    return VespaQueryResponse(
+        json={"Exception": str(exception), "message": "Exception during query"},
+        status_code=599,
+        url="n/a",
+        request_body=body,
+    )
+
+
+COMPRESS_LARGER_THAN: int = 1024
+COMPRESS_ENCODINGS: Tuple[str, ...] = ("gzip", "zstd")
+# Bodies larger than this are compressed in a worker thread by VespaAsync, so the event loop is not stalled
+COMPRESS_OFF_LOOP_LARGER_THAN: int = 64 * 1024
+
+
+def _get_exception_response(exception: Exception, data_id: str) -> VespaResponse:
+    # Captures a failed get in a batch as a response, instead of aborting the batch
+    return VespaResponse(
+        json={
+            "id": data_id,
+            "Exception": str(exception),
+            "message": "Exception during get",
+        },
+        status_code=_exception_status_code(exception),
+        url="n/a",
+        operation_type="get",
+    )
+
+
+def _field_set(schema: str, fields: Optional[List[str]]) -> Dict[str, str]:
+    # fieldSet request parameter that limits the returned fields of a schema
+    if fields is None:
+        return {}
+    return {"fieldSet": "{}:{}".format(schema, ",".join(fields))}
+
+
+def _check_compress_encoding(encoding: str) -> None:
+    if encoding not in COMPRESS_ENCODINGS:
+        raise ValueError(
+            f"compress_encoding must be one of {COMPRESS_ENCODINGS}. Got {encoding} instead."
+        )
+    if encoding == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "zstandard is required for zstd compression. Install it with 'pip install zstandard'."
+            )
+
+
+def _compress_bytes(data: bytes, encoding: str = "gzip", level: int = 1) -> bytes:
+    # Single pass compression of the request body, without intermediate buffers
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress(data) + compressor.flush()
+
+
+_DOCUMENT_OPERATIONS = {
+    "POST": "feed",
+    "PUT": "update",
+    "DELETE": "delete",
+    "GET": "get",
+}
+
+
+def _operation_type(method: str, path: str) -> str:
+    # Operation of a request, for compression thresholds and as reported to Instrumentation.
+    # `path` is the URL path, without the query string.
+    if "/search/" in path:
+        return "query"
+    if "/document/v1/" not in path:
+        return "other"
+    if method == "GET" and (path.endswith("/docid/") or path.endswith("/v1/")):
+        return "visit"
+    return _DOCUMENT_OPERATIONS.get(method, "other")
+
+
+def _compress_threshold(
+    compress_larger_than: Union[int, Dict[str, int]], operation_type: str
+) -> int:
+    # The threshold is either one size for all requests, or a size per operation type
+    if isinstance(compress_larger_than, dict):
+        return compress_larger_than.get(operation_type, COMPRESS_LARGER_THAN)
+    return compress_larger_than
+
+
+class AdaptiveThrottler(object):
+    THROTTLED_STATUS_CODES = (429, 503)
+    LATENCY_SMOOTHING = 0.1
+    LATENCY_WARMUP_SAMPLES = 10
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        initial_concurrency: Optional[int] = None,
+        decrease_factor: float = 0.5,
+        latency_factor: float = 2.0,
+    ) -> None:
+        """
+        Adaptive concurrency controller for feeding, using additive increase and multiplicative decrease (AIMD).
+
+        The controller is notified of the status code and latency of every HTTP request attempt. The concurrency
+        is multiplied by `decrease_factor` when Vespa responds with 429 or 503, or when the smoothed latency exceeds
+        `latency_factor` times the baseline latency. At most one decrease happens per window of responses. While responses
+        stay healthy, the concurrency doubles for each window until the first decrease, and grows by one operation for each
+        window after that, up to `max_concurrency`.
+
+        Used by :func:`Vespa.feed_iterable` and :func:`Vespa.feed_async_iterable` when `adaptive_concurrency=True`.
+        The controller is thread-safe.
+
+        :param max_concurrency: Upper bound for the number of in-flight operations.
+        :param min_concurrency: Lower bound for the number of in-flight operations.
+        :param initial_concurrency: Number of in-flight operations to start with. Defaults to `min_concurrency`.
+        :param decrease_factor: Factor the concurrency is multiplied with on throttling or rising latency.
+        :param latency_factor: Latency increase, relative to the baseline, that is treated as congestion.
+        """
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError(
+                "Expected 1 <= min_concurrency <= max_concurrency. Got min_concurrency={} and max_concurrency={}.".format(
+                    min_concurrency, max_concurrency
+                )
+            )
+        if not 0 < decrease_factor < 1:
+            raise ValueError(
+                f"decrease_factor must be between 0 and 1. Got {decrease_factor} instead."
+            )
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        if initial_concurrency is None:
+            initial_concurrency = min_concurrency
+        self._window = float(
+            min(max(initial_concurrency, min_concurrency), max_concurrency)
+        )
+        self._slow_start = True
+        self._responses_since_decrease = 0
+        self._latency = None
+        self._baseline_latency = None
+        self._latency_samples = 0
+        self._lock = threading.Lock()
+
+    @property
+    def concurrency(self) -> int:
+        """Current number of operations allowed in-flight."""
+        return int(self._window)
+
+    def on_response(self, status_code: int, latency: Optional[float] = None) -> None:
+        """
+        Record the outcome of one HTTP request attempt.
+
+        :param status_code: HTTP status code of the response.
+        :param latency: Latency of the request in seconds, if known.
+        """
+        with self._lock:
+            self._responses_since_decrease += 1
+            if status_code in self.THROTTLED_STATUS_CODES:
+                self._decrease()
+                return
+            if latency is not None and self._is_latency_rising(latency):
+                self._decrease()
+                return
+            if status_code < 400:
+                self._increase()
+
+    def _is_latency_rising(self, latency: float) -> bool:
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += self.LATENCY_SMOOTHING * (latency - self._latency)
+        self._latency_samples += 1
+        if self._latency_samples < self.LATENCY_WARMUP_SAMPLES:
+            return False
+        if self._baseline_latency is None or self._latency < self._baseline_latency:
+            self._baseline_latency = self._latency
+        else:
+            # Let the baseline follow slow, permanent shifts in latency
+            self._baseline_latency += 0.001 * (self._latency - self._baseline_latency)
+        return self._latency > self.latency_factor * self._baseline_latency
+
+    def _increase(self) -> None:
+        if self._slow_start:
+            self._window += 1
+        else:
+            self._window += 1 / self._window
+        self._window = min(self._window, float(self.max_concurrency))
+
+    def _decrease(self) -> None:
+        # Only react once per window, as the responses of operations already
+        # in-flight carry the same congestion signal
+        if self._responses_since_decrease < self._window:
+            return
+        self._slow_start = False
+        self._responses_since_decrease = 0
+        self._window = max(
+            self._window * self.decrease_factor, float(self.min_concurrency)
+        )
+
+
+class Instrumentation(object):
+    def __init__(self) -> None:
+        """
+        Hooks called for the HTTP requests sent by :class:`VespaSync` and :class:`VespaAsync`, to record
+        latency, status codes, retries, bytes and connection pool wait time in a metrics system.
+
+        Pass an instance as `instrumentation` to :class:`Vespa`. The default hooks do nothing; override the ones you need,
+        or use :class:`OpenTelemetryInstrumentation`. Without instrumentation, requests are not timed or inspected.
+        Hooks are called from the threads and event loops sending the requests, so they must be thread-safe and fast.
+
+        Example usage::
+
+            from prometheus_client import Histogram
+
+            class PrometheusInstrumentation(Instrumentation):
+                latency = Histogram("vespa_request_seconds", "Vespa request latency", ["operation", "status"])
+
+                def on_request(self, operation, method, status_code, latency, bytes_sent, bytes_received):
+                    self.latency.labels(operation, str(status_code)).observe(latency)
+
+            app = Vespa(url="localhost", port=8080, instrumentation=PrometheusInstrumentation())
+        """
+
+    def on_request(
+        self,
+        operation: str,
+        method: str,
+        status_code: int,
+        latency: float,
+        bytes_sent: int,
+        bytes_received: int,
+    ) -> None:
+        """
+        Called when the response of a request attempt is received.
+
+        :param operation: "query", "feed", "update", "delete", "get", "visit" or "other".
+        :param method: HTTP method.
+        :param status_code: HTTP status code.
+        :param latency: Seconds from sending the request until the response is read, including the wait for a connection.
+        :param bytes_sent: Size of the request body as sent, after compression.
+        :param bytes_received: Size of the response body, after decompression.
+        """
+
+    def on_retry(self, operation: str, status_code: int, wait: float) -> None:
+        """
+        Called when a request is retried, e.g. after a 429 response.
+
+        :param operation: Operation of the request, as in :func:`on_request`.
+        :param status_code: Status code of the failed attempt, 599 if no response was received.
+        :param wait: Seconds waited before the retry.
+        """
+
+    def on_pool_wait(self, wait: float) -> None:
+        """
+        Called when a request got a connection, with the seconds it waited for one. For :class:`VespaAsync` this
+        includes the wait for a free HTTP/2 stream. A high wait means the client, not Vespa, is saturated.
+
+        :param wait: Seconds waited for a connection.
+        """
+
+
+def _import_opentelemetry_metrics():
+    try:
+        from opentelemetry import metrics
+    except ImportError:
+        raise ImportError(
+            "opentelemetry-api is required for OpenTelemetryInstrumentation. Install it with 'pip install opentelemetry-api'."
+        )
+    return metrics
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    def __init__(self, meter: Optional[Any] = None, prefix: str = "vespa.client"):
+        """
+        Instrumentation that records OpenTelemetry metrics, which can be exported to e.g. Prometheus
+        with the OpenTelemetry SDK.
+
+        Records the histograms `<prefix>.request.duration`, with the operation, HTTP method and status code as attributes,
+        `<prefix>.retry.wait` and `<prefix>.pool.wait`, and the counters `<prefix>.request.body.size`
+        and `<prefix>.response.body.size`.
+
+        Example usage::
+
+            app = Vespa(url="localhost", port=8080, instrumentation=OpenTelemetryInstrumentation())
+
+        :param meter: OpenTelemetry Meter to create the instruments with. Defaults to the meter "pyvespa" of the global meter provider.
+        :param prefix: Prefix of the instrument names.
+        """
+        super().__init__()
+        if meter is None:
+            meter = _import_opentelemetry_metrics().get_meter(
+                "pyvespa", vespa.__version__
+            )
+        self._duration = meter.create_histogram(
+            prefix + ".request.duration",
+            unit="s",
+            description="Latency of Vespa HTTP requests",
+        )
+        self._bytes_sent = meter.create_counter(
+            prefix + ".request.body.size",
+            unit="By",
+            description="Bytes sent in request bodies",
+        )
+        self._bytes_received = meter.create_counter(
+            prefix + ".response.body.size",
+            unit="By",
+            description="Bytes received in response bodies",
+        )
+        self._retry_wait = meter.create_histogram(
+            prefix + ".retry.wait",
+            unit="s",
+            description="Wait before retrying a Vespa HTTP request",
+        )
+        self._pool_wait = meter.create_histogram(
+            prefix + ".pool.wait",
+            unit="s",
+            description="Wait for a connection to Vespa",
+        )
+
+    def on_request(
+        self,
+        operation: str,
+        method: str,
+        status_code: int,
+        latency: float,
+        bytes_sent: int,
+        bytes_received: int,
+    ) -> None:
+        attributes = {
+            "vespa.operation": operation,
+            "http.request.method": method,
+            "http.response.status_code": status_code,
+        }
+        self._duration.record(latency, attributes)
+        self._bytes_sent.add(bytes_sent, {"vespa.operation": operation})
+        self._bytes_received.add(bytes_received, {"vespa.operation": operation})
+
+    def on_retry(self, operation: str, status_code: int, wait: float) -> None:
+        self._retry_wait.record(
+            wait,
+            {"vespa.operation": operation, "http.response.status_code": status_code},
+        )
+
+    def on_pool_wait(self, wait: float) -> None:
+        self._pool_wait.record(wait)
+
+
+def _pool_wait_timer(pool_class: type, instrumentation: Instrumentation) -> type:
+    # urllib3 connection pool class that reports the time spent waiting for a connection
+    class _TimedConnectionPool(pool_class):
+        def _get_conn(self, timeout: Optional[float] = None):
+            start = time.perf_counter()
+            try:
+                return super()._get_conn(timeout)
+            finally:
+                instrumentation.on_pool_wait(time.perf_counter() - start)
+
+    return _TimedConnectionPool
+
+
+class _InFlightWindow(object):
+    """Bounds the number of in-flight operations in a thread pool to a possibly changing limit."""
+
+    def __init__(self, limit: Callable[[], int]) -> None:
+        self._limit = limit
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self._limit())
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def join(self) -> None:
+        """Block until all acquired slots are released."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight == 0)
+
+
+class _AsyncInFlightWindow(object):
+    """Bounds the number of in-flight operations in an event loop to a possibly changing limit."""
+
+    def __init__(self, limit: Callable[[], int]) -> None:
+        self._limit = limit
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self._limit())
+            self._in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+
+def _document_key(
+    doc: Dict, schema: Optional[str], namespace: Optional[str]
+) -> Optional[Tuple]:
+    # Identifies the document of an input dict of the feed methods, None if it has no id
+    id = doc.get("id", None)
+    if id is None:
+        return None
+    return (
+        doc.get("namespace", namespace),
+        doc.get("schema", schema),
+        doc.get("groupname", None),
+        doc.get("number", None),
+        id,
+    )
+
+
+class _DocumentOrder(object):
+    """Holds back operations on a document while an earlier operation on the same document is in-flight."""
+
+    def __init__(self, schema: Optional[str], namespace: Optional[str]) -> None:
+        self.schema = schema
+        self.namespace = namespace
+        self._held: Dict[Tuple, deque] = {}
+        self._lock = threading.Lock()
+
+    def start(self, doc: Dict) -> bool:
+        """Return True if the operation can start now, else it is held back until :func:`done` releases it."""
+        key = _document_key(doc, self.schema, self.namespace)
+        if key is None:
+            return True
+        with self._lock:
+            held = self._held.get(key)
+            if held is None:
+                self._held[key] = deque()
+                return True
+            held.append(doc)
+            return False
+
+    def done(self, doc: Dict) -> Optional[Dict]:
+        """Mark the operation as completed, and return the next held back operation on the same document, if any."""
+        key = _document_key(doc, self.schema, self.namespace)
+        if key is None:
+            return None
+        with self._lock:
+            held = self._held[key]
+            if held:
+                return held.popleft()
+            del self._held[key]
+            return None
+
+
+class QueryCache(object):
+    def __init__(self, max_size: int = 1024, ttl: float = 10.0) -> None:
+        """
+        In-process cache of query responses with LRU eviction and a per-entry time to live.
+
+        Responses are keyed on a hash of the canonical JSON of the query body, the groupname and the query parameters,
+        so dicts with the same content hit the same entry regardless of key order. Only successful responses are cached.
+        Identical queries that are in-flight at the same time are merged into one request (single-flight).
+        The cache is thread-safe, and cached responses are shared between callers, so they should not be modified.
+
+        Example usage::
+
+            app = Vespa(url="localhost", port=8080, query_cache=QueryCache(max_size=10000, ttl=5))
+            response = app.query(body=body)  # Sent to Vespa
+            response = app.query(body=body)  # Served from the cache
+            response = app.query(body=body, use_cache=False)  # Bypasses the cache
+            print(app.query_cache.hits, app.query_cache.misses)
+
+        :param max_size: Maximum number of responses kept in the cache. The least recently used entry is evicted first.
+        :param ttl: Time to live in seconds for each entry.
+        """
+        if max_size < 1:
+            raise ValueError(f"max_size must be positive. Got {max_size} instead.")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, VespaQueryResponse]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._async_in_flight: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(body: Optional[Dict], groupname: Optional[str], params: Dict) -> str:
+        """Canonical key of a query, independent of the order of keys in `body` and `params`."""
+        canonical = json.dumps(
+            [body, groupname, params],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[VespaQueryResponse]:
+        """Return the cached response for `key`, or None if it is missing or expired."""
+        with self._lock:
+            return self._get(key)
+
+    def put(self, key: str, response: VespaQueryResponse) -> None:
+        """Cache `response` for `key` if it is successful, evicting the least recently used entry if full."""
+        if response.status_code != 200:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit and miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _get(self, key: str) -> Optional[VespaQueryResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, response = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], VespaQueryResponse]
+    ) -> VespaQueryResponse:
+        """Return the cached response for `key`, or compute it once for all concurrent callers."""
+        with self._lock:
+            response = self._get(key)
+            if response is not None:
+                self.hits += 1
+                return response
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.hits += 1
+        if not leader:
+            return future.result()
+        try:
+            response = compute()
+            self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def get_or_compute_async(
+        self, key: str, compute: Callable[[], Awaitable[VespaQueryResponse]]
+    ) -> VespaQueryResponse:
+        """Async version of :func:`get_or_compute`, merging concurrent callers within the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            response = self._get(key)
+            if response is not None:
+                self.hits += 1
+                return response
+            future = self._async_in_flight.get(key)
+            leader = future is None or future.get_loop() is not loop
+            if leader:
+                self.misses += 1
+                future = loop.create_future()
+                self._async_in_flight[key] = future
+            else:
+                self.hits += 1
+        if not leader:
+            return await asyncio.shield(future)
+        try:
+            response = await compute()
+            self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            # Avoid "exception was never retrieved" warnings when there are no followers
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                if self._async_in_flight.get(key) is future:
+                    del self._async_in_flight[key]
+
+
+class JsonCodec(object):
+    BACKENDS = ("auto", "orjson", "msgspec", "json")
+
+    def __init__(self, backend: str = "json") -> None:
+        """
+        JSON codec used to encode request bodies and decode responses.
+
+        Request bodies are serialized to bytes once, so compression works on the encoded bytes directly.
+        The default is the standard library `json` module. `orjson` and `msgspec` are faster, but opt-in, as they encode
+        some values differently: NaN and Infinity become `null` instead of `NaN` and `Infinity`, and values that are not
+        native JSON types, like `Decimal`, raise or are encoded differently. With `backend="auto"`, `orjson` is used
+        if installed, then `msgspec`, and `json` as the fallback.
+
+        Example usage::
+
+            app = Vespa(url="localhost", port=8080, json_codec=JsonCodec("orjson"))
+
+        :param backend: One of "auto", "orjson", "msgspec" or "json". Default is "json".
+        :raises ImportError: If the requested backend is not installed.
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(
+                f"backend must be one of {self.BACKENDS}. Got {backend} instead."
+            )
+        if backend == "auto":
+            for candidate in ("orjson", "msgspec"):
+                try:
+                    self._configure(candidate)
+                    return
+                except ImportError:
+                    pass
+            backend = "json"
+        self._configure(backend)
+
+    def _configure(self, backend: str) -> None:
+        if backend == "orjson":
+            import orjson
+
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            self.dumps: Callable[[Any], bytes] = lambda obj: orjson.dumps(
+                obj, option=option
+            )
+            self.loads: Callable[[Union[bytes, str]], Any] = orjson.loads
+        elif backend == "msgspec":
+            import msgspec
+
+            self.dumps = msgspec.json.Encoder().encode
+            self.loads = msgspec.json.Decoder().decode
+        else:
+            self.dumps = lambda obj: json.dumps(
+                obj, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            self.loads = json.loads
+        self.backend = backend
+
+    def __repr__(self) -> str:
+        return "JsonCodec({})".format(self.backend)
+
+
+class DeadLetterQueue(object):
+    def __init__(self, maxsize: int = 10000) -> None:
+        """
+        Bounded in-memory dead-letter sink for the operations of :func:`Vespa.feed_iterable`,
+        :func:`Vespa.feed_async_iterable` and :func:`Vespa.feed_file` that failed.
+
+        Each record is a Dict with the original 'operation', the 'status_code' and the 'error' (the json of the final response).
+        When the queue is full, new records are dropped and counted in `dropped`. The queue is thread-safe.
+
+        Example usage::
+
+            dead_letter = DeadLetterQueue(maxsize=1000)
+            app.feed_iterable(data, schema="schema_name", dead_letter=dead_letter)
+            for record in dead_letter:
+                print(record["operation"]["id"], record["status_code"], record["error"])
+            # Feed the failed operations again
+            app.feed_iterable(dead_letter.operations(), schema="schema_name")
+
+        :param maxsize: Maximum number of records kept.
+        """
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be positive. Got {maxsize} instead.")
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._records: deque = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._records))
+
+    def put(self, operation: Dict, response: VespaResponse) -> None:
+        """Record that `operation` failed with `response`."""
+        with self._lock:
+            if len(self._records) >= self.maxsize:
+                self.dropped += 1
+                return
+            self._records.append(_dead_letter_record(operation, response))
+
+    def get(self) -> Optional[Dict]:
+        """Remove and return the oldest record, or None if the queue is empty."""
+        with self._lock:
+            return self._records.popleft() if self._records else None
+
+    def operations(self) -> List[Dict]:
+        """The operations of the records, in the order they failed."""
+        with self._lock:
+            return [record["operation"] for record in self._records]
+
+
+def _dead_letter_record(operation: Dict, response: VespaResponse) -> Dict:
+    return {
+        "operation": operation,
+        "status_code": response.status_code,
+        "error": response.json,
+    }
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Codecs of the worker processes used by feed_iterable(encode_processes=...), one per backend
+_PROCESS_CODECS: Dict[str, JsonCodec] = {}
+
+
+def _compress_body(
+    content: bytes,
+    compress: Union[str, bool],
+    encoding: str,
+    level: int,
+    compress_larger_than: int,
+) -> Tuple[bytes, Optional[str]]:
+    # Returns the possibly compressed body and the content encoding, or None if not compressed
+    if compress is True or (compress == "auto" and len(content) > compress_larger_than):
+        return _compress_bytes(content, encoding, level), encoding
+    return content, None
+
+
+def _encode_request_body(
+    backend: str,
+    body: Dict,
+    compress: Union[str, bool],
+    encoding: str,
+    level: int,
+    compress_larger_than: int,
+) -> Tuple[bytes, Optional[str], int]:
+    # Runs in a worker process: serialize and possibly compress a request body.
+    # Returns the encoded bytes, the content encoding and the size before compression.
+    codec = _PROCESS_CODECS.get(backend)
+    if codec is None:
+        codec = _PROCESS_CODECS[backend] = JsonCodec(backend)
+    content = codec.dumps(body)
+    return (
+        *_compress_body(content, compress, encoding, level, compress_larger_than),
+        len(content),
+    )
+
+
+def _start_encoder(processes: int) -> concurrent.futures.ProcessPoolExecutor:
+    # Worker processes for feed_iterable(encode_processes=...). Forking a process that
+    # already runs I/O threads can deadlock the child on a lock held by another thread,
+    # so use forkserver where available, else spawn, and start every worker up front,
+    # before the feed starts its threads.
+    method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    encoder = concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context(method)
+    )
+    try:
+        for future in [encoder.submit(os.getpid) for _ in range(processes)]:
+            future.result()
+    except BaseException:
+        encoder.shutdown()
+        raise
+    return encoder
+
+
+def _exception_status_code(exception: BaseException) -> int:
+    # Status code of a failed operation. raise_for_status raises VespaError or HTTPError
+    # from the HTTPError with the response, other exceptions map to 599.
+    while exception is not None:
+        status_code = getattr(getattr(exception, "response", None), "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+        exception = exception.__cause__
+    return 599
+
+
+class _ProgressReporter(object):
+    """Calls a progress hook with the statistics of a feed at most every `interval` seconds."""
+
+    def __init__(
+        self,
+        progress: Optional[Callable[[Any], None]],
+        stats: Union[FeedStats, BulkOperationSummary],
+        interval: float,
+    ) -> None:
+        self.progress = progress
+        self.stats = stats
+        self.interval = interval
+        self._next_report = time.monotonic() + interval
+
+    def maybe_report(self) -> None:
+        if self.progress is not None and time.monotonic() >= self._next_report:
+            self._next_report = time.monotonic() + self.interval
+            self.report()
+
+    def report(self) -> None:
+        if self.progress is None:
+            return
+        try:
+            self.progress(self.stats)
+        except Exception as e:
+            print("Exception in progress hook", file=sys.stderr)
+            traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+
+
+FEED_OPERATION_TYPES: Tuple[str, ...] = ("feed", "update", "delete")
+
+
+def _complete_operation(
+    doc: Dict,
+    response: Union[VespaResponse, Exception],
+    operation_type: str,
+    callback: Optional[Callable[[VespaResponse, str], None]],
+    on_complete: Optional[Callable[[Dict, VespaResponse], None]] = None,
+) -> None:
+    # Reports a completed operation of the feed methods. A failed operation is reported as a
+    # response with the status code of the exception. Exceptions of the user callback are
+    # printed, while those of `on_complete` abort the feed.
+    id = doc.get("id", None)
+    if isinstance(response, Exception):
+        response = VespaResponse(
+            status_code=_exception_status_code(response),
+            json={
+                "Exception": str(response),
+                "id": id,
+                "message": "Exception during feed_data_point",
+            },
+            url="n/a",
+            operation_type=doc.get("operation", operation_type),
+        )
+    if callback is not None:
+        try:
+            callback(response, id)
+        except Exception as e:
+            print(f"Exception in user callback for id {id}", file=sys.stderr)
+            traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+    if on_complete is not None:
+        on_complete(doc, response)
+
+
+def _invalid_operation_response(
+    doc: Dict, operation_type: str
+) -> Optional[VespaResponse]:
+    # Returns a 499 response for an input dict of the feed methods that can not be sent, else None
+    id = doc.get("id", None)
+    operation_type = doc.get("operation", operation_type)
+    if id is None:
+        message = "Missing id in input dict"
+    elif operation_type not in FEED_OPERATION_TYPES:
+        message = "Invalid operation type in input dict: {}".format(operation_type)
+    elif doc.get("fields", None) is None and operation_type != "delete":
+        message = "Missing fields in input dict"
+    else:
+        return None
+    return VespaResponse(
+        status_code=499,
+        json={"id": id, "message": message},
+        url="n/a",
+        operation_type=operation_type,
+    )
+
+
+# Arguments of update_data that are not HTTP request parameters, and must not be
+# forwarded to feed_data_point or delete_data
+_UPDATE_ARGUMENTS = ("create", "auto_assign")
+
+
+def _dispatch_operation(
+    session: Union["VespaSync", "VespaAsync"],
+    doc: Dict,
+    operation_type: str,
+    schema: Optional[str],
+    namespace: Optional[str],
+    kwargs: Dict,
+    stats: Optional[FeedStats] = None,
+):
+    # Calls the session operation for an input dict of the feed methods. Keys of the input dict
+    # take precedence over the arguments of the feed. Returns a VespaResponse for VespaSync
+    # and a coroutine for VespaAsync. Feed arguments that only apply to updates are
+    # dropped for the other operations of a mixed feed. `stats` records the requests of the
+    # operation on VespaAsync, VespaSync records them in the stats of the session.
+    operation_type = doc.get("operation", operation_type)
+    if operation_type != "update":
+        kwargs = {k: v for k, v in kwargs.items() if k not in _UPDATE_ARGUMENTS}
+    operation_kwargs = dict(
+        kwargs,
+        schema=doc.get("schema", schema),
+        namespace=doc.get("namespace", namespace),
+        groupname=doc.get("groupname", None),
+        data_id=doc["id"],
+    )
+    if "number" in doc:
+        operation_kwargs["number"] = doc["number"]
+    if stats is not None:
+        operation_kwargs["stats"] = stats
+    if "condition" in doc:
+        operation_kwargs["condition"] = doc["condition"]
+    if operation_type == "feed":
+        return session.feed_data_point(fields=doc["fields"], **operation_kwargs)
+    if operation_type == "update":
+        for key in _UPDATE_ARGUMENTS:
+            if key in doc:
+                operation_kwargs[key] = doc[key]
+        return session.update_data(fields=doc["fields"], **operation_kwargs)
+    return session.delete_data(**operation_kwargs)
+
+
+async def _feed_async_operations(
+    async_session: "VespaAsync",
+    iter: Union[Iterable[Dict], AsyncIterable[Dict]],
+    schema: Optional[str],
+    namespace: Optional[str],
+    operation_type: str,
+    max_queue_size: int,
+    concurrency: Callable[[], int],
+    preserve_order: bool,
+    stats: FeedStats,
+    handle_response: Callable[[Dict, Union[VespaResponse, Exception]], None],
+    kwargs: Dict,
+) -> None:
+    # Sliding window feed of the operations in `iter` through `async_session`, in the running
+    # event loop. A new request is started as soon as one completes, and the next operation is
+    # only read from `iter` when fewer than `max_queue_size` operations are pending.
+    window = _AsyncInFlightWindow(limit=concurrency)
+    # Operations read from `iter` and not yet completed, including held back operations
+    pending = _AsyncInFlightWindow(limit=lambda: max_queue_size)
+    order = (
+        _DocumentOrder(schema=schema, namespace=namespace) if preserve_order else None
+    )
+    tasks: Set[asyncio.Task] = set()
+    # Errors raised while handling results, re-raised once the started operations completed
+    handler_errors: List[BaseException] = []
+
+    async def handle_result(coroutine: Coroutine, doc: Dict):
+        # Wrapper around the operation to handle exceptions and call the user callback.
+        # The slot in the in-flight window is released as soon as the result is handled,
+        # or taken over by the next operation held back on the same document, also if
+        # handling the result fails.
+        next_doc = None
+        try:
+            started = stats.on_operation_start()
+            try:
+                response = await coroutine
+            except Exception as e:
+                stats.on_operation(_exception_status_code(e), started)
+                response = e
+            else:
+                stats.on_operation(response.status_code, started)
+            handle_response(doc, response)
+        except BaseException as e:
+            handler_errors.append(e)
+        finally:
+            if order is not None:
+                next_doc = order.done(doc)
+            if next_doc is not None:
+                start(next_doc)
+            else:
+                await window.release()
+            await pending.release()
+
+    def start(doc: Dict) -> None:
+        coroutine = _dispatch_operation(
+            async_session, doc, operation_type, schema, namespace, kwargs, stats
+        )
+        task = asyncio.create_task(handle_result(coroutine, doc))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def submit(doc: Dict) -> None:
+        response = _invalid_operation_response(doc, operation_type)
+        if response is not None:
+            stats.on_operation(response.status_code)
+            handle_response(doc, response)
+            return
+        # Held back operations wait for the earlier operation on the same
+        # document without a slot in the window, so other documents are not stalled
+        await pending.acquire()
+        if order is None or order.start(doc):
+            await window.acquire()
+            start(doc)
+
+    try:
+        if hasattr(iter, "__aiter__"):
+            async for doc in iter:
+                if handler_errors:
+                    break
+                await submit(doc)
+        else:
+            for doc in iter:
+                if handler_errors:
+                    break
+                await submit(doc)
+    finally:
+        # Held back operations are started as earlier operations complete
+        while tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    if handler_errors:
+        raise handler_errors[0]
+
+
+FEED_FILE_BUFFER_SIZE: int = 1 << 20
+
+
+def _parse_document_id(
+    document_id: str,
+) -> Tuple[str, str, Optional[str], Optional[str], str]:
+    # Splits id:<namespace>:<document-type>:<key/value-pairs>:<user-specified> into
+    # namespace, schema, group name, number and the user-specified part
+    parts = str(document_id).split(":", 4)
+    if len(parts) != 5 or parts[0] != "id" or not parts[4]:
+        raise ValueError("Invalid document id: {}".format(document_id))
+    _, namespace, schema, key_values, data_id = parts
+    if not key_values:
+        return namespace, schema, None, None, data_id
+    if key_values.startswith("g="):
+        return namespace, schema, key_values[2:], None, data_id
+    if key_values.startswith("n=") and key_values[2:].isdigit():
+        return namespace, schema, None, key_values[2:], data_id
+    raise ValueError(
+        "Unsupported key/value pair in document id: {}".format(document_id)
+    )
+
+
+def _feed_operation_from_json(operation: Dict) -> Dict:
+    # Converts an operation in the Vespa JSON feed format to an input dict of the feed methods
+    for key, operation_type in (
+        ("put", "feed"),
+        ("update", "update"),
+        ("remove", "delete"),
+        ("id", "feed"),
+    ):
+        if key in operation:
+            break
+    else:
+        raise ValueError("Expected one of 'put', 'update' or 'remove'")
+    namespace, schema, groupname, number, data_id = _parse_document_id(operation[key])
+    doc = {
+        "operation": operation_type,
+        "id": data_id,
+        "schema": schema,
+        "namespace": namespace,
+    }
+    if groupname is not None:
+        doc["groupname"] = groupname
+    if number is not None:
+        doc["number"] = number
+    if "fields" in operation:
+        doc["fields"] = operation["fields"]
+    if "condition" in operation:
+        doc["condition"] = operation["condition"]
+    if operation_type == "update":
+        # Fields of updates in the feed format already hold the update operations
+        doc["create"] = operation.get("create", False)
+        doc["auto_assign"] = False
+    return doc
+
+
+def _open_feed_file(path: str, offset: int = 0) -> IO[bytes]:
+    # Opens a JSONL feed file, optionally compressed, for buffered reading from `offset`,
+    # which is a position in the uncompressed content
+    if path.endswith(".gz"):
+        f = gzip.open(path, "rb")
+    elif path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                "zstandard is required to read .zst files. Install it with 'pip install zstandard'."
+            )
+        f = io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True),
+            buffer_size=FEED_FILE_BUFFER_SIZE,
+        )
+    else:
+        f = open(path, "rb", buffering=FEED_FILE_BUFFER_SIZE)
+        f.seek(offset)
+        return f
+    # Compressed streams can only be skipped forward by decompressing
+    remaining = offset
+    while remaining > 0:
+        chunk = f.read(min(remaining, FEED_FILE_BUFFER_SIZE))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+    return f
+
+
+def _write_json_atomically(path: str, data: Any) -> None:
+    # Write to a temporary file and rename it, so a killed job never leaves a partial file
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_file, path)
+
+
+class _FeedCheckpoint(object):
+    def __init__(
+        self,
+        path: str,
+        checkpoint_file: Optional[str],
+        offset: int = 0,
+        interval: float = 10.0,
+    ) -> None:
+        # Tracks the byte offset of a feed file up to which every operation has completed,
+        # and writes it to `checkpoint_file` at most every `interval` seconds.
+        self.path = os.path.abspath(path)
+        self.checkpoint_file = checkpoint_file
+        self.offset = offset
+        self.interval = interval
+        self._pending: deque = deque()  # [end offset, completed] in file order
+        self._entries: Dict[int, List] = {}
+        self._lock = threading.Lock()
+        self._last_write = time.monotonic()
+
+    @staticmethod
+    def read(checkpoint_file: str, path: str) -> int:
+        if not os.path.exists(checkpoint_file):
+            return 0
+        with open(checkpoint_file) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("path") != os.path.abspath(path):
+            raise ValueError(
+                "Checkpoint file {} belongs to {}, not {}.".format(
+                    checkpoint_file, checkpoint.get("path"), os.path.abspath(path)
+                )
+            )
+        return checkpoint["offset"]
+
+    def issue(self, token: object, end_offset: int) -> None:
+        with self._lock:
+            entry = [end_offset, False]
+            self._pending.append(entry)
+            self._entries[id(token)] = entry
+
+    def complete(self, token: object) -> None:
+        with self._lock:
+            self._entries.pop(id(token))[1] = True
+            while self._pending and self._pending[0][1]:
+                self.offset = self._pending.popleft()[0]
+            if (
+                self.checkpoint_file is not None
+                and time.monotonic() - self._last_write >= self.interval
+            ):
+                try:
+                    self._write()
+                except OSError as e:
+                    # Keep feeding, the next write or the final write may succeed
+                    logging.warning(
+                        "Failed to write checkpoint {}: {}".format(
+                            self.checkpoint_file, e
+                        )
+                    )
+
+    def write(self) -> None:
+        if self.checkpoint_file is None:
+            return
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        _write_json_atomically(
+            self.checkpoint_file, {"path": self.path, "offset": self.offset}
+        )
+        self._last_write = time.monotonic()
+
+
+class _DeadLetterFile(object):
+    def __init__(self, path: str, codec: JsonCodec) -> None:
+        # Appends dead-letter records to a JSONL file, created on the first record
+        self.path = path
+        self.codec = codec
+        self._file: Optional[IO[bytes]] = None
+        self._lock = threading.Lock()
+
+    def put(self, operation: Dict, response: VespaResponse) -> None:
+        line = self.codec.dumps(_dead_letter_record(operation, response)) + b"\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(line)
+            # Failures are rare, flush so records survive a killed job
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _is_transient_status(status_code: int) -> bool:
+    # Failures that may succeed when sent again: throttling, server errors and failed requests
+    return status_code == 429 or status_code >= 500
+
+
+class _DeadLetter(object):
+    def __init__(
+        self,
+        sink: Optional[Union[DeadLetterQueue, _DeadLetterFile]],
+        redrive: bool,
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> None:
+        # Routes failed operations to `sink`, holding transient failures back for a re-drive pass.
+        # Held failures are kept per document, so a later operation on the same document that
+        # completes without being held back supersedes them, and they go to `sink` instead.
+        self.sink = sink
+        self.redrive = redrive
+        self.schema = schema
+        self.namespace = namespace
+        self._held: Dict[Any, List[Tuple[Dict, VespaResponse]]] = {}
+        self._lock = threading.Lock()
+
+    def complete(self, doc: Dict, response: VespaResponse, final: bool = False) -> None:
+        superseded: List[Tuple[Dict, VespaResponse]] = []
+        if self.redrive and not final:
+            key = _document_key(doc, self.schema, self.namespace)
+            if key is None:
+                key = object()
+            with self._lock:
+                if not response.is_successful() and _is_transient_status(
+                    response.status_code
+                ):
+                    self._held.setdefault(key, []).append((doc, response))
+                    return
+                superseded = self._held.pop(key, [])
+        for held_doc, held_response in superseded:
+            self._put(held_doc, held_response)
+        if not response.is_successful():
+            self._put(doc, response)
+
+    def _put(self, doc: Dict, response: VespaResponse) -> None:
+        if self.sink is None:
+            return
+        try:
+            self.sink.put(doc, response)
+        except Exception as e:
+            print(
+                "Exception in dead-letter sink for id {}".format(doc.get("id")),
+                file=sys.stderr,
+            )
+            traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+
+    def take_held(self) -> List[Dict]:
+        # Held operations of a document are returned in input order
+        with self._lock:
+            held, self._held = self._held, {}
+        return [doc for operations in held.values() for doc, _ in operations]
+
+    def release_held(self) -> None:
+        # Operations that were never re-driven go to the sink with their first failure
+        with self._lock:
+            held, self._held = self._held, {}
+        for operations in held.values():
+            for doc, response in operations:
+                self._put(doc, response)
+
+
+class _SlicePrefetcher(object):
+    def __init__(
+        self,
+        visit_slice: Callable[[int], Iterable[VespaVisitResponse]],
+        slices: int,
+        read_ahead: int,
+        merged: bool,
+    ) -> None:
+        # Fetches the pages of each slice in its own thread into a bounded queue, so slices
+        # are visited concurrently while at most `read_ahead` pages per slice are buffered.
+        # With `merged`, all slices share one queue of `read_ahead * slices` pages.
+        if read_ahead < 1:
+            raise ValueError(f"read_ahead must be positive. Got {read_ahead} instead.")
+        self.slices = slices
+        self.stopped = [threading.Event() for _ in range(slices)]
+        self.queues = (
+            [Queue(maxsize=read_ahead * slices)]
+            if merged
+            else [Queue(maxsize=read_ahead) for _ in range(slices)]
+        )
+        # Daemon threads, so pages that are never consumed do not block the interpreter from exiting
+        self.threads = [
+            threading.Thread(
+                target=self._fetch,
+                args=(visit_slice, slice_id, self.queues[0 if merged else slice_id]),
+                daemon=True,
+            )
+            for slice_id in range(slices)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _put(self, queue: Queue, slice_id: int, item: Any) -> bool:
+        # Blocks while the queue is full, returns False if the slice is stopped
+        while not self.stopped[slice_id].is_set():
+            try:
+                queue.put((slice_id, item), timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _fetch(
+        self,
+        visit_slice: Callable[[int], Iterable[VespaVisitResponse]],
+        slice_id: int,
+        queue: Queue,
+    ) -> None:
+        try:
+            for page in visit_slice(slice_id):
+                if not self._put(queue, slice_id, page):
+                    return
+        except Exception as e:
+            self._put(queue, slice_id, e)
+            return
+        self._put(queue, slice_id, None)
+
+    def pages(
+        self, queue_index: int = 0
+    ) -> Generator[Tuple[int, VespaVisitResponse], None, None]:
+        """Yields (slice id, page) from a queue until its slices are done, and raises the error of a failed slice."""
+        queue = self.queues[queue_index]
+        remaining = self.slices if len(self.queues) == 1 else 1
+        while remaining:
+            slice_id, item = queue.get()
+            if item is None:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield slice_id, item
+
+    def stop(self, slice_id: Optional[int] = None) -> None:
+        for event in self.stopped if slice_id is None else [self.stopped[slice_id]]:
+            event.set()
+
+
+class _VisitCheckpoint(object):
+    def __init__(self, checkpoint_file: str, visit: Dict[str, Any]) -> None:
+        # Persists the continuation token of each slice of a visit, None for slices that are done.
+        # `visit` identifies the visit, so a checkpoint is not resumed by a different visit.
+        self.checkpoint_file = checkpoint_file
+        self.visit = visit
+        self.continuations: Dict[int, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def read(self) -> Dict[int, Optional[str]]:
+        if not os.path.exists(self.checkpoint_file):
+            return {}
+        with open(self.checkpoint_file) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("visit") != self.visit:
+            raise ValueError(
+                "Checkpoint file {} belongs to the visit {}, not {}.".format(
+                    self.checkpoint_file, checkpoint.get("visit"), self.visit
+                )
+            )
+        self.continuations = {
+            int(slice_id): continuation
+            for slice_id, continuation in checkpoint["continuations"].items()
+        }
+        return dict(self.continuations)
+
+    def update(self, slice_id: int, continuation: Optional[str]) -> None:
+        with self._lock:
+            self.continuations[slice_id] = continuation
+            _write_json_atomically(
+                self.checkpoint_file,
+                {"visit": self.visit, "continuations": self.continuations},
+            )
+
+
+def _visit_checkpoint(
+    checkpoint_file: Optional[str],
+    content_cluster_name: str,
+    schema: Optional[str],
+    namespace: Optional[str],
+    slices: int,
+    selection: str,
+) -> Tuple[Optional[_VisitCheckpoint], Dict[int, Optional[str]]]:
+    # Returns the checkpoint of a visit, and the continuations to resume from
+    if checkpoint_file is None:
+        return None, {}
+    checkpoint = _VisitCheckpoint(
+        checkpoint_file,
+        visit={
+            "cluster": content_cluster_name,
+            "schema": schema,
+            "namespace": namespace or schema,
+            "selection": selection,
+            "slices": slices,
+        },
+    )
+    return checkpoint, checkpoint.read()
+
+
+def _selection_path(schema: Optional[str], namespace: Optional[str]) -> str:
+    # document/v1 path of a selection-based operation, across all document types without a schema
+    if not schema:
+        return ""
+    return "{}/{}/docid/".format(namespace or schema, schema)
+
+
+def _update_fields_body(fields: Dict, auto_assign: bool) -> Dict:
+    # Body of a partial update, as in update_data
+    if auto_assign:
+        return {"fields": {k: {"assign": v} for k, v in fields.items()}}
+    # Can not send 'id' in fields for partial update
+    return {"fields": {k: v for k, v in fields.items() if k != "id"}}
+
+
+class _DocumentRateLimiter(object):
+    def __init__(self, documents_per_second: float) -> None:
+        # Spaces the requests of all slices of a bulk operation so the documents they process
+        # stay below `documents_per_second` on average
+        if documents_per_second <= 0:
+            raise ValueError("documents_per_second must be positive")
+        self.documents_per_second = documents_per_second
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self, documents: int) -> float:
+        # Charges `documents` processed documents, returns the seconds to wait before the next request
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now) + documents / self.documents_per_second
+            return self._next - now
+
+
+class _SelectionOperation(object):
+    def __init__(
+        self,
+        operation: str,
+        content_cluster_name: str,
+        selection: str,
+        slices: int,
+        max_documents_per_second: Optional[float],
+        progress: Optional[Callable[[BulkOperationSummary], None]],
+        params: Dict,
+    ) -> None:
+        # Policy of a selection-based delete or update, shared by VespaSync and VespaAsync,
+        # which only send the requests of each slice. Each slice follows its continuation
+        # until done, and gives up on a non-transient error, or after three errors when more
+        # than one in ten of its requests failed.
+        self.operation = operation
+        self.summary = BulkOperationSummary(operation, selection, slices)
+        self.slices = [
+            _SelectionSlice(
+                self,
+                slice_id,
+                {
+                    "cluster": content_cluster_name,
+                    "selection": selection,
+                    "slices": slices,
+                    "sliceId": slice_id,
+                    **params,
+                },
+            )
+            for slice_id in range(slices)
+        ]
+        self.limiter = (
+            _DocumentRateLimiter(max_documents_per_second)
+            if max_documents_per_second is not None
+            else None
+        )
+        self.reporter = _ProgressReporter(progress, self.summary, interval=0)
+        self.report_lock = threading.Lock()
+
+
+class _SelectionSlice(object):
+    def __init__(
+        self, operation: _SelectionOperation, slice_id: int, params: Dict
+    ) -> None:
+        # State of one slice of a _SelectionOperation. `params` are the request parameters
+        # of the next request, including the continuation
+        self.operation = operation
+        self.slice_id = slice_id
+        self.params = params
+        self.requests = 0
+        self.errors = 0
+
+    def on_request(self) -> None:
+        self.requests += 1
+        self.operation.summary.on_request()
+
+    def on_error(self, status_code: int, error: str) -> Optional[float]:
+        # Returns the seconds to wait before sending the request again, None if the slice gives up
+        self.errors += 1
+        if not _is_transient_status(status_code) or (
+            self.errors >= 3 and self.errors / self.requests > 0.1
+        ):
+            logging.error(
+                "Slice {} of {} failed: {}".format(
+                    self.slice_id, self.operation.operation, error
+                )
+            )
+            self.operation.summary.on_slice_failed(self.slice_id, error)
+            return None
+        return 1.0
+
+    def on_result(self, result: Dict) -> Optional[float]:
+        # Returns the seconds to wait before requesting the next page, None if the slice is done
+        summary = self.operation.summary
+        documents = result.get("documentCount", 0)
+        summary.on_page(self.slice_id, documents)
+        with self.operation.report_lock:
+            self.operation.reporter.report()
+        if "continuation" not in result:
+            summary.on_slice_done(self.slice_id)
+            return None
+        self.params["continuation"] = result["continuation"]
+        limiter = self.operation.limiter
+        return limiter.delay(documents) if limiter is not None else 0.0
+
+
 class Vespa(object):
     def __init__(
         self,
@@ -87,6 +1658,9 @@ class Vespa(object):
         vespa_cloud_secret_token: Optional[str] = None,
         output_file: IO = sys.stdout,
         application_package: Optional[ApplicationPackage] = None,
+        query_cache: Optional[QueryCache] = None,
+        json_codec: Optional[JsonCodec] = None,
+        instrumentation: Optional[Instrumentation] = None,
     ) -> None:
         """
         Establish a connection with an existing Vespa application.
@@ -100,6 +1674,9 @@ class Vespa(object):
         :param vespa_cloud_secret_token: Vespa Cloud data plane secret token.
         :param output_file: Output file to write output messages.
         :param application_package: Application package definition used to deploy the application.
+        :param query_cache: Optional :class:`QueryCache` used by the query methods of this instance and its sync and async layers.
+        :param json_codec: :class:`JsonCodec` used to encode request bodies and decode responses. Defaults to `JsonCodec("json")`, the standard library `json` module.
+        :param instrumentation: Optional :class:`Instrumentation` notified of every HTTP request of the sync and async layers of this instance.
 
         >>> Vespa(url = "https://cord19.vespa.ai")  # doctest: +SKIP
 
@@ -119,6 +1696,9 @@ class Vespa(object):
         self.key = key
         self.vespa_cloud_secret_token = vespa_cloud_secret_token
         self._application_package = application_package
+        self.query_cache = query_cache
+        self.json_codec = json_codec if json_codec is not None else JsonCodec()
+        self.instrumentation = instrumentation
         self.pyvespa_version = vespa.__version__
         self.base_headers = {"User-Agent": f"pyvespa/{self.pyvespa_version}"}
         if port is None:
@@ -133,6 +1713,73 @@ class Vespa(object):
             )
         else:
             self.auth_method = "mtls"
+        self._sync_pool: Optional[VespaSync] = None
+        self._sync_pool_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open_connection_pool(
+        self, connections: int = 8, compress: Union[str, bool] = "auto"
+    ) -> "Vespa":
+        """
+        Open a long-lived connection pool owned by this instance.
+
+        While the pool is open, :func:`query`, :func:`get_data`, :func:`get_many`, :func:`feed_data_point`, :func:`update_data`,
+        :func:`delete_data`, :func:`get_application_status`, :func:`get_model_endpoint` and :func:`predict` reuse
+        its warm connections instead of creating a new session for every call. The pool is safe to share across threads,
+        and is closed by :func:`close`, when leaving the `with` block, or when the instance is garbage collected.
+
+        Example usage::
+
+            with Vespa(url="localhost", port=8080).open_connection_pool(connections=16) as app:
+                response = app.query(body=body)
+
+        :param connections: Maximum number of connections kept in the pool.
+        :param compress (Union[str, bool], optional): Whether to compress the request body. Defaults to "auto", which will compress if the body is larger than 1024 bytes.
+            Calls that ask for a different compression setting do not use the pool.
+        :return: The Vespa instance, to allow chaining.
+        """
+        with self._sync_pool_lock:
+            if self._sync_pool is None:
+                pool = VespaSync(
+                    app=self,
+                    pool_maxsize=connections,
+                    pool_connections=connections,
+                    compress=compress,
+                )
+                session = pool._open_http_session()
+                self._sync_pool_finalizer = weakref.finalize(self, session.close)
+                self._sync_pool = pool
+        return self
+
+    def close(self) -> None:
+        """Close the connection pool opened by :func:`open_connection_pool`, if any."""
+        with self._sync_pool_lock:
+            if self._sync_pool is None:
+                return
+            self._sync_pool_finalizer()
+            self._sync_pool = None
+
+    @contextmanager
+    def _sync_session(
+        self, connections: int = 1, compress: Union[str, bool] = "auto"
+    ) -> Generator["VespaSync", None, None]:
+        # Reuse the connection pool if one is open, otherwise use a short-lived session
+        pool = self._sync_pool
+        if pool is not None and pool.compress == compress:
+            yield pool
+            return
+        with VespaSync(
+            app=self,
+            pool_connections=connections,
+            pool_maxsize=connections,
+            compress=compress,
+        ) as sync_app:
+            yield sync_app
 
     def asyncio(
         self,
@@ -176,6 +1823,7 @@ class Vespa(object):
         self,
         connections: Optional[int] = 8,
         compress: Union[str, bool] = "auto",
+        **kwargs,
     ) -> "VespaSync":
         """
         Access Vespa synchronous connection layer.
@@ -191,13 +1839,15 @@ class Vespa(object):
         :param connections: Number of allowed concurrent connections
         :param total_timeout: Total timeout in secs.
         :param compress (Union[str, bool], optional): Whether to compress the request body. Defaults to "auto", which will compress if the body is larger than 1024 bytes.
-        :return: Instance of Vespa asynchronous layer.
+        :param kwargs: Additional arguments to be passed to :class:`VespaSync`, such as `compress_level`.
+        :return: Instance of Vespa synchronous layer.
         """
         return VespaSync(
             app=self,
             pool_connections=connections,
             pool_maxsize=connections,
             compress=compress,
+            **kwargs,
         )
 
     @staticmethod
@@ -288,18 +1938,22 @@ class Vespa(object):
         :return:
         """
         endpoint = f"{self.end_point}/ApplicationStatus"
-        with self.syncio() as sync_sess:
+        with self._sync_session() as sync_sess:
             response = sync_sess.http_session.get(endpoint)
         return response
 
     def get_model_endpoint(self, model_id: Optional[str] = None) -> Optional[Response]:
         """Get stateless model evaluation endpoints."""
 
-        with VespaSync(self, pool_connections=1, pool_maxsize=1) as sync_app:
+        with self._sync_session() as sync_app:
             return sync_app.get_model_endpoint(model_id=model_id)
 
     def query(
-        self, body: Optional[Dict] = None, groupname: str = None, **kwargs
+        self,
+        body: Optional[Dict] = None,
+        groupname: str = None,
+        use_cache: bool = True,
+        **kwargs,
     ) -> VespaQueryResponse:
         """
         Send a query request to the Vespa application.
@@ -308,12 +1962,23 @@ class Vespa(object):
 
         :param body: Dict containing request parameters.
         :param groupname: The groupname used with streaming search.
+        :param use_cache: Whether to use the query cache, if one is configured. Default is True.
         :param kwargs: Extra Vespa Query API parameters.
         :return: The response from the Vespa application.
         """
-        # Use one connection as this is a single query
-        with VespaSync(self, pool_maxsize=1, pool_connections=1) as sync_app:
-            return sync_app.query(body=body, groupname=groupname, **kwargs)
+        if self.query_cache is not None and use_cache:
+            # Only open a session on a cache miss
+            return self.query_cache.get_or_compute(
+                QueryCache.key(body, groupname, kwargs),
+                lambda: self.query(
+                    body=body, groupname=groupname, use_cache=False, **kwargs
+                ),
+            )
+        # Use one connection as this is a single query, unless a connection pool is open
+        with self._sync_session() as sync_app:
+            return sync_app.query(
+                body=body, groupname=groupname, use_cache=False, **kwargs
+            )
 
     def feed_data_point(
         self,
@@ -327,7 +1992,7 @@ class Vespa(object):
     ) -> VespaResponse:
         """
         Feed a data point to a Vespa app. Will create a new VespaSync with
-        connection overhead.
+        connection overhead, unless a connection pool is open, see :func:`open_connection_pool`.
 
         Example usage::
 
@@ -354,11 +2019,9 @@ class Vespa(object):
         """
         if not namespace:
             namespace = schema
-        # Use low low connection settings to avoid too much overhead for a
-        # single data point
-        with VespaSync(
-            app=self, pool_connections=1, pool_maxsize=1, compress=compress
-        ) as sync_app:
+        # Use low connection settings to avoid too much overhead for a
+        # single data point, unless a connection pool is open
+        with self._sync_session(compress=compress) as sync_app:
             return sync_app.feed_data_point(
                 schema=schema,
                 data_id=data_id,
@@ -379,13 +2042,27 @@ class Vespa(object):
         max_workers: int = 8,
         max_connections: int = 16,
         compress: Union[str, bool] = "auto",
+        adaptive_concurrency: bool = False,
+        encode_processes: Optional[int] = None,
+        preserve_order: bool = True,
+        progress: Optional[Callable[[FeedStats], None]] = None,
+        progress_interval: float = 10.0,
+        dead_letter: Optional[Union[str, DeadLetterQueue]] = None,
+        redrive: bool = False,
         **kwargs,
-    ):
+    ) -> FeedStats:
         """
         Feed data from an Iterable of Dict with the keys 'id' and 'fields' to be used in the :func:`feed_data_point`.
 
-        Uses a queue to feed data in parallel with a thread pool. The result of each operation is forwarded
-        to the user provided callback function that can process the returned `VespaResponse`.
+        Feeds data in parallel with a thread pool, keeping at most `max_queue_size` operations in-flight. The result
+        of each operation is forwarded to the user provided callback function that can process the returned `VespaResponse`.
+        Callbacks are invoked from a single thread as operations complete. If `iter` raises, the operations already read are
+        completed and reported before the exception is re-raised.
+
+        Each Dict can override the feed arguments for its own operation with the keys 'operation' (`feed`, `update` or
+        `delete`), 'schema', 'namespace', 'groupname' and 'number', and set 'condition' (test-and-set condition), and 'create' and
+        'auto_assign' for updates, so a mix of puts, partial updates and removes can be fed through one window.
+        Operations on the same document are sent in input order, one at a time, while different documents are fed in parallel.
 
         Example usage::
 
@@ -398,16 +2075,43 @@ class Vespa(object):
                 print(f"Response for id {id}: {response.status_code}")
             app.feed_iterable(data, schema="schema_name", callback=callback)
 
+            # Mixed operations
+            data = [
+                {"id": "1", "fields": {"field1": "value1"}},
+                {"id": "1", "operation": "update", "fields": {"field1": "value2"}, "create": True},
+                {"id": "2", "operation": "delete", "condition": "schema_name.field1=='value1'"},
+            ]
+            app.feed_iterable(data, schema="schema_name", callback=callback)
+
         :param iter: An iterable of Dict containing the keys 'id' and 'fields' to be used in the :func:`feed_data_point`. Note that this 'id' is only the last part of the full document id, that will be generated automatically by pyvespa.
         :param schema: The Vespa schema name that we are sending data to.
         :param namespace: The Vespa document id namespace. If no namespace is provided the schema is used.
         :param callback: A callback function to be called on each result. Signature `callback(response:VespaResponse, id:str)`
-        :param operation_type: The operation to perform. Default to `feed`. Valid are `feed`, `update` or `delete`.
-        :param max_queue_size: The maximum size of the blocking queue and max in-flight operations.
+        :param operation_type: The operation to perform, unless the Dict has an 'operation' key. Default to `feed`. Valid are `feed`, `update` or `delete`.
+        :param max_queue_size: The maximum number of in-flight operations. Reading from `iter` blocks until an operation completes when this limit is reached.
         :param max_workers: The maximum number of workers in the threadpool executor.
         :param max_connections: The maximum number of persisted connections to the Vespa endpoint.
         :param compress (Union[str, bool], optional): Whether to compress the request body. Defaults to "auto", which will compress if the body is larger than 1024 bytes.
+        :param adaptive_concurrency: If True, the number of in-flight operations is adjusted by an :class:`AdaptiveThrottler`, shrinking on 429/503 responses or rising latency and growing while responses are healthy. `max_workers` and `max_queue_size` are then upper bounds. Default is False.
+        :param encode_processes: If set, JSON serialization and compression of the document bodies run in a `ProcessPoolExecutor`
+            with this many processes, and the threads only do HTTP. Every body is pickled to a worker process and the encoded bytes
+            pickled back, so this only beats encoding in the threads when serializing and compressing a body costs more than that
+            round trip, e.g. documents with large tensors and a client CPU bound feed. For small documents, leave it unset. Default is None.
+        :param preserve_order: If True, operations on the same document are sent in input order, one at a time. Later operations
+            wait for the earlier one without holding up other documents. Set to False to skip this bookkeeping when every document
+            appears at most once in `iter`. Default is True.
+        :param progress: A function called with the :class:`vespa.io.FeedStats` of the running feed every `progress_interval` seconds,
+            and once when the feed completes. Signature `progress(stats:FeedStats)`. Default is None.
+        :param progress_interval: Minimum number of seconds between calls to `progress`. Default is 10.
+        :param dead_letter: Where to record operations that did not succeed, with the final error. Either a path to a JSONL file,
+            that records are appended to, or a :class:`DeadLetterQueue`. Default is None.
+        :param redrive: If True, operations that failed with status code 429, 5xx or an exception are fed again when the feed
+            completes, with a quarter of `max_workers`. Only the failures of this pass are recorded in `dead_letter`. `callback`
+            is called for both attempts. An operation is not re-driven when a later operation on the same document completed
+            in the meantime, it is recorded in `dead_letter` with its failure instead. Default is False.
         :param kwargs: Additional parameters are passed to the respective operation type specific :func:`_data_point`.
+        :return: A :class:`vespa.io.FeedStats` with the throughput, latency percentiles, counts by status code, retries,
+            bytes before and after compression and peak number of in-flight operations of the feed.
         """
         if operation_type not in ["feed", "update", "delete"]:
             raise ValueError(
@@ -423,144 +2127,206 @@ class Vespa(object):
                 raise ValueError(
                     "Not possible to infer schema name. Specify schema parameter."
                 )
+        return self._feed_with_dead_letter(
+            self._feed_iterable,
+            iter=iter,
+            schema=schema,
+            namespace=namespace,
+            callback=callback,
+            operation_type=operation_type,
+            max_queue_size=max_queue_size,
+            max_workers=max_workers,
+            max_connections=max_connections,
+            compress=compress,
+            adaptive_concurrency=adaptive_concurrency,
+            encode_processes=encode_processes,
+            preserve_order=preserve_order,
+            progress=progress,
+            progress_interval=progress_interval,
+            dead_letter=dead_letter,
+            redrive=redrive,
+            **kwargs,
+        )
 
-        def _consumer(
-            queue: Queue,
-            executor: ThreadPoolExecutor,
-            sync_session: VespaSync,
-            max_in_flight=2 * max_queue_size,
+    def _feed_iterable(
+        self,
+        iter: Iterable[Dict],
+        schema: Optional[str],
+        namespace: Optional[str],
+        callback: Optional[Callable[[VespaResponse, str], None]] = None,
+        operation_type: str = "feed",
+        max_queue_size: int = 1000,
+        max_workers: int = 8,
+        max_connections: int = 16,
+        compress: Union[str, bool] = "auto",
+        adaptive_concurrency: bool = False,
+        encode_processes: Optional[int] = None,
+        preserve_order: bool = True,
+        progress: Optional[Callable[[FeedStats], None]] = None,
+        progress_interval: float = 10.0,
+        on_complete: Optional[Callable[[Dict, VespaResponse], None]] = None,
+        stats: Optional[FeedStats] = None,
+        **kwargs,
+    ) -> FeedStats:
+        # Feed pipeline of feed_iterable and feed_file. `on_complete` is called with the
+        # input dict and the response of every operation, from the result handler thread.
+        # A caller that passes `stats` finishes them and makes the final progress report.
+        owns_stats = stats is None
+        stats = stats if stats is not None else FeedStats()
+        reporter = _ProgressReporter(progress, stats, progress_interval)
+        # Errors raised while handling results, re-raised in the calling thread
+        handler_errors: List[BaseException] = []
+
+        def _complete(
+            doc: Dict, response: Union[VespaResponse, Exception]
+        ) -> Optional[Dict]:
+            # Reports a completed operation, returns the next operation held back on the same document.
+            # The next operation is released even if reporting fails, so its slot is not leaked.
+            next_doc = None
+            try:
+                _complete_operation(
+                    doc, response, operation_type, callback, on_complete
+                )
+                reporter.maybe_report()
+            except BaseException as e:
+                handler_errors.append(e)
+            finally:
+                if order is not None:
+                    next_doc = order.done(doc)
+            return next_doc
+
+        def _result_handler(
+            completed: Queue,
+            in_flight: _InFlightWindow,
+            requests: Optional[_InFlightWindow],
+            submit: Callable[[Dict], None],
         ):
-            in_flight = 0  # Single threaded consumer
-            futures: List[Future] = []
+            # Single thread that forwards completed operations to the user callback,
+            # so callbacks are never invoked concurrently. A slot in the in-flight
+            # window is only released once its result has been handled. The next
+            # operation held back on the same document takes over the request slot.
             while True:
+                item = completed.get()
+                if item is None:  # all operations are done
+                    break
+                doc, future = item
                 try:
-                    doc = queue.get(timeout=5)
-                except Empty:
-                    continue  # producer has not produced anything
-                if doc is None:  # producer is done
-                    queue.task_done()
-                    break  # Break and wait for all futures to complete
-
-                completed_futures = [future for future in futures if future.done()]
-                for future in completed_futures:
-                    futures.remove(future)
-                    in_flight -= 1
-                    _handle_result_callback(future, callback=callback)
-
-                while in_flight >= max_in_flight:
-                    # Check for completed tasks and reduce in-flight tasks
-                    for future in futures:
-                        if future.done():
-                            futures.remove(future)
-                            in_flight -= 1
-                            _handle_result_callback(future, callback=callback)
-                    sleep(0.01)  # wait a bit for more futures to complete
-
-                # we can submit a new doc to Vespa
-                future: Future = executor.submit(_submit, doc, sync_session)
-                futures.append(future)
-                in_flight += 1
-                queue.task_done()  # signal that we have consumed the doc from queue
-
-            # make sure callback is called for all pending operations before
-            # exiting the consumer thread
-            for future in futures:
-                _handle_result_callback(future, callback)
+                    _, response = future.result()
+                except BaseException as e:
+                    # _submit returns the errors of the operation, anything else aborts the
+                    # feed, but the operation is still completed to release its slots
+                    handler_errors.append(e)
+                    response = RuntimeError("Operation aborted: {!r}".format(e))
+                next_doc = _complete(doc, response)
+                while next_doc is not None:
+                    try:
+                        submit(next_doc)
+                        break
+                    except RuntimeError:
+                        # The executor is shut down after the feed was aborted
+                        next_doc = _complete(
+                            next_doc,
+                            RuntimeError("Feed aborted before the operation was sent"),
+                        )
+                        in_flight.release()
+                else:
+                    if requests is not None:
+                        requests.release()
+                in_flight.release()
 
         def _submit(
             doc: dict, sync_session: VespaSync
-        ) -> Tuple[str, Union[VespaResponse, Exception]]:
-            id = doc.get("id", None)
-            if id is None:
-                return id, VespaResponse(
-                    status_code=499,
-                    json={"id": id, "message": "Missing id in input dict"},
-                    url="n/a",
-                    operation_type=operation_type,
-                )
-            fields = doc.get("fields", None)
-            if fields is None and operation_type != "delete":
-                return id, VespaResponse(
-                    status_code=499,
-                    json={"id": id, "message": "Missing fields in input dict"},
-                    url="n/a",
-                    operation_type=operation_type,
-                )
-            groupname = doc.get("groupname", None)
+        ) -> Tuple[dict, Union[VespaResponse, Exception]]:
+            response = _invalid_operation_response(doc, operation_type)
+            if response is not None:
+                stats.on_operation(response.status_code)
+                return doc, response
+            start = stats.on_operation_start()
             try:
-                if operation_type == "feed":
-                    response: VespaResponse = sync_session.feed_data_point(
-                        schema=schema,
-                        namespace=namespace,
-                        groupname=groupname,
-                        data_id=id,
-                        fields=fields,
-                        **kwargs,
-                    )
-                    return (id, response)
-                elif operation_type == "update":
-                    response: VespaResponse = sync_session.update_data(
-                        schema=schema,
-                        namespace=namespace,
-                        groupname=groupname,
-                        data_id=id,
-                        fields=fields,
-                        **kwargs,
-                    )
-                    return (id, response)
-                elif operation_type == "delete":
-                    response: VespaResponse = sync_session.delete_data(
-                        schema=schema,
-                        namespace=namespace,
-                        data_id=id,
-                        groupname=groupname,
-                        **kwargs,
-                    )
-                    return (id, response)
-            except Exception as e:
-                return (id, e)
-
-        def _handle_result_callback(
-            future: Future, callback: Optional[Callable[[VespaResponse, str], None]]
-        ):
-            id, response = future.result()
-            if isinstance(response, Exception):
-                response = VespaResponse(
-                    status_code=599,
-                    json={
-                        "Exception": str(response),
-                        "id": id,
-                        "message": "Exception during feed_data_point",
-                    },
-                    url="n/a",
-                    operation_type=operation_type,
+                response = _dispatch_operation(
+                    sync_session, doc, operation_type, schema, namespace, kwargs
                 )
-            if callback is not None:
-                try:
-                    callback(response, id)
-                except Exception as e:
-                    print(f"Exception in user callback for id {id}", file=sys.stderr)
-                    traceback.print_exception(
-                        type(e), e, e.__traceback__, file=sys.stderr
-                    )
+            except Exception as e:
+                stats.on_operation(_exception_status_code(e), start)
+                return doc, e
+            stats.on_operation(response.status_code, start)
+            return doc, response
+
+        # Operations read from `iter` and not yet completed, including held back operations,
+        # are bounded by `in_flight`. Requests sent concurrently are bounded by the thread
+        # pool, and by `requests` with adaptive concurrency.
+        in_flight = _InFlightWindow(limit=lambda: max_queue_size)
+        throttler = None
+        requests = None
+        if adaptive_concurrency:
+            throttler = AdaptiveThrottler(
+                max_concurrency=min(max_workers, max_queue_size)
+            )
+            requests = _InFlightWindow(limit=lambda: throttler.concurrency)
 
+        encoder = _start_encoder(encode_processes) if encode_processes else None
+        order = (
+            _DocumentOrder(schema=schema, namespace=namespace)
+            if preserve_order
+            else None
+        )
         with VespaSync(
             app=self,
             pool_maxsize=max_connections,
             pool_connections=max_connections,
             compress=compress,
+            throttler=throttler,
+            encoder=encoder,
+            stats=stats,
         ) as session:
-            queue = Queue(maxsize=max_queue_size)
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                consumer_thread = threading.Thread(
-                    target=_consumer, args=(queue, executor, session, max_queue_size)
-                )
-                consumer_thread.start()
+            completed: Queue = Queue()
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+
+            def submit(doc: Dict) -> None:
+                future: Future = executor.submit(_submit, doc, session)
+                future.add_done_callback(lambda future: completed.put((doc, future)))
+
+            handler_thread = threading.Thread(
+                target=_result_handler, args=(completed, in_flight, requests, submit)
+            )
+            handler_thread.start()
+            try:
                 for doc in iter:
-                    queue.put(doc, block=True)
-                queue.put(None, block=True)
-                queue.join()
-                consumer_thread.join()
+                    # Blocks until an operation completes when the window is full.
+                    # Held back operations keep their slot until they complete, but
+                    # do not hold a request slot, so other documents are not stalled.
+                    in_flight.acquire()
+                    if handler_errors:
+                        in_flight.release()
+                        break
+                    try:
+                        start_now = order is None or order.start(doc)
+                    except BaseException:
+                        in_flight.release()
+                        raise
+                    if start_now:
+                        if requests is not None:
+                            requests.acquire()
+                        submit(doc)
+                # Held back operations are submitted by the result handler
+                in_flight.join()
+            except Exception:
+                # Complete the operations read before `iter` raised, including held
+                # back ones, so each of them is reported
+                in_flight.join()
+                raise
+            finally:
+                executor.shutdown(wait=True)
+                completed.put(None)
+                handler_thread.join()
+                if encoder is not None:
+                    encoder.shutdown()
+        if handler_errors:
+            raise handler_errors[0]
+        if owns_stats:
+            stats.finish()
+            reporter.report()
+        return stats
 
     def feed_async_iterable(
         self,
@@ -572,12 +2338,26 @@ class Vespa(object):
         max_queue_size: int = 1000,
         max_workers: int = 64,
         max_connections: int = 1,
+        adaptive_concurrency: bool = False,
+        compress: Union[str, bool] = "auto",
+        preserve_order: bool = True,
+        progress: Optional[Callable[[FeedStats], None]] = None,
+        progress_interval: float = 10.0,
+        dead_letter: Optional[Union[str, DeadLetterQueue]] = None,
+        redrive: bool = False,
         **kwargs,
-    ):
+    ) -> FeedStats:
         """
         Feed data asynchronously using httpx.AsyncClient with HTTP/2. Feed from an Iterable of Dict with the keys 'id' and 'fields' to be used in the :func:`feed_data_point`.
         The result of each operation is forwarded to the user provided callback function that can process the returned `VespaResponse`.
         Prefer using this method over :func:`feed_iterable` when the operation is I/O bound from the client side.
+        The sustained throughput in operations per second is logged at INFO level when the feed completes.
+        This method runs its own event loop. To feed from within a running event loop, or from an async source,
+        use :func:`VespaAsync.feed`.
+
+        As with :func:`feed_iterable`, each Dict can set its own 'operation', 'schema', 'namespace', 'groupname', 'number', 'condition',
+        'create' and 'auto_assign'. Operations on the same document are sent in input order, one at a time, while different
+        documents are fed in parallel.
 
         Example usage::
 
@@ -595,11 +2375,27 @@ class Vespa(object):
         :param schema: The Vespa schema name that we are sending data to.
         :param namespace: The Vespa document id namespace. If no namespace is provided the schema is used.
         :param callback: A callback function to be called on each result. Signature `callback(response:VespaResponse, id:str)`
-        :param operation_type: The operation to perform. Default to `feed`. Valid are `feed`, `update` or `delete`.
-        :param max_queue_size: The maximum number of tasks waiting to be processed. Useful to limit memory usage. Default is 1000.
-        :param max_workers: Maximum number of concurrent requests to have in-flight, bound by an asyncio.Semaphore, that needs to be acquired by a submit task. Increase if the server is scaled to handle more requests.
+        :param operation_type: The operation to perform, unless the Dict has an 'operation' key. Default to `feed`. Valid are `feed`, `update` or `delete`.
+        :param max_queue_size: The maximum number of operations that are read from `iter` but not yet completed. Useful to limit memory usage. Default is 1000.
+        :param max_workers: Maximum number of concurrent requests to have in-flight. Operations are fed through a sliding window of at most this many requests, and a new request is started as soon as one completes. The next operation is only read from `iter` while fewer than `max_queue_size` operations are pending, counting operations held back behind an earlier operation on the same document. Increase if the server is scaled to handle more requests.
         :param max_connections: The maximum number of connections passed to httpx.AsyncClient to the Vespa endpoint. As HTTP/2 is used, only one connection is needed.
+        :param adaptive_concurrency: If True, the number of in-flight requests is adjusted by an :class:`AdaptiveThrottler`, shrinking on 429/503 responses or rising latency and growing while responses are healthy. `max_workers` and `max_queue_size` are then upper bounds. Default is False.
+        :param compress: Whether to compress the request body. Default is "auto", which compresses bodies larger than 1024 bytes. See :class:`VespaAsync` for level, encoding and threshold options.
+        :param preserve_order: If True, operations on the same document are sent in input order, one at a time. Later operations
+            wait for the earlier one without a slot among the `max_workers` concurrent requests, so other documents are not held up.
+            Set to False to skip this bookkeeping when every document appears at most once in `iter`. Default is True.
+        :param progress: A function called with the :class:`vespa.io.FeedStats` of the running feed every `progress_interval` seconds,
+            and once when the feed completes. Signature `progress(stats:FeedStats)`. Default is None.
+        :param progress_interval: Minimum number of seconds between calls to `progress`. Default is 10.
+        :param dead_letter: Where to record operations that did not succeed, with the final error. Either a path to a JSONL file,
+            that records are appended to, or a :class:`DeadLetterQueue`. Default is None.
+        :param redrive: If True, operations that failed with status code 429, 5xx or an exception are fed again when the feed
+            completes, with a quarter of `max_workers`. Only the failures of this pass are recorded in `dead_letter`. `callback`
+            is called for both attempts. An operation is not re-driven when a later operation on the same document completed
+            in the meantime, it is recorded in `dead_letter` with its failure instead. Default is False.
         :param kwargs: Additional parameters are passed to the respective operation type specific :func:`_data_point`.
+        :return: A :class:`vespa.io.FeedStats` with the throughput, latency percentiles, counts by status code, retries,
+            bytes before and after compression and peak number of in-flight operations of the feed.
         """
 
         if operation_type not in ["feed", "update", "delete"]:
@@ -616,102 +2412,275 @@ class Vespa(object):
                 raise ValueError(
                     "Not possible to infer schema name. Specify schema parameter."
                 )
+        return self._feed_with_dead_letter(
+            self._feed_async_iterable,
+            iter=iter,
+            schema=schema,
+            namespace=namespace,
+            callback=callback,
+            operation_type=operation_type,
+            max_queue_size=max_queue_size,
+            max_workers=max_workers,
+            max_connections=max_connections,
+            adaptive_concurrency=adaptive_concurrency,
+            compress=compress,
+            preserve_order=preserve_order,
+            progress=progress,
+            progress_interval=progress_interval,
+            dead_letter=dead_letter,
+            redrive=redrive,
+            **kwargs,
+        )
 
-        async def handle_result(task: asyncio.Task, id: str):
-            # Wrapper around the task to handle exceptions and call the user callback
-            try:
-                response = await task
-            except Exception as e:
-                response = VespaResponse(
-                    status_code=599,
-                    json={
-                        "Exception": str(e),
-                        "id": id,
-                        "message": "Exception during feed_data_point",
-                    },
-                    url="n/a",
+    def _feed_async_iterable(
+        self,
+        iter: Iterable[Dict],
+        schema: Optional[str],
+        namespace: Optional[str],
+        callback: Optional[Callable[[VespaResponse, str], None]] = None,
+        operation_type: str = "feed",
+        max_queue_size: int = 1000,
+        max_workers: int = 64,
+        max_connections: int = 1,
+        adaptive_concurrency: bool = False,
+        compress: Union[str, bool] = "auto",
+        preserve_order: bool = True,
+        progress: Optional[Callable[[FeedStats], None]] = None,
+        progress_interval: float = 10.0,
+        on_complete: Optional[Callable[[Dict, VespaResponse], None]] = None,
+        stats: Optional[FeedStats] = None,
+        **kwargs,
+    ) -> FeedStats:
+        # Feed pipeline of feed_async_iterable and feed_file. `on_complete` is called with the
+        # input dict and the response of every operation, from the event loop.
+        # A caller that passes `stats` finishes them and makes the final progress report.
+        owns_stats = stats is None
+        stats = stats if stats is not None else FeedStats()
+        reporter = _ProgressReporter(progress, stats, progress_interval)
+
+        def handle_response(
+            doc: Dict, response: Union[VespaResponse, Exception]
+        ) -> None:
+            _complete_operation(doc, response, operation_type, callback, on_complete)
+            reporter.maybe_report()
+
+        # Wrapping in async function to be able to use asyncio.run, and avoid that the feed_async_iterable have to be async
+        async def run():
+            throttler = None
+            if adaptive_concurrency:
+                throttler = AdaptiveThrottler(
+                    max_concurrency=min(max_workers, max_queue_size)
+                )
+            async with self.asyncio(
+                connections=max_connections,
+                throttler=throttler,
+                compress=compress,
+                stats=stats,
+            ) as async_session:
+                await _feed_async_operations(
+                    async_session,
+                    iter=iter,
+                    schema=schema,
+                    namespace=namespace,
                     operation_type=operation_type,
+                    max_queue_size=max_queue_size,
+                    concurrency=(
+                        (lambda: throttler.concurrency)
+                        if throttler is not None
+                        else (lambda: min(max_workers, max_queue_size))
+                    ),
+                    preserve_order=preserve_order,
+                    stats=stats,
+                    handle_response=handle_response,
+                    kwargs=kwargs,
+                )
+
+        asyncio.run(run())
+        if not owns_stats:
+            return stats
+        stats.finish()
+        reporter.report()
+        if stats.operations:
+            logging.info(
+                "Fed {} operations in {:.2f} seconds ({:.1f} operations/s)".format(
+                    stats.operations, stats.elapsed, stats.operations_per_second
+                )
+            )
+        return stats
+
+    def feed_file(
+        self,
+        path: str,
+        callback: Optional[Callable[[VespaResponse, str], None]] = None,
+        checkpoint_file: Optional[str] = None,
+        checkpoint_interval: float = 10.0,
+        use_async: bool = False,
+        **kwargs,
+    ) -> FeedStats:
+        """
+        Feed a file of operations in the Vespa JSON feed format, with one operation per line (JSONL).
+
+        The file is streamed through a buffered reader, so memory usage does not depend on the file size. Files ending
+        with `.gz` or `.zst` are decompressed on the fly. `.zst` requires the `zstandard` package.
+        `put`, `update` and `remove` operations are mapped to :func:`feed_data_point`, :func:`update_data` and
+        :func:`delete_data`, with the namespace, schema and group taken from the document id. `create` and `condition`
+        are supported. Lines that can not be parsed are reported to `callback` with status code 499 and id None.
+
+        With a `checkpoint_file`, the byte offset up to which every operation has completed is written to the file
+        every `checkpoint_interval` seconds and when the feed ends. If the file exists when the feed starts, the feed
+        resumes from that offset, so a killed job can be restarted without re-feeding completed operations.
+        Operations that completed with an error are also behind the offset, record them with `dead_letter` or in `callback`
+        to feed them again.
+
+        Example usage::
+
+            app = Vespa(url="localhost", port=8080)
+            # Lines like {"put": "id:mynamespace:music::123", "fields": {"title": "Best of"}}
+            app.feed_file("feed.jsonl.gz", callback=callback, checkpoint_file="feed.checkpoint")
+
+        :param path: Path to the JSONL file.
+        :param callback: A callback function to be called on each result. Signature `callback(response:VespaResponse, id:str)`
+        :param checkpoint_file: Path to the checkpoint file. Default is None, which disables checkpoints.
+        :param checkpoint_interval: Minimum number of seconds between checkpoint writes. Default is 10.
+        :param use_async: If True, feed with :func:`feed_async_iterable`, else with :func:`feed_iterable`. Default is False.
+        :param kwargs: Additional parameters are passed to :func:`feed_iterable` or :func:`feed_async_iterable`, e.g. `max_workers`,
+            `progress`, `dead_letter` or `redrive`.
+        :return: A :class:`vespa.io.FeedStats` with the statistics of the operations fed by this call.
+        :raises ValueError: If `kwargs` has `schema` or `namespace`, which are taken from the document ids.
+        """
+        for key in ("schema", "namespace"):
+            if key in kwargs:
+                raise ValueError(
+                    "feed_file takes the {} from the document id of each operation, it can not be passed.".format(
+                        key
+                    )
                 )
+        offset = _FeedCheckpoint.read(checkpoint_file, path) if checkpoint_file else 0
+        checkpoint = _FeedCheckpoint(path, checkpoint_file, offset, checkpoint_interval)
+        # Unparsable lines are reported from the reading thread, while other results
+        # are reported from the result handler, so serialize the callbacks
+        callback_lock = threading.Lock()
+
+        def report(response: VespaResponse, id: Optional[str]) -> None:
             if callback is not None:
-                try:
+                with callback_lock:
                     callback(response, id)
-                except Exception as e:
-                    print(f"Exception in user callback for id {id}", file=sys.stderr)
-                    traceback.print_exception(
-                        type(e), e, e.__traceback__, file=sys.stderr
-                    )
 
-        # Wrapping in async function to be able to use asyncio.run, and avoid that the feed_async_iterable have to be async
-        async def run():
-            async with self.asyncio(connections=max_connections) as async_session:
-                semaphore = asyncio.Semaphore(max_workers)
-                tasks = []
-                for doc in iter:
-                    id = doc.get("id")
-                    fields = doc.get("fields")
-                    groupname = doc.get("groupname")
-
-                    if id is None:
-                        response = VespaResponse(
-                            status_code=499,
-                            json={"id": id, "message": "Missing id in input dict"},
-                            url="n/a",
-                            operation_type=operation_type,
-                        )
-                        if callback is not None:
-                            callback(response, id)
+        def operations() -> Generator[Dict, None, None]:
+            end_offset = offset
+            with _open_feed_file(path, offset) as f:
+                for line in f:
+                    start_offset = end_offset
+                    end_offset += len(line)
+                    if not line.strip():
                         continue
-                    if fields is None and operation_type != "delete":
-                        response = VespaResponse(
-                            status_code=499,
-                            json={"id": id, "message": "Missing fields in input dict"},
-                            url="n/a",
-                            operation_type=operation_type,
+                    try:
+                        doc = _feed_operation_from_json(self.json_codec.loads(line))
+                    except Exception as e:
+                        token = object()
+                        checkpoint.issue(token, end_offset)
+                        report(
+                            VespaResponse(
+                                status_code=499,
+                                json={
+                                    "id": None,
+                                    "message": "Invalid operation at byte offset {}: {}".format(
+                                        start_offset, e
+                                    ),
+                                },
+                                url="n/a",
+                                operation_type="feed",
+                            ),
+                            None,
                         )
-                        if callback is not None:
-                            callback(response, id)
+                        checkpoint.complete(token)
                         continue
+                    checkpoint.issue(doc, end_offset)
+                    yield doc
+            # Covers trailing blank lines once all operations are done
+            token = object()
+            checkpoint.issue(token, end_offset)
+            checkpoint.complete(token)
+
+        feed = self._feed_async_iterable if use_async else self._feed_iterable
+        try:
+            return self._feed_with_dead_letter(
+                feed,
+                iter=operations(),
+                max_workers=kwargs.pop("max_workers", 64 if use_async else 8),
+                schema=None,
+                namespace=None,
+                callback=report,
+                on_complete=lambda doc, response: checkpoint.complete(doc),
+                **kwargs,
+            )
+        finally:
+            checkpoint.write()
 
-                    async with semaphore:
-                        if operation_type == "feed":
-                            task = async_session.feed_data_point(
-                                schema=schema,
-                                namespace=namespace,
-                                groupname=groupname,
-                                data_id=id,
-                                fields=fields,
-                                **kwargs,
-                            )
-                        elif operation_type == "update":
-                            task = async_session.update_data(
-                                schema=schema,
-                                namespace=namespace,
-                                groupname=groupname,
-                                data_id=id,
-                                fields=fields,
-                                **kwargs,
-                            )
-                        elif operation_type == "delete":
-                            task = async_session.delete_data(
-                                schema=schema,
-                                namespace=namespace,
-                                data_id=id,
-                                groupname=groupname,
-                                **kwargs,
-                            )
-
-                        tasks.append(handle_result(asyncio.create_task(task), id))
-
-                        # Control the number of in-flight tasks
-                        if len(tasks) >= max_queue_size:
-                            await asyncio.gather(*tasks)
-                            tasks = []
-
-                if tasks:
-                    await asyncio.gather(*tasks)
+    def _feed_with_dead_letter(
+        self,
+        feed: Callable[..., FeedStats],
+        iter: Iterable[Dict],
+        max_workers: int,
+        dead_letter: Optional[Union[str, DeadLetterQueue]] = None,
+        redrive: bool = False,
+        **kwargs,
+    ) -> FeedStats:
+        # Runs a feed pipeline, routing failed operations to the dead-letter sink. With `redrive`,
+        # operations that failed with 429, 5xx or an exception are fed again at a quarter of
+        # `max_workers` when the feed completes, unless a later operation on the same document
+        # completed, and only the failures of that pass are dead-lettered.
+        if dead_letter is None and not redrive:
+            return feed(iter=iter, max_workers=max_workers, **kwargs)
+        sink = (
+            _DeadLetterFile(dead_letter, self.json_codec)
+            if isinstance(dead_letter, str)
+            else dead_letter
+        )
+        dead_letters = _DeadLetter(
+            sink,
+            redrive,
+            schema=kwargs.get("schema"),
+            namespace=kwargs.get("namespace"),
+        )
+        on_complete = kwargs.pop("on_complete", None)
+        # Both passes record into one FeedStats, finished when the re-drive pass completes
+        stats = FeedStats() if redrive else None
 
-        asyncio.run(run())
-        return
+        def complete(doc: Dict, response: VespaResponse) -> None:
+            dead_letters.complete(doc, response)
+            if on_complete is not None:
+                on_complete(doc, response)
+
+        try:
+            result = feed(
+                iter=iter,
+                max_workers=max_workers,
+                on_complete=complete,
+                stats=stats,
+                **kwargs,
+            )
+            operations = dead_letters.take_held()
+            if operations:
+                logging.info("Re-driving {} failed operations".format(len(operations)))
+                feed(
+                    iter=operations,
+                    max_workers=max(1, max_workers // 4),
+                    on_complete=lambda doc, response: dead_letters.complete(
+                        doc, response, final=True
+                    ),
+                    stats=stats,
+                    **kwargs,
+                )
+        finally:
+            dead_letters.release_held()
+            if isinstance(sink, _DeadLetterFile):
+                sink.close()
+        if stats is None:
+            return result
+        stats.finish()
+        _ProgressReporter(kwargs.get("progress"), stats, 0).report()
+        return stats
 
     def delete_data(
         self,
@@ -720,59 +2689,179 @@ class Vespa(object):
         namespace: str = None,
         groupname: str = None,
         **kwargs,
-    ) -> VespaResponse:
+    ) -> VespaResponse:
+        """
+        Delete a data point from a Vespa app.
+
+        Example usage::
+
+            app = Vespa(url="localhost", port=8080)
+            response = app.delete_data(schema="schema_name", data_id="1")
+            print(response)
+
+        :param schema: The schema that we are deleting data from.
+        :param data_id: Unique id associated with this data point.
+        :param namespace: The namespace that we are deleting data from. If no namespace is provided the schema is used.
+        :param groupname: The groupname that we are deleting data from.
+        :param kwargs: Additional arguments to be passed to the HTTP DELETE request https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters
+        :return: Response of the HTTP DELETE request.
+        """
+
+        with self._sync_session() as sync_app:
+            return sync_app.delete_data(
+                schema=schema,
+                data_id=data_id,
+                namespace=namespace,
+                groupname=groupname,
+                **kwargs,
+            )
+
+    def delete_all_docs(
+        self,
+        content_cluster_name: str,
+        schema: str,
+        namespace: str = None,
+        slices: int = 1,
+        max_documents_per_second: Optional[float] = None,
+        progress: Optional[Callable[[BulkOperationSummary], None]] = None,
+        **kwargs,
+    ) -> BulkOperationSummary:
+        """
+        Delete all documents associated with the schema. This might block for a long time as
+        it requires sending multiple delete requests to complete.
+
+        :param content_cluster_name: Name of content cluster to GET from, or visit.
+        :param schema: The schema that we are deleting data from.
+        :param namespace: The  namespace that we are deleting data from. If no namespace is provided the schema is used.
+        :param slices: Number of slices to use for parallel delete requests. Defaults to 1.
+        :param max_documents_per_second: Target maximum number of deleted documents per second, across all slices. Default is no limit.
+        :param progress: Called with the :class:`vespa.io.BulkOperationSummary` after each delete request.
+        :param kwargs: Additional arguments to be passed to the HTTP DELETE request https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters
+        :return: Summary of the operation, with the number of deleted documents and the slices that failed.
+        """
+
+        with VespaSync(self, pool_connections=slices, pool_maxsize=slices) as sync_app:
+            return sync_app.delete_all_docs(
+                content_cluster_name=content_cluster_name,
+                namespace=namespace,
+                schema=schema,
+                slices=slices,
+                max_documents_per_second=max_documents_per_second,
+                progress=progress,
+                **kwargs,
+            )
+
+    def delete_where(
+        self,
+        content_cluster_name: str,
+        selection: str,
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+        slices: int = 1,
+        max_documents_per_second: Optional[float] = None,
+        progress: Optional[Callable[[BulkOperationSummary], None]] = None,
+        **kwargs,
+    ) -> BulkOperationSummary:
         """
-        Delete a data point from a Vespa app.
+        Delete all documents matching a document selection. This might block for a long time as
+        it requires sending multiple delete requests to complete.
+
+        Slices run in parallel and each follows its continuation until done. A slice gives up on an
+        error that is not transient, or after three errors when more than one in ten of its requests
+        failed, and is reported in :attr:`vespa.io.BulkOperationSummary.failed_slices`.
 
         Example usage::
 
-            app = Vespa(url="localhost", port=8080)
-            response = app.delete_data(schema="schema_name", data_id="1")
-            print(response)
+            def report(summary):
+                print(summary.documents, summary.slice_documents)
 
-        :param schema: The schema that we are deleting data from.
-        :param data_id: Unique id associated with this data point.
+            summary = app.delete_where(
+                content_cluster_name="content",
+                schema="music",
+                selection="music.year < 1990",
+                slices=4,
+                max_documents_per_second=1000,
+                progress=report,
+            )
+            assert summary.succeeded
+
+        :param content_cluster_name: Name of content cluster to delete from.
+        :param selection: Document selection of the documents to delete (https://docs.vespa.ai/en/reference/document-select-language.html).
+        :param schema: The schema that we are deleting data from. If None, documents of all schemas are deleted.
         :param namespace: The namespace that we are deleting data from. If no namespace is provided the schema is used.
-        :param groupname: The groupname that we are deleting data from.
+        :param slices: Number of slices to use for parallel delete requests. Defaults to 1.
+        :param max_documents_per_second: Target maximum number of deleted documents per second, across all slices. Default is no limit.
+        :param progress: Called with the :class:`vespa.io.BulkOperationSummary` after each delete request.
         :param kwargs: Additional arguments to be passed to the HTTP DELETE request https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters
-        :return: Response of the HTTP DELETE request.
+        :return: Summary of the operation, with the number of deleted documents and the slices that failed.
         """
-
-        with VespaSync(self, pool_connections=1, pool_maxsize=1) as sync_app:
-            return sync_app.delete_data(
+        with VespaSync(self, pool_connections=slices, pool_maxsize=slices) as sync_app:
+            return sync_app.delete_where(
+                content_cluster_name=content_cluster_name,
+                selection=selection,
                 schema=schema,
-                data_id=data_id,
                 namespace=namespace,
-                groupname=groupname,
+                slices=slices,
+                max_documents_per_second=max_documents_per_second,
+                progress=progress,
                 **kwargs,
             )
 
-    def delete_all_docs(
+    def update_where(
         self,
         content_cluster_name: str,
+        selection: str,
+        fields: Dict,
         schema: str,
-        namespace: str = None,
+        namespace: Optional[str] = None,
         slices: int = 1,
+        auto_assign: bool = True,
+        max_documents_per_second: Optional[float] = None,
+        progress: Optional[Callable[[BulkOperationSummary], None]] = None,
         **kwargs,
-    ) -> Response:
+    ) -> BulkOperationSummary:
         """
-        Delete all documents associated with the schema. This might block for a long time as
-        it requires sending multiple delete requests to complete.
+        Update all documents matching a document selection, with a single server-side operation
+        instead of a visit followed by one update per document. This might block for a long time
+        as it requires sending multiple update requests to complete.
 
-        :param content_cluster_name: Name of content cluster to GET from, or visit.
-        :param schema: The schema that we are deleting data from.
-        :param namespace: The  namespace that we are deleting data from. If no namespace is provided the schema is used.
-        :param slices: Number of slices to use for parallel delete requests. Defaults to 1.
-        :param kwargs: Additional arguments to be passed to the HTTP DELETE request https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters
-        :return: Response of the HTTP DELETE request.
-        """
+        Slices run in parallel and each follows its continuation until done, as in :func:`delete_where`.
+
+        Example usage::
+
+            # Backfill a new field
+            summary = app.update_where(
+                content_cluster_name="content",
+                schema="music",
+                selection="music.popularity == null",
+                fields={"popularity": 0},
+                slices=8,
+            )
+            print(summary.documents)
 
+        :param content_cluster_name: Name of content cluster to update.
+        :param selection: Document selection of the documents to update (https://docs.vespa.ai/en/reference/document-select-language.html).
+        :param fields: Dict containing all the fields you want to update.
+        :param schema: The schema that we are updating data.
+        :param namespace: The namespace that we are updating data. If no namespace is provided the schema is used.
+        :param slices: Number of slices to use for parallel update requests. Defaults to 1.
+        :param auto_assign: Assumes `fields`-parameter is an assignment operation. (https://docs.vespa.ai/en/reference/document-json-format.html#assign). If set to false, the fields parameter should be a dictionary including the update operation.
+        :param max_documents_per_second: Target maximum number of updated documents per second, across all slices. Default is no limit.
+        :param progress: Called with the :class:`vespa.io.BulkOperationSummary` after each update request.
+        :param kwargs: Additional arguments to be passed to the HTTP PUT request https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters
+        :return: Summary of the operation, with the number of updated documents and the slices that failed.
+        """
         with VespaSync(self, pool_connections=slices, pool_maxsize=slices) as sync_app:
-            return sync_app.delete_all_docs(
+            return sync_app.update_where(
                 content_cluster_name=content_cluster_name,
-                namespace=namespace,
+                selection=selection,
+                fields=fields,
                 schema=schema,
+                namespace=namespace,
                 slices=slices,
+                auto_assign=auto_assign,
+                max_documents_per_second=max_documents_per_second,
+                progress=progress,
                 **kwargs,
             )
 
@@ -784,13 +2873,15 @@ class Vespa(object):
         slices: int = 1,
         selection: str = "true",
         wanted_document_count: int = 500,
+        read_ahead: int = 2,
+        checkpoint_file: Optional[str] = None,
         **kwargs,
     ) -> Generator[Generator[VespaVisitResponse, None, None], None, None]:
         """
         Visit all documents associated with the schema and matching the selection.
 
         Will run each slice on a seperate thread, for each slice yields the
-        response for each page.
+        response for each page. Each thread prefetches up to `read_ahead` pages of its slice.
 
         Example usage::
 
@@ -798,27 +2889,163 @@ class Vespa(object):
                 for response in slice:
                     print(response.json)
 
+            # Resumable visit, a restarted job continues where the previous one stopped
+            for slice in app.visit(schema="schema_name", slices=2, checkpoint_file="visit.checkpoint"):
+                for response in slice:
+                    print(response.json)
+
         :param content_cluster_name: Name of content cluster to GET from.
         :param schema: The schema that we are visiting data from.
         :param namespace: The namespace that we are visiting data from.
         :param slices: Number of slices to use for parallel GET.
         :param wanted_document_count: Best effort number of documents to retrieve for each request. May contain less if there are not enough documents left.
+        :param read_ahead: Maximum number of pages fetched ahead of the consumer for each slice. Default is 2.
+        :param checkpoint_file: Path to a file where the continuation token of each slice is written after each consumed page.
+            If the file exists, the visit resumes from it, so a visit that was killed does not start over. Default is None.
         :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
         :return: A generator of slices, each containing a generator of responses.
         :raises HTTPError: if one occurred
         """
 
         with VespaSync(self, pool_connections=slices, pool_maxsize=slices) as sync_app:
-            return sync_app.visit(
+            yield from sync_app.visit(
+                content_cluster_name=content_cluster_name,
+                namespace=namespace,
+                schema=schema,
+                slices=slices,
+                selection=selection,
+                wanted_document_count=wanted_document_count,
+                read_ahead=read_ahead,
+                checkpoint_file=checkpoint_file,
+                **kwargs,
+            )
+
+    def visit_documents(
+        self,
+        content_cluster_name: str,
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+        slices: int = 1,
+        selection: str = "true",
+        wanted_document_count: int = 500,
+        read_ahead: int = 2,
+        checkpoint_file: Optional[str] = None,
+        **kwargs,
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        Visit all documents associated with the schema and matching the selection, as one iterator of documents.
+
+        The slices are visited concurrently, each on its own thread, and their pages are merged into one bounded
+        buffer, so the consumer is never more than `read_ahead` pages per slice behind. The order of the documents
+        is not deterministic.
+
+        Example usage::
+
+            for document in app.visit_documents(content_cluster_name="content", schema="schema_name", slices=8):
+                print(document["id"], document["fields"])
+
+        :param content_cluster_name: Name of content cluster to GET from.
+        :param schema: The schema that we are visiting data from.
+        :param namespace: The namespace that we are visiting data from.
+        :param slices: Number of slices to visit concurrently.
+        :param selection: Document selection. Default is "true", all documents.
+        :param wanted_document_count: Best effort number of documents to retrieve for each request. May contain less if there are not enough documents left.
+        :param read_ahead: Maximum number of pages buffered for each slice. Default is 2.
+        :param checkpoint_file: Path to a file where the continuation token of each slice is written after the documents of
+            each page are consumed. If the file exists, the visit resumes from it. Default is None.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: A generator of documents, each a Dict with the keys 'id' and 'fields'.
+        :raises HTTPError: if one occurred
+        """
+        with VespaSync(self, pool_connections=slices, pool_maxsize=slices) as sync_app:
+            yield from sync_app.visit_documents(
                 content_cluster_name=content_cluster_name,
                 namespace=namespace,
                 schema=schema,
                 slices=slices,
                 selection=selection,
                 wanted_document_count=wanted_document_count,
+                read_ahead=read_ahead,
+                checkpoint_file=checkpoint_file,
                 **kwargs,
             )
 
+    def export_documents(
+        self,
+        path: str,
+        content_cluster_name: str,
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        format: str = "parquet",
+        row_group_size: int = 10000,
+        compression: str = "zstd",
+        slices: int = 1,
+        selection: str = "true",
+        wanted_document_count: int = 500,
+        read_ahead: int = 2,
+        **kwargs,
+    ) -> int:
+        """
+        Visit documents and write them to a Parquet or Arrow IPC file, streaming the visited pages into record batches.
+
+        At most the pages buffered by :func:`visit_documents` and one row group of documents are held in memory, so the
+        memory usage does not depend on the number of documents. The Arrow schema is derived from the schema in the
+        application package when it is available, see :func:`vespa.io.vespa_schema_to_arrow`, and inferred from the
+        first row group otherwise. With `fields`, only those fields are requested from Vespa. Requires `pyarrow`.
+
+        Example usage::
+
+            app = Vespa(url="localhost", port=8080, application_package=app_package)
+            app.export_documents("music.parquet", content_cluster_name="content", schema="music", slices=8)
+
+        :param path: Path of the file to write.
+        :param content_cluster_name: Name of content cluster to GET from.
+        :param schema: The schema that we are visiting data from.
+        :param namespace: The namespace that we are visiting data from.
+        :param fields: Names of the document fields to export. Default is all.
+        :param format: "parquet" or "arrow" (Arrow IPC file format). Default is "parquet".
+        :param row_group_size: Number of documents in each row group or record batch. Default is 10000.
+        :param compression: Compression codec of the file, e.g. "zstd", "snappy" or None. Default is "zstd".
+        :param slices: Number of slices to visit concurrently.
+        :param selection: Document selection. Default is "true", all documents.
+        :param wanted_document_count: Best effort number of documents to retrieve for each request.
+        :param read_ahead: Maximum number of pages buffered for each slice. Default is 2.
+        :param kwargs: Additional parameters are passed to :func:`visit_documents`, e.g. `checkpoint_file`.
+        :return: The number of documents written.
+        :raises ImportError: If pyarrow is not installed.
+        """
+        arrow_schema = None
+        if schema and self._application_package is not None:
+            for package_schema in self._application_package.schemas:
+                if package_schema.name == schema:
+                    arrow_schema = vespa_schema_to_arrow(package_schema, fields=fields)
+        if fields is not None:
+            if not schema:
+                raise ValueError("Specify schema to export a subset of the fields.")
+            kwargs.update(_field_set(schema, fields))
+        documents = self.visit_documents(
+            content_cluster_name=content_cluster_name,
+            schema=schema,
+            namespace=namespace,
+            slices=slices,
+            selection=selection,
+            wanted_document_count=wanted_document_count,
+            read_ahead=read_ahead,
+            **kwargs,
+        )
+        try:
+            return write_documents(
+                documents,
+                path,
+                schema=arrow_schema,
+                format=format,
+                row_group_size=row_group_size,
+                compression=compression,
+            )
+        finally:
+            documents.close()
+
     def get_data(
         self,
         schema: str,
@@ -841,7 +3068,7 @@ class Vespa(object):
         :return: Response of the HTTP GET request.
         """
 
-        with VespaSync(self, pool_connections=1, pool_maxsize=1) as sync_app:
+        with self._sync_session() as sync_app:
             return sync_app.get_data(
                 schema=schema,
                 data_id=data_id,
@@ -851,6 +3078,46 @@ class Vespa(object):
                 **kwargs,
             )
 
+    def get_many(
+        self,
+        ids: Iterable[str],
+        schema: str,
+        namespace: str = None,
+        groupname: str = None,
+        fields: Optional[List[str]] = None,
+        max_workers: int = 8,
+        **kwargs,
+    ) -> List[VespaResponse]:
+        """
+        Get many data points from a Vespa app, with at most `max_workers` requests in-flight.
+        Uses the connection pool if one is open, see :func:`open_connection_pool`.
+
+        Example usage::
+
+            responses = app.get_many(ids=["1", "2", "3"], schema="music", fields=["title"])
+            documents = [r.json["fields"] if r.status_code == 200 else None for r in responses]
+
+        :param ids: Unique ids of the documents to get.
+        :param schema: The schema that we are getting data from.
+        :param namespace: The namespace that we are getting data from. If no namespace is provided the schema is used.
+        :param groupname: The groupname that we are getting data from.
+        :param fields: Names of the fields to return. Default is None, all fields.
+        :param max_workers: Maximum number of requests in-flight.
+        :param kwargs: Additional arguments to be passed to the HTTP GET requests https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters
+        :return: Responses in the order of `ids`. Documents that are not found have status code 404, and
+            failed requests have the status code of the error, or 599, with the exception message in the JSON.
+        """
+        with self._sync_session(connections=max_workers) as sync_app:
+            return sync_app.get_many(
+                ids=ids,
+                schema=schema,
+                namespace=namespace,
+                groupname=groupname,
+                fields=fields,
+                max_workers=max_workers,
+                **kwargs,
+            )
+
     def update_data(
         self,
         schema: str,
@@ -888,9 +3155,7 @@ class Vespa(object):
         :return: Response of the HTTP PUT request.
         """
 
-        with VespaSync(
-            self, pool_connections=1, pool_maxsize=1, compress=compress
-        ) as sync_app:
+        with self._sync_session(compress=compress) as sync_app:
             return sync_app.update_data(
                 schema=schema,
                 data_id=data_id,
@@ -926,7 +3191,7 @@ class Vespa(object):
         """
         model = self.get_model_from_application_package(model_id)
         encoded_tokens = model.create_url_encoded_tokens(x=x)
-        with VespaSync(self) as sync_app:
+        with self._sync_session(connections=10) as sync_app:
             return model.parse_vespa_prediction(
                 sync_app.predict(
                     model_id=model_id,
@@ -974,7 +3239,12 @@ class CustomHTTPAdapter(HTTPAdapter):
         pool_maxsize=10,
         num_retries_429=10,
         compress: Union[str, bool] = "auto",
-        compress_larger_than: int = 1024,
+        compress_larger_than: Union[int, Dict[str, int]] = COMPRESS_LARGER_THAN,
+        throttler: Optional[AdaptiveThrottler] = None,
+        compress_level: int = 1,
+        compress_encoding: str = "gzip",
+        stats: Optional[FeedStats] = None,
+        instrumentation: Optional[Instrumentation] = None,
         *args,
         **kwargs,
     ):
@@ -982,10 +3252,17 @@ class CustomHTTPAdapter(HTTPAdapter):
             raise ValueError(
                 f"compress must be 'auto', True, or False. Got {compress} instead."
             )
-        super().__init__(*args, **kwargs)
+        _check_compress_encoding(compress_encoding)
+        # Set before super().__init__, which creates the pool manager
+        self.instrumentation = instrumentation
+        super().__init__(pool_connections, pool_maxsize, *args, **kwargs)
         self.num_retries_429 = num_retries_429
         self.compress = compress
         self.compress_larger_than = compress_larger_than
+        self.compress_level = compress_level
+        self.compress_encoding = compress_encoding
+        self.throttler = throttler
+        self.stats = stats
         self.retry_strategy = Retry(
             total=10,
             backoff_factor=1,
@@ -994,65 +3271,102 @@ class CustomHTTPAdapter(HTTPAdapter):
             allowed_methods=["POST", "GET", "DELETE", "PUT"],
         )
 
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        if self.instrumentation is not None:
+            self.poolmanager.pool_classes_by_scheme = {
+                scheme: _pool_wait_timer(pool_class, self.instrumentation)
+                for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+            }
+
     def send(self, request: PreparedRequest, **kwargs) -> Response:
         # Automatically handle compression if needed
         self._maybe_compress_request(request)
 
         for attempt in range(self.num_retries_429 + 1):
             try:
+                start = time.perf_counter()
                 response = super().send(request, **kwargs)
+                if self.throttler is not None:
+                    self.throttler.on_response(
+                        response.status_code, time.perf_counter() - start
+                    )
+                if self.stats is not None:
+                    self.stats.on_request()
+                if self.instrumentation is not None:
+                    self._record_request(request, response, start, kwargs)
 
                 if response.status_code == 429:
-                    self._wait_with_backoff(attempt)
+                    self._record_retry(request, 429, self._wait_with_backoff(attempt))
                 else:
                     return response
 
             except ConnectionResetError:
                 if attempt < self.num_retries_429:
                     print(f"ConnectionResetError on attempt {attempt}", file=sys.stderr)
-                    self._wait_with_backoff(attempt)
+                    self._record_retry(request, 599, self._wait_with_backoff(attempt))
                 else:
                     print(f"ConnectionResetError on attempt {attempt}", file=sys.stderr)
                     raise
 
         return response
 
+    def _record_request(
+        self, request: PreparedRequest, response: Response, start: float, kwargs: Dict
+    ) -> None:
+        # Reads the body unless streaming, as Session.send does after the adapter returns
+        bytes_received = 0 if kwargs.get("stream") else len(response.content)
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.instrumentation.on_request(
+            _operation_type(request.method, urlsplit(request.url).path),
+            request.method,
+            response.status_code,
+            time.perf_counter() - start,
+            len(body) if isinstance(body, bytes) else 0,
+            bytes_received,
+        )
+
+    def _record_retry(
+        self, request: PreparedRequest, status_code: int, wait: float
+    ) -> None:
+        if self.instrumentation is not None:
+            self.instrumentation.on_retry(
+                _operation_type(request.method, urlsplit(request.url).path),
+                status_code,
+                wait,
+            )
+
     def _maybe_compress_request(self, request: PreparedRequest):
         # Compress if the method is POST or PUT, body exists, and compression conditions are met
         if (
             self.compress in [True, "auto"]
             and request.method in ["POST", "PUT"]
             and request.body
+            and "Content-Encoding" not in request.headers
         ):
-            body_size = (
-                len(request.body)
-                if isinstance(request.body, bytes)
-                else len(request.body.encode("utf-8"))
-            )
-
-            if self.compress is True or (
-                self.compress == "auto" and body_size > self.compress_larger_than
+            # Only encode str bodies; bytes bodies are compressed without copying
+            body = request.body
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+
+            if self.compress is True or len(body) > _compress_threshold(
+                self.compress_larger_than,
+                _operation_type(request.method, urlsplit(request.url).path),
             ):
-                # Compress the body
-                compressed_body = self._gzip_compress(request.body)
+                compressed_body = _compress_bytes(
+                    body, self.compress_encoding, self.compress_level
+                )
                 request.body = compressed_body
-                request.headers["Content-Encoding"] = "gzip"
+                request.headers["Content-Encoding"] = self.compress_encoding
                 request.headers["Content-Length"] = str(len(compressed_body))
 
     @staticmethod
-    def _gzip_compress(data: Union[str, bytes]) -> bytes:
-        if isinstance(data, str):
-            data = data.encode("utf-8")
-
-        buf = BytesIO()
-        with gzip.GzipFile(fileobj=buf, mode="wb") as f:
-            f.write(data)
-        return buf.getvalue()
-
-    @staticmethod
-    def _wait_with_backoff(attempt):
+    def _wait_with_backoff(attempt) -> float:
         wait_time = 0.1 * 1.618**attempt + random.uniform(0, 1)
         time.sleep(wait_time)
+        return wait_time
 
 
 class VespaSync(object):
@@ -1062,6 +3376,12 @@ class VespaSync(object):
         pool_maxsize: int = 10,
         pool_connections: int = 10,
         compress: Union[str, bool] = "auto",
+        throttler: Optional[AdaptiveThrottler] = None,
+        compress_level: int = 1,
+        compress_encoding: str = "gzip",
+        compress_larger_than: Union[int, Dict[str, int]] = COMPRESS_LARGER_THAN,
+        encoder: Optional[concurrent.futures.Executor] = None,
+        stats: Optional[FeedStats] = None,
     ) -> None:
         """
         Class to handle synchronous requests to Vespa.
@@ -1086,6 +3406,14 @@ class VespaSync(object):
             pool_maxsize (int, optional): The maximum number of connections to save in the pool. Defaults to 10.
             pool_connections (int, optional): The number of urllib3 connection pools to cache. Defaults to 10.
             compress (Union[str, bool], optional): Whether to compress the request body. Defaults to "auto", which will compress if the body is larger than 1024 bytes.
+            throttler (AdaptiveThrottler, optional): Controller notified of the status code and latency of every request attempt. Defaults to None.
+            compress_level (int, optional): Compression level. Lower levels are faster, 1-3 is usually best for feeding. Defaults to 1.
+            compress_encoding (str, optional): "gzip" or "zstd". zstd requires the `zstandard` package and support in the Vespa endpoint. Defaults to "gzip".
+            compress_larger_than (Union[int, Dict[str, int]], optional): Body size in bytes above which "auto" compresses. Either one size, or a dict from
+                operation type ("feed", "update" or "query") to size. Defaults to 1024.
+            encoder (concurrent.futures.Executor, optional): Executor, typically a `ProcessPoolExecutor`, used to serialize and compress the
+                bodies of feed and update operations outside the calling thread. Defaults to None, which encodes in the calling thread.
+            stats (FeedStats, optional): Statistics updated with every request and request body. Defaults to None.
         """
         if compress not in ["auto", True, False]:
             raise ValueError(
@@ -1103,6 +3431,9 @@ class VespaSync(object):
                 {"Authorization": f"Bearer {self.app.vespa_cloud_secret_token}"}
             )
         self.compress = compress
+        self.codec = self.app.json_codec
+        self.encoder = encoder
+        self.stats = stats
         self.http_session = None
         self.adapter = CustomHTTPAdapter(
             pool_maxsize=pool_maxsize,
@@ -1111,6 +3442,12 @@ class VespaSync(object):
             num_retries_429=10,
             pool_block=True,
             compress=compress,
+            throttler=throttler,
+            compress_level=compress_level,
+            compress_encoding=compress_encoding,
+            compress_larger_than=compress_larger_than,
+            stats=stats,
+            instrumentation=self.app.instrumentation,
         )
 
     def __enter__(self):
@@ -1140,6 +3477,31 @@ class VespaSync(object):
             return
         self.http_session.close()
 
+    def _encode_document(
+        self, body: Dict, operation_type: str
+    ) -> Tuple[bytes, Dict[str, str]]:
+        # Serialize and compress the body of a document operation, in the executor if there is one.
+        # The adapter leaves bodies with a Content-Encoding as they are.
+        compress_args = (
+            self.compress,
+            self.adapter.compress_encoding,
+            self.adapter.compress_level,
+            _compress_threshold(self.adapter.compress_larger_than, operation_type),
+        )
+        if self.encoder is None:
+            content = self.codec.dumps(body)
+            raw_size = len(content)
+            content, content_encoding = _compress_body(content, *compress_args)
+        else:
+            content, content_encoding, raw_size = self.encoder.submit(
+                _encode_request_body, self.codec.backend, body, *compress_args
+            ).result()
+        if self.stats is not None:
+            self.stats.on_body(raw_size, len(content))
+        if content_encoding is None:
+            return content, _JSON_HEADERS
+        return content, {**_JSON_HEADERS, "Content-Encoding": content_encoding}
+
     def get_model_endpoint(self, model_id: Optional[str] = None) -> Optional[dict]:
         """Get model evaluation endpoints."""
         end_point = "{}/model-evaluation/v1/".format(self.app.end_point)
@@ -1184,6 +3546,7 @@ class VespaSync(object):
         fields: Dict,
         namespace: str = None,
         groupname: str = None,
+        number: Optional[str] = None,
         **kwargs,
     ) -> VespaResponse:
         """
@@ -1194,27 +3557,42 @@ class VespaSync(object):
         :param fields: Dict containing all the fields required by the `schema`.
         :param namespace: The namespace that we are sending data to. If no namespace is provided the schema is used.
         :param groupname: The group that we are sending data to.
+        :param number: The number of the document, for ids with a numeric group (`n=`). Takes precedence over `groupname`.
         :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
         :return: Response of the HTTP POST request.
         :raises HTTPError: if one occurred
         """
 
         path = self.app.get_document_v1_path(
-            id=data_id, schema=schema, namespace=namespace, group=groupname
+            id=data_id,
+            schema=schema,
+            namespace=namespace,
+            group=groupname,
+            number=number,
         )
         end_point = "{}{}".format(self.app.end_point, path)
         vespa_format = {"fields": fields}
-        response = self.http_session.post(end_point, json=vespa_format, params=kwargs)
+        content, headers = self._encode_document(vespa_format, "feed")
+        response = self.http_session.post(
+            end_point,
+            data=content,
+            headers=headers,
+            params=kwargs,
+        )
         raise_for_status(response)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="feed",
         )
 
     def query(
-        self, body: Optional[Dict] = None, groupname: str = None, **kwargs
+        self,
+        body: Optional[Dict] = None,
+        groupname: str = None,
+        use_cache: bool = True,
+        **kwargs,
     ) -> VespaQueryResponse:
         """
         Send a query request to the Vespa application.
@@ -1223,29 +3601,113 @@ class VespaSync(object):
 
         :param body: Dict containing all the request parameters.
         :param groupname: The groupname used in streaming search
+        :param use_cache: Whether to use the query cache of the Vespa app, if one is configured. Default is True.
         :param kwargs: Additional Valid Vespa HTTP Query Api parameters (https://docs.vespa.ai/en/reference/query-api-reference.html)
         :return: Either the request body if debug_request is True or the result from the Vespa application
         :raises HTTPError: if one occurred
         """
+        cache = self.app.query_cache
+        if cache is not None and use_cache:
+            return cache.get_or_compute(
+                QueryCache.key(body, groupname, kwargs),
+                lambda: self._query(body=body, groupname=groupname, **kwargs),
+            )
+        return self._query(body=body, groupname=groupname, **kwargs)
 
+    def _query(
+        self, body: Optional[Dict] = None, groupname: str = None, **kwargs
+    ) -> VespaQueryResponse:
         if groupname:
             kwargs["streaming.groupname"] = groupname
         response = self.http_session.post(
-            self.app.search_end_point, json=body, params=kwargs
+            self.app.search_end_point,
+            data=None if body is None else self.codec.dumps(body),
+            headers=_JSON_HEADERS,
+            params=kwargs,
         )
         raise_for_status(response)
         return VespaQueryResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
         )
 
+    def query_many(
+        self,
+        bodies: Iterable[Optional[Dict]],
+        groupname: str = None,
+        max_workers: int = 8,
+        ordered: bool = True,
+        **kwargs,
+    ) -> Generator[VespaQueryResponse, None, None]:
+        """
+        Send many query requests to the Vespa application, using a thread pool.
+
+        The bodies are read lazily, and at most `max_workers` queries are in-flight at any time, so memory usage
+        is bounded regardless of the number of queries. A query that fails does not abort the batch, but is yielded
+        as a response with status code 599 and the exception message in the JSON.
+
+        Example usage::
+
+            with app.syncio(connections=8) as sync_app:
+                for response in sync_app.query_many(bodies, max_workers=8):
+                    print(response.request_body, response.hits)
+
+        :param bodies: Iterable of Dicts containing the request parameters of each query.
+        :param groupname: The groupname used in streaming search
+        :param max_workers: Maximum number of queries in-flight.
+        :param ordered: If True, responses are yielded in the order of `bodies`. Otherwise in order of completion.
+            In ordered mode, a new query is only sent when the oldest one is yielded, so a slow query lowers the number
+            of queries in-flight below `max_workers` until it completes.
+        :param kwargs: Additional Valid Vespa HTTP Query Api parameters, used for every query (https://docs.vespa.ai/en/reference/query-api-reference.html)
+        :return: Generator of responses, each with `request_body` set to the body of the query.
+        """
+
+        def _query(body: Optional[Dict]) -> VespaQueryResponse:
+            try:
+                response = self.query(body=body, groupname=groupname, **kwargs)
+            except Exception as e:
+                return _query_exception_response(e, body)
+            # The response may be shared through the QueryCache, so set the body on a copy
+            response = copy.copy(response)
+            response._request_body = body
+            return response
+
+        bodies = iter(bodies)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if ordered:
+                futures: deque = deque(
+                    executor.submit(_query, body)
+                    for _, body in zip(range(max_workers), bodies)
+                )
+                while futures:
+                    response = futures.popleft().result()
+                    for body in bodies:
+                        futures.append(executor.submit(_query, body))
+                        break
+                    yield response
+            else:
+                pending = {
+                    executor.submit(_query, body)
+                    for _, body in zip(range(max_workers), bodies)
+                }
+                while pending:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        for body in bodies:
+                            pending.add(executor.submit(_query, body))
+                            break
+                        yield future.result()
+
     def delete_data(
         self,
         schema: str,
         data_id: str,
         namespace: str = None,
         groupname: str = None,
+        number: Optional[str] = None,
         **kwargs,
     ) -> VespaResponse:
         """
@@ -1254,19 +3716,24 @@ class VespaSync(object):
         :param schema: The schema that we are deleting data from.
         :param data_id: Unique id associated with this data point.
         :param namespace: The namespace that we are deleting data from.
+        :param number: The number of the document, for ids with a numeric group (`n=`). Takes precedence over `groupname`.
         :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
         :return: Response of the HTTP DELETE request.
         :raises HTTPError: if one occurred
         """
 
         path = self.app.get_document_v1_path(
-            id=data_id, schema=schema, namespace=namespace, group=groupname
+            id=data_id,
+            schema=schema,
+            namespace=namespace,
+            group=groupname,
+            number=number,
         )
         end_point = "{}{}".format(self.app.end_point, path)
         response = self.http_session.delete(end_point, params=kwargs)
         raise_for_status(response)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="delete",
@@ -1278,8 +3745,10 @@ class VespaSync(object):
         schema: str,
         namespace: str = None,
         slices: int = 1,
+        max_documents_per_second: Optional[float] = None,
+        progress: Optional[Callable[[BulkOperationSummary], None]] = None,
         **kwargs,
-    ) -> None:
+    ) -> BulkOperationSummary:
         """
         Delete all documents associated with the schema.
 
@@ -1287,49 +3756,224 @@ class VespaSync(object):
         :param schema: The schema that we are deleting data from.
         :param namespace: The namespace that we are deleting data from.
         :param slices: Number of slices to use for parallel delete.
+        :param max_documents_per_second: Target maximum number of deleted documents per second, across all slices. Default is no limit.
+        :param progress: Called with the :class:`BulkOperationSummary` after each delete request.
         :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
-        :return: Response of the HTTP DELETE request.
-        :raises HTTPError: if one occurred
+        :return: Summary of the operation, with the slices that failed.
         """
-        if not namespace:
-            namespace = schema
+        return self.delete_where(
+            content_cluster_name=content_cluster_name,
+            selection="true",
+            schema=schema,
+            namespace=namespace,
+            slices=slices,
+            max_documents_per_second=max_documents_per_second,
+            progress=progress,
+            **kwargs,
+        )
 
-        def delete_slice(slice_id):
-            end_point = "{}/document/v1/{}/{}/docid/?cluster={}&selection=true&slices={}&sliceId={}".format(
-                self.app.end_point,
-                namespace,
-                schema,
-                content_cluster_name,
-                slices,
-                slice_id,
-            )
-            request_endpoint = end_point
-            count = 0
-            errors = 0
+    def delete_where(
+        self,
+        content_cluster_name: str,
+        selection: str,
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+        slices: int = 1,
+        max_documents_per_second: Optional[float] = None,
+        progress: Optional[Callable[[BulkOperationSummary], None]] = None,
+        **kwargs,
+    ) -> BulkOperationSummary:
+        """
+        Delete all documents matching the document selection.
+
+        :param content_cluster_name: Name of content cluster to delete from.
+        :param selection: Document selection of the documents to delete.
+        :param schema: The schema that we are deleting data from. If None, documents of all schemas are deleted.
+        :param namespace: The namespace that we are deleting data from.
+        :param slices: Number of slices to use for parallel delete.
+        :param max_documents_per_second: Target maximum number of deleted documents per second, across all slices. Default is no limit.
+        :param progress: Called with the :class:`BulkOperationSummary` after each delete request.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: Summary of the operation, with the slices that failed.
+        """
+        return self._selection_operation(
+            operation="delete",
+            content_cluster_name=content_cluster_name,
+            selection=selection,
+            schema=schema,
+            namespace=namespace,
+            slices=slices,
+            body=None,
+            max_documents_per_second=max_documents_per_second,
+            progress=progress,
+            **kwargs,
+        )
+
+    def update_where(
+        self,
+        content_cluster_name: str,
+        selection: str,
+        fields: Dict,
+        schema: str,
+        namespace: Optional[str] = None,
+        slices: int = 1,
+        auto_assign: bool = True,
+        max_documents_per_second: Optional[float] = None,
+        progress: Optional[Callable[[BulkOperationSummary], None]] = None,
+        **kwargs,
+    ) -> BulkOperationSummary:
+        """
+        Update all documents matching the document selection.
+
+        :param content_cluster_name: Name of content cluster to update.
+        :param selection: Document selection of the documents to update.
+        :param fields: Dict containing all the fields you want to update.
+        :param schema: The schema that we are updating data.
+        :param namespace: The namespace that we are updating data.
+        :param slices: Number of slices to use for parallel update.
+        :param auto_assign: Assumes `fields`-parameter is an assignment operation. If set to false, the fields parameter should be a dictionary including the update operation.
+        :param max_documents_per_second: Target maximum number of updated documents per second, across all slices. Default is no limit.
+        :param progress: Called with the :class:`BulkOperationSummary` after each update request.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: Summary of the operation, with the slices that failed.
+        """
+        return self._selection_operation(
+            operation="update",
+            content_cluster_name=content_cluster_name,
+            selection=selection,
+            schema=schema,
+            namespace=namespace,
+            slices=slices,
+            body=_update_fields_body(fields, auto_assign),
+            max_documents_per_second=max_documents_per_second,
+            progress=progress,
+            **kwargs,
+        )
+
+    def _selection_operation(
+        self,
+        operation: str,
+        content_cluster_name: str,
+        selection: str,
+        schema: Optional[str],
+        namespace: Optional[str],
+        slices: int,
+        body: Optional[Dict],
+        max_documents_per_second: Optional[float],
+        progress: Optional[Callable[[BulkOperationSummary], None]],
+        **kwargs,
+    ) -> BulkOperationSummary:
+        # Runs a selection-based delete or update with one thread per slice
+        end_point = "{}/document/v1/{}".format(
+            self.app.end_point, _selection_path(schema, namespace)
+        )
+        method = (
+            self.http_session.delete if operation == "delete" else self.http_session.put
+        )
+        bulk_operation = _SelectionOperation(
+            operation,
+            content_cluster_name,
+            selection,
+            slices,
+            max_documents_per_second,
+            progress,
+            kwargs,
+        )
+        if body is None:
+            content, headers = None, _JSON_HEADERS
+        else:
+            content, headers = self._encode_document(body, operation)
+
+        def run_slice(slice: _SelectionSlice) -> None:
             while True:
+                slice.on_request()
                 try:
-                    count += 1
-                    response = self.http_session.delete(request_endpoint, params=kwargs)
-                    result = response.json()
-                    if "continuation" in result:
-                        request_endpoint = "{}&continuation={}".format(
-                            end_point, result["continuation"]
-                        )
-                    else:
-                        break
+                    response = method(
+                        end_point, params=slice.params, data=content, headers=headers
+                    )
+                    raise_for_status(response, raise_on_not_found=True)
+                    result = self.codec.loads(response.content)
                 except Exception as e:
-                    errors += 1
-                    error_rate = errors / count
-                    if error_rate > 0.1:
-                        raise Exception(
-                            "Too many errors for slice delete requests"
-                        ) from e
-                    sleep(1)
+                    delay = slice.on_error(_exception_status_code(e), str(e))
+                else:
+                    delay = slice.on_result(result)
+                if delay is None:
+                    return
+                if delay > 0:
+                    sleep(delay)
+
+        with ThreadPoolExecutor(max_workers=slices) as executor:
+            list(executor.map(run_slice, bulk_operation.slices))
+        summary = bulk_operation.summary
+        summary.finish()
+        return summary
+
+    def visit(
+        self,
+        content_cluster_name: str,
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+        slices: int = 1,
+        selection: str = "true",
+        wanted_document_count: int = 500,
+        read_ahead: int = 2,
+        checkpoint_file: Optional[str] = None,
+        **kwargs,
+    ) -> Generator[Generator[VespaVisitResponse, None, None], None, None]:
+        """
+        Visit all documents associated with the schema and matching the selection.
 
-        with ThreadPoolExecutor(max_workers=slices) as executor:
-            executor.map(delete_slice, range(slices))
+        Each slice is fetched on a separate thread, that prefetches up to `read_ahead` pages while the
+        pages of the slice are consumed. Yields one generator of pages per slice, in slice order.
+        See :func:`visit_documents` for one iterator of the documents of all slices.
 
-    def visit(
+        :param content_cluster_name: Name of content cluster to GET from.
+        :param schema: The schema that we are visiting data from.
+        :param namespace: The namespace that we are visiting data from.
+        :param slices: Number of slices to use for parallel GET.
+        :param wanted_document_count: Best effort number of documents to retrieve for each request. May contain less if there are not enough documents left.
+        :param read_ahead: Maximum number of pages fetched ahead of the consumer for each slice.
+        :param checkpoint_file: Path to a file where the continuation token of each slice is written after each consumed page.
+            If the file exists, the visit resumes from it. Default is None.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: A generator of slices, each containing a generator of responses.
+        :raises HTTPError: if one occurred
+        """
+        checkpoint, continuations = _visit_checkpoint(
+            checkpoint_file, content_cluster_name, schema, namespace, slices, selection
+        )
+        visit_slice = self._visit_slices(
+            content_cluster_name=content_cluster_name,
+            schema=schema,
+            namespace=namespace,
+            slices=slices,
+            selection=selection,
+            wanted_document_count=wanted_document_count,
+            continuations=continuations,
+            **kwargs,
+        )
+        prefetcher = _SlicePrefetcher(
+            visit_slice, slices=slices, read_ahead=read_ahead, merged=False
+        )
+
+        def slice_pages(slice_id: int) -> Generator[VespaVisitResponse, None, None]:
+            for _, page in prefetcher.pages(slice_id):
+                yield page
+                # The consumer asked for the next page, so this page is consumed
+                if checkpoint is not None:
+                    checkpoint.update(slice_id, page.continuation)
+
+        try:
+            for slice_id in range(slices):
+                pages = slice_pages(slice_id)
+                # Stop prefetching when the generator of the slice is closed or garbage collected
+                weakref.finalize(pages, prefetcher.stop, slice_id)
+                yield pages
+        except GeneratorExit:
+            prefetcher.stop()
+            raise
+
+    def visit_documents(
         self,
         content_cluster_name: str,
         schema: Optional[str] = None,
@@ -1337,23 +3981,67 @@ class VespaSync(object):
         slices: int = 1,
         selection: str = "true",
         wanted_document_count: int = 500,
+        read_ahead: int = 2,
+        checkpoint_file: Optional[str] = None,
         **kwargs,
-    ) -> Generator[Generator[VespaVisitResponse, None, None], None, None]:
+    ) -> Generator[Dict[str, Any], None, None]:
         """
-        Visit all documents associated with the schema and matching the selection.
+        Visit all documents associated with the schema and matching the selection, as one iterator of documents.
 
-        Will run each slice on a seperate thread, for each slice yields the
-        response for each page.
+        Each slice is fetched concurrently on its own thread, and the pages of all slices are merged into one bounded
+        buffer of `read_ahead` pages per slice. Documents are yielded in the order their pages arrive, so the order
+        is not deterministic. Closing the iterator stops the fetching.
 
         :param content_cluster_name: Name of content cluster to GET from.
         :param schema: The schema that we are visiting data from.
         :param namespace: The namespace that we are visiting data from.
-        :param slices: Number of slices to use for parallel GET.
+        :param slices: Number of slices to visit concurrently.
         :param wanted_document_count: Best effort number of documents to retrieve for each request. May contain less if there are not enough documents left.
+        :param read_ahead: Maximum number of pages buffered for each slice.
+        :param checkpoint_file: Path to a file where the continuation token of each slice is written after the documents of
+            each page are consumed. If the file exists, the visit resumes from it. Default is None.
         :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
-        :return: A generator of slices, each containing a generator of responses.
+        :return: A generator of documents, each a Dict with the keys 'id' and 'fields'.
         :raises HTTPError: if one occurred
         """
+        checkpoint, continuations = _visit_checkpoint(
+            checkpoint_file, content_cluster_name, schema, namespace, slices, selection
+        )
+        visit_slice = self._visit_slices(
+            content_cluster_name=content_cluster_name,
+            schema=schema,
+            namespace=namespace,
+            slices=slices,
+            selection=selection,
+            wanted_document_count=wanted_document_count,
+            continuations=continuations,
+            **kwargs,
+        )
+        prefetcher = _SlicePrefetcher(
+            visit_slice, slices=slices, read_ahead=read_ahead, merged=True
+        )
+        try:
+            for slice_id, page in prefetcher.pages():
+                yield from page.documents
+                if checkpoint is not None:
+                    checkpoint.update(slice_id, page.continuation)
+        finally:
+            prefetcher.stop()
+
+    def _visit_slices(
+        self,
+        content_cluster_name: str,
+        schema: Optional[str],
+        namespace: Optional[str],
+        slices: int,
+        selection: str,
+        wanted_document_count: int,
+        continuations: Optional[Dict[int, Optional[str]]] = None,
+        **kwargs,
+    ) -> Callable[[int], Generator[VespaVisitResponse, None, None]]:
+        # Returns a function that fetches the pages of a slice one after another, starting
+        # from the continuation token of the slice. Slices with token None are done.
+        continuations = continuations or {}
         if not namespace:
             namespace = schema
 
@@ -1375,7 +4063,9 @@ class VespaSync(object):
             r = self.http_session.get(end_point, params=params)
             r.raise_for_status()
             return VespaVisitResponse(
-                json=r.json(), status_code=r.status_code, url=str(r.url)
+                json=self.codec.loads(r.content),
+                status_code=r.status_code,
+                url=str(r.url),
             )
 
         def visit_slice(slice_id):
@@ -1387,6 +4077,10 @@ class VespaSync(object):
                 "sliceId": slice_id,
                 **kwargs,
             }
+            if slice_id in continuations:
+                if continuations[slice_id] is None:
+                    return
+                params["continuation"] = continuations[slice_id]
 
             while True:
                 result = visit_request(end_point, params=params)
@@ -1396,10 +4090,7 @@ class VespaSync(object):
                 else:
                     break
 
-        with ThreadPoolExecutor(max_workers=slices) as executor:
-            futures = [executor.submit(visit_slice, slice) for slice in range(slices)]
-            for future in as_completed(futures):
-                yield future.result()
+        return visit_slice
 
     def get_data(
         self,
@@ -1430,12 +4121,52 @@ class VespaSync(object):
         response = self.http_session.get(end_point, params=kwargs)
         raise_for_status(response, raise_on_not_found=raise_on_not_found)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="get",
         )
 
+    def get_many(
+        self,
+        ids: Iterable[str],
+        schema: str,
+        namespace: str = None,
+        groupname: str = None,
+        fields: Optional[List[str]] = None,
+        max_workers: int = 8,
+        **kwargs,
+    ) -> List[VespaResponse]:
+        """
+        Get many data points from a Vespa app, using a thread pool that shares the connections of this session.
+
+        :param ids: Unique ids of the documents to get.
+        :param schema: The schema that we are getting data from.
+        :param namespace: The namespace that we are getting data from. If no namespace is provided the schema is used.
+        :param groupname: The groupname that we are getting data from.
+        :param fields: Names of the fields to return. Default is None, all fields.
+        :param max_workers: Maximum number of requests in-flight.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: Responses in the order of `ids`. Documents that are not found have status code 404, and
+            failed requests have the status code of the error, or 599, with the exception message in the JSON.
+        """
+        params = {**_field_set(schema, fields), **kwargs}
+
+        def _get(data_id: str) -> VespaResponse:
+            try:
+                return self.get_data(
+                    schema=schema,
+                    data_id=data_id,
+                    namespace=namespace,
+                    groupname=groupname,
+                    **params,
+                )
+            except Exception as e:
+                return _get_exception_response(e, data_id)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_get, ids))
+
     def update_data(
         self,
         schema: str,
@@ -1445,6 +4176,7 @@ class VespaSync(object):
         auto_assign: bool = True,
         namespace: str = None,
         groupname: str = None,
+        number: Optional[str] = None,
         **kwargs,
     ) -> VespaResponse:
         """
@@ -1457,13 +4189,18 @@ class VespaSync(object):
         :param auto_assign: Assumes `fields`-parameter is an assignment operation. (https://docs.vespa.ai/en/reference/document-json-format.html#assign). If set to false, the fields parameter should be a dictionary including the update operation.
         :param namespace: The namespace that we are updating data.
         :param groupname: The groupname used to update data
+        :param number: The number of the document, for ids with a numeric group (`n=`). Takes precedence over `groupname`.
         :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
         :return: Response of the HTTP PUT request.
         :raises HTTPError: if one occurred
         """
 
         path = self.app.get_document_v1_path(
-            id=data_id, schema=schema, namespace=namespace, group=groupname
+            id=data_id,
+            schema=schema,
+            namespace=namespace,
+            group=groupname,
+            number=number,
         )
         end_point = "{}{}?create={}".format(
             self.app.end_point, path, str(create).lower()
@@ -1473,16 +4210,46 @@ class VespaSync(object):
         else:
             # Can not send 'id' in fields for partial update
             vespa_format = {"fields": {k: v for k, v in fields.items() if k != "id"}}
-        response = self.http_session.put(end_point, json=vespa_format, params=kwargs)
+        content, headers = self._encode_document(vespa_format, "update")
+        response = self.http_session.put(
+            end_point,
+            data=content,
+            headers=headers,
+            params=kwargs,
+        )
         raise_for_status(response)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="update",
         )
 
 
+_RETRIED_OPERATIONS = {
+    "feed_data_point": "feed",
+    "update_data": "update",
+    "delete_data": "delete",
+    "get_data": "get",
+}
+
+
+def _instrument_retry(state: RetryCallState) -> None:
+    # before_sleep of the retried VespaAsync methods, reports the retry to the instrumentation of the instance
+    instrumentation = state.args[0].instrumentation
+    if instrumentation is None:
+        return
+    if state.outcome.failed:
+        status_code = 599
+    else:
+        status_code = state.outcome.result().status_code
+    instrumentation.on_retry(
+        _RETRIED_OPERATIONS.get(state.fn.__name__, "other"),
+        status_code,
+        state.next_action.sleep,
+    )
+
+
 class VespaAsync(object):
     def __init__(
         self,
@@ -1490,6 +4257,12 @@ class VespaAsync(object):
         connections: Optional[int] = 1,
         total_timeout: Optional[int] = None,
         timeout: Union[httpx.Timeout, int] = httpx.Timeout(5),
+        throttler: Optional[AdaptiveThrottler] = None,
+        compress: Union[str, bool] = "auto",
+        compress_level: int = 1,
+        compress_encoding: str = "gzip",
+        compress_larger_than: Union[int, Dict[str, int]] = COMPRESS_LARGER_THAN,
+        stats: Optional[FeedStats] = None,
         **kwargs,
     ) -> None:
         """
@@ -1542,6 +4315,13 @@ class VespaAsync(object):
             total_timeout (int, optional): **Deprecated**. Will be ignored and removed in future versions.
                 Use `timeout` to pass an `httpx.Timeout` object instead.
             timeout (httpx.Timeout, optional): Timeout settings for the `httpx.AsyncClient`. Defaults to `httpx.Timeout(5)`.
+            throttler (AdaptiveThrottler, optional): Controller notified of the status code and latency of every document operation attempt. Defaults to None.
+            compress (Union[str, bool], optional): Whether to compress the request body. Defaults to "auto", which will compress if the body is larger than `compress_larger_than`.
+            compress_level (int, optional): Compression level. Lower levels are faster, 1-3 is usually best for feeding. Defaults to 1.
+            compress_encoding (str, optional): "gzip" or "zstd". zstd requires the `zstandard` package and support in the Vespa endpoint. Defaults to "gzip".
+            compress_larger_than (Union[int, Dict[str, int]], optional): Body size in bytes above which "auto" compresses. Either one size, or a dict from
+                operation type ("feed", "update" or "query") to size. Defaults to 1024.
+            stats (FeedStats, optional): Statistics updated with every document operation request and request body. Defaults to None.
             **kwargs: Additional arguments to be passed to the `httpx.AsyncClient`. See
                 [HTTPX AsyncClient documentation](https://www.python-httpx.org/api/#asyncclient) for more details.
 
@@ -1550,7 +4330,19 @@ class VespaAsync(object):
             - The `limits` parameter can be used to control connection pooling behavior, such as the maximum number of concurrent connections.
             - See https://www.python-httpx.org/ for more information on `httpx` and its features.
         """
+        if compress not in ["auto", True, False]:
+            raise ValueError(
+                f"compress must be 'auto', True, or False. Got {compress} instead."
+            )
+        _check_compress_encoding(compress_encoding)
         self.app = app
+        self.codec = self.app.json_codec
+        self.compress = compress
+        self.compress_level = compress_level
+        self.compress_encoding = compress_encoding
+        self.compress_larger_than = compress_larger_than
+        self.stats = stats
+        self.instrumentation = self.app.instrumentation
         self.httpx_client = None
         self.connections = connections
         self.total_timeout = total_timeout
@@ -1561,6 +4353,7 @@ class VespaAsync(object):
                 category=DeprecationWarning,
             )
         self.timeout = timeout
+        self.throttler = throttler
         if isinstance(self.timeout, int):
             self.timeout = httpx.Timeout(timeout)
         self.kwargs = kwargs
@@ -1595,43 +4388,546 @@ class VespaAsync(object):
             sslcontext = httpx.create_ssl_context(cert=(self.app.cert, self.app.key))
         else:
             sslcontext = False
+        kwargs = self.kwargs
+        if self.instrumentation is not None:
+            event_hooks = {
+                name: list(hooks)
+                for name, hooks in kwargs.get("event_hooks", {}).items()
+            }
+            event_hooks.setdefault("request", []).append(self._instrument_request)
+            event_hooks.setdefault("response", []).append(self._instrument_response)
+            kwargs = {**kwargs, "event_hooks": event_hooks}
         self.httpx_client = httpx.AsyncClient(
             timeout=self.timeout,
             headers=self.headers,
             verify=sslcontext,
             http2=True,  # HTTP/2 by default
             http1=False,
-            **self.kwargs,
+            **kwargs,
         )
         return self.httpx_client
 
+    async def _instrument_request(self, request: httpx.Request) -> None:
+        # The first httpcore trace event of a request is emitted once it has a connection,
+        # or an HTTP/2 stream, so the time until then is the wait for the pool
+        timing = {"start": time.perf_counter(), "pool_wait": None}
+        user_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: Dict) -> None:
+            if timing["pool_wait"] is None:
+                timing["pool_wait"] = time.perf_counter() - timing["start"]
+            if user_trace is not None:
+                await user_trace(event_name, info)
+
+        request.extensions = {
+            **request.extensions,
+            "trace": trace,
+            "vespa.timing": timing,
+        }
+
+    async def _instrument_response(self, response: httpx.Response) -> None:
+        await response.aread()
+        request = response.request
+        timing = request.extensions.get("vespa.timing")
+        if timing is None:
+            return
+        if timing["pool_wait"] is not None:
+            self.instrumentation.on_pool_wait(timing["pool_wait"])
+        self.instrumentation.on_request(
+            _operation_type(request.method, request.url.path),
+            request.method,
+            response.status_code,
+            time.perf_counter() - timing["start"],
+            int(request.headers.get("Content-Length", 0)),
+            len(response.content),
+        )
+
     async def _close_httpx_client(self):
         if self.httpx_client is None:
             return
         await self.httpx_client.aclose()
 
-    async def _wait(f, args, **kwargs):
-        tasks = [asyncio.create_task(f(*arg, **kwargs)) for arg in args]
-        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
-        return [result for result in map(lambda task: task.result(), tasks)]
+    async def _encode_body(
+        self,
+        body: Optional[Dict],
+        operation_type: str,
+        stats: Optional[FeedStats] = None,
+    ) -> Tuple[Optional[bytes], Dict[str, str]]:
+        # Serialize the body once, and compress the encoded bytes if needed.
+        # zlib and zstandard release the GIL, so large bodies are compressed in the default executor.
+        # The size is recorded in `stats`, the statistics of a feed, else in those of the client.
+        stats = stats if stats is not None else self.stats
+        if body is None:
+            return None, _JSON_HEADERS
+        content = self.codec.dumps(body)
+        raw_size = len(content)
+        compress_args = (
+            self.compress,
+            self.compress_encoding,
+            self.compress_level,
+            _compress_threshold(self.compress_larger_than, operation_type),
+        )
+        if raw_size > COMPRESS_OFF_LOOP_LARGER_THAN:
+            (
+                content,
+                content_encoding,
+            ) = await asyncio.get_running_loop().run_in_executor(
+                None, _compress_body, content, *compress_args
+            )
+        else:
+            content, content_encoding = _compress_body(content, *compress_args)
+        if stats is not None:
+            stats.on_body(raw_size, len(content))
+        if content_encoding is None:
+            return content, _JSON_HEADERS
+        return content, {**_JSON_HEADERS, "Content-Encoding": content_encoding}
+
+    def _record_response(
+        self, response: httpx.Response, stats: Optional[FeedStats] = None
+    ) -> None:
+        if self.throttler is not None:
+            self.throttler.on_response(
+                response.status_code, response.elapsed.total_seconds()
+            )
+        stats = stats if stats is not None else self.stats
+        if stats is not None:
+            stats.on_request()
 
     def callback_docv1(state: RetryCallState) -> VespaResponse:
         if state.outcome.failed:
             raise state.outcome.exception()
         return state.outcome.result()
 
-    @retry(wait=wait_exponential(multiplier=1), stop=stop_after_attempt(3))
     async def query(
+        self,
+        body: Optional[Dict] = None,
+        groupname: str = None,
+        use_cache: bool = True,
+        **kwargs,
+    ) -> VespaQueryResponse:
+        """
+        Send a query request to the Vespa application.
+
+        :param body: Dict containing all the request parameters.
+        :param groupname: The groupname used in streaming search
+        :param use_cache: Whether to use the query cache of the Vespa app, if one is configured. Default is True.
+        :param kwargs: Additional Valid Vespa HTTP Query Api parameters (https://docs.vespa.ai/en/reference/query-api-reference.html)
+        :return: The response from the Vespa application.
+        """
+        cache = self.app.query_cache
+        if cache is not None and use_cache:
+            return await cache.get_or_compute_async(
+                QueryCache.key(body, groupname, kwargs),
+                lambda: self._query(body=body, groupname=groupname, **kwargs),
+            )
+        return await self._query(body=body, groupname=groupname, **kwargs)
+
+    @retry(wait=wait_exponential(multiplier=1), stop=stop_after_attempt(3))
+    async def _query(
         self, body: Optional[Dict] = None, groupname: str = None, **kwargs
     ) -> VespaQueryResponse:
         if groupname:
             kwargs["streaming.groupname"] = groupname
+        content, headers = await self._encode_body(body, "query")
         r = await self.httpx_client.post(
-            self.app.search_end_point, json=body, params=kwargs
+            self.app.search_end_point,
+            content=content,
+            headers=headers,
+            params=kwargs,
         )
         return VespaQueryResponse(
-            json=r.json(), status_code=r.status_code, url=str(r.url)
+            json=self.codec.loads(r.content), status_code=r.status_code, url=str(r.url)
+        )
+
+    async def query_many(
+        self,
+        bodies: Iterable[Optional[Dict]],
+        groupname: str = None,
+        max_workers: int = 64,
+        ordered: bool = True,
+        **kwargs,
+    ) -> AsyncGenerator[VespaQueryResponse, None]:
+        """
+        Send many query requests to the Vespa application, multiplexed over the HTTP/2 connection(s) of this client.
+
+        The bodies are read lazily, and at most `max_workers` queries are in-flight at any time, so memory usage
+        is bounded regardless of the number of queries. A query that fails does not abort the batch, but is yielded
+        as a response with status code 599 and the exception message in the JSON.
+
+        Example usage::
+
+            async with app.asyncio() as async_app:
+                async for response in async_app.query_many(bodies, max_workers=64):
+                    print(response.request_body, response.hits)
+
+        :param bodies: Iterable of Dicts containing the request parameters of each query.
+        :param groupname: The groupname used in streaming search
+        :param max_workers: Maximum number of queries in-flight.
+        :param ordered: If True, responses are yielded in the order of `bodies`. Otherwise in order of completion.
+            In ordered mode, a new query is only sent when the oldest one is yielded, so a slow query lowers the number
+            of queries in-flight below `max_workers` until it completes.
+        :param kwargs: Additional Valid Vespa HTTP Query Api parameters, used for every query (https://docs.vespa.ai/en/reference/query-api-reference.html)
+        :return: Async generator of responses, each with `request_body` set to the body of the query.
+        """
+
+        async def _query(body: Optional[Dict]) -> VespaQueryResponse:
+            try:
+                response = await self.query(body=body, groupname=groupname, **kwargs)
+            except Exception as e:
+                return _query_exception_response(e, body)
+            # The response may be shared through the QueryCache, so set the body on a copy
+            response = copy.copy(response)
+            response._request_body = body
+            return response
+
+        bodies = iter(bodies)
+        if ordered:
+            tasks: deque = deque(
+                asyncio.create_task(_query(body))
+                for _, body in zip(range(max_workers), bodies)
+            )
+            try:
+                while tasks:
+                    response = await tasks.popleft()
+                    for body in bodies:
+                        tasks.append(asyncio.create_task(_query(body)))
+                        break
+                    yield response
+            finally:
+                for task in tasks:
+                    task.cancel()
+        else:
+            pending = {
+                asyncio.create_task(_query(body))
+                for _, body in zip(range(max_workers), bodies)
+            }
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        for body in bodies:
+                            pending.add(asyncio.create_task(_query(body)))
+                            break
+                        yield task.result()
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    async def feed(
+        self,
+        iter: Union[Iterable[Dict], AsyncIterable[Dict]],
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+        callback: Optional[Callable[[VespaResponse, str], None]] = None,
+        operation_type: str = "feed",
+        max_queue_size: int = 1000,
+        max_workers: int = 64,
+        preserve_order: bool = True,
+        progress: Optional[Callable[[FeedStats], None]] = None,
+        progress_interval: float = 10.0,
+        **kwargs,
+    ) -> FeedStats:
+        """
+        Feed operations from an Iterable or AsyncIterable of Dict, in the running event loop.
+
+        This is the awaitable counterpart of :func:`Vespa.feed_async_iterable`, for use inside an existing event loop,
+        e.g. in an aiohttp or FastAPI application, and with async sources like an async generator, a message queue consumer
+        or an async database cursor. The next operation is only read from `iter` when fewer than `max_queue_size` operations
+        are pending, so a fast source is held back by the feed, and producing and feeding documents overlap.
+        The Dicts take the same keys as in :func:`Vespa.feed_iterable`. If this client has a `throttler`, it bounds the
+        number of concurrent requests instead of `max_workers`.
+
+        Example usage::
+
+            async def documents():
+                async for message in consumer:
+                    yield {"id": message.key, "fields": message.value}
+
+            async with app.asyncio() as async_app:
+                stats = await async_app.feed(documents(), schema="schema_name", callback=callback)
+
+        :param iter: An Iterable or AsyncIterable of Dict containing the keys 'id' and 'fields' to be used in :func:`feed_data_point`.
+        :param schema: The Vespa schema name that we are sending data to.
+        :param namespace: The Vespa document id namespace. If no namespace is provided the schema is used.
+        :param callback: A callback function to be called on each result. Signature `callback(response:VespaResponse, id:str)`
+        :param operation_type: The operation to perform, unless the Dict has an 'operation' key. Default to `feed`. Valid are `feed`, `update` or `delete`.
+        :param max_queue_size: The maximum number of operations that are read from `iter` but not yet completed. Default is 1000.
+        :param max_workers: Maximum number of concurrent requests. Default is 64.
+        :param preserve_order: If True, operations on the same document are sent in input order, one at a time. Default is True.
+        :param progress: A function called with the :class:`vespa.io.FeedStats` of the running feed every `progress_interval` seconds,
+            and once when the feed completes. Default is None.
+        :param progress_interval: Minimum number of seconds between calls to `progress`. Default is 10.
+        :param kwargs: Additional parameters are passed to the respective operation type specific :func:`_data_point`.
+        :return: A :class:`vespa.io.FeedStats` with the statistics of the feed. If this client has `stats`, those are updated and returned.
+        """
+        if operation_type not in ["feed", "update", "delete"]:
+            raise ValueError(
+                "Invalid operation type. Valid are `feed`, `update` or `delete`."
+            )
+        if namespace is None:
+            namespace = schema
+        if not schema:
+            try:
+                schema = self.app._infer_schema_name()
+            except ValueError:
+                raise ValueError(
+                    "Not possible to infer schema name. Specify schema parameter."
+                )
+        stats = self.stats if self.stats is not None else FeedStats()
+        reporter = _ProgressReporter(progress, stats, progress_interval)
+
+        def handle_response(
+            doc: Dict, response: Union[VespaResponse, Exception]
+        ) -> None:
+            _complete_operation(doc, response, operation_type, callback)
+            reporter.maybe_report()
+
+        throttler = self.throttler
+        # Requests and request bodies of the feed are recorded in `stats`, which are passed
+        # to every operation, so concurrent feeds on this client have their own statistics
+        await _feed_async_operations(
+            self,
+            iter=iter,
+            schema=schema,
+            namespace=namespace,
+            operation_type=operation_type,
+            max_queue_size=max_queue_size,
+            concurrency=(
+                (lambda: min(throttler.concurrency, max_queue_size))
+                if throttler is not None
+                else (lambda: min(max_workers, max_queue_size))
+            ),
+            preserve_order=preserve_order,
+            stats=stats,
+            handle_response=handle_response,
+            kwargs=kwargs,
+        )
+        stats.finish()
+        reporter.report()
+        return stats
+
+    async def update_where(
+        self,
+        content_cluster_name: str,
+        selection: str,
+        fields: Dict,
+        schema: str,
+        namespace: Optional[str] = None,
+        slices: int = 1,
+        auto_assign: bool = True,
+        max_documents_per_second: Optional[float] = None,
+        progress: Optional[Callable[[BulkOperationSummary], None]] = None,
+        **kwargs,
+    ) -> BulkOperationSummary:
+        """
+        Update all documents matching the document selection, with all slices running concurrently
+        over the HTTP/2 connection(s) of this client.
+
+        Example usage::
+
+            async with app.asyncio() as async_app:
+                summary = await async_app.update_where(
+                    content_cluster_name="content",
+                    schema="music",
+                    selection="music.popularity == null",
+                    fields={"popularity": 0},
+                    slices=8,
+                )
+
+        :param content_cluster_name: Name of content cluster to update.
+        :param selection: Document selection of the documents to update.
+        :param fields: Dict containing all the fields you want to update.
+        :param schema: The schema that we are updating data.
+        :param namespace: The namespace that we are updating data. If no namespace is provided the schema is used.
+        :param slices: Number of slices to update concurrently.
+        :param auto_assign: Assumes `fields`-parameter is an assignment operation. If set to false, the fields parameter should be a dictionary including the update operation.
+        :param max_documents_per_second: Target maximum number of updated documents per second, across all slices. Default is no limit.
+        :param progress: Called with the :class:`vespa.io.BulkOperationSummary` after each update request.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: Summary of the operation, with the slices that failed.
+        """
+        end_point = "{}/document/v1/{}".format(
+            self.app.end_point, _selection_path(schema, namespace)
+        )
+        content, headers = await self._encode_body(
+            _update_fields_body(fields, auto_assign), "update"
+        )
+        bulk_operation = _SelectionOperation(
+            "update",
+            content_cluster_name,
+            selection,
+            slices,
+            max_documents_per_second,
+            progress,
+            kwargs,
+        )
+
+        async def update_slice(slice: _SelectionSlice) -> None:
+            while True:
+                slice.on_request()
+                try:
+                    response = await self.httpx_client.put(
+                        end_point, params=slice.params, content=content, headers=headers
+                    )
+                except httpx.HTTPError as e:
+                    delay = slice.on_error(599, str(e))
+                else:
+                    try:
+                        result = self.codec.loads(response.content)
+                    except ValueError:
+                        result = {}
+                    if response.status_code != 200:
+                        delay = slice.on_error(
+                            response.status_code,
+                            result.get(
+                                "message", "HTTP {}".format(response.status_code)
+                            ),
+                        )
+                    else:
+                        delay = slice.on_result(result)
+                if delay is None:
+                    return
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+        await asyncio.gather(*(update_slice(slice) for slice in bulk_operation.slices))
+        summary = bulk_operation.summary
+        summary.finish()
+        return summary
+
+    async def visit(
+        self,
+        content_cluster_name: str,
+        schema: Optional[str] = None,
+        namespace: Optional[str] = None,
+        slices: int = 1,
+        selection: str = "true",
+        wanted_document_count: int = 500,
+        field_set: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        read_ahead: int = 2,
+        continuations: Optional[Dict[int, Optional[str]]] = None,
+        on_continuation: Optional[Callable[[int, Optional[str]], None]] = None,
+        checkpoint_file: Optional[str] = None,
+        **kwargs,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Visit all documents associated with the schema and matching the selection, as an async iterator of documents.
+
+        All slices are visited at once over the HTTP/2 connection(s) of this client, with at most `max_concurrency`
+        requests in-flight. Pages are buffered in a bounded queue, so a slow consumer holds back the visit.
+        Documents are yielded in the order their pages arrive.
+
+        To checkpoint a visit, record the continuation token of each slice passed to `on_continuation`. It is called
+        after the last document of each page is yielded, with None when the slice is done. Pass the recorded tokens as
+        `continuations` to resume the visit.
+
+        Example usage::
+
+            checkpoint = {}
+            async with app.asyncio() as async_app:
+                async for document in async_app.visit(
+                    content_cluster_name="content", schema="schema_name", slices=16,
+                    continuations=checkpoint, on_continuation=checkpoint.__setitem__,
+                ):
+                    print(document["id"])
+
+        :param content_cluster_name: Name of content cluster to GET from.
+        :param schema: The schema that we are visiting data from.
+        :param namespace: The namespace that we are visiting data from. If no namespace is provided the schema is used.
+        :param slices: Number of slices to visit concurrently.
+        :param selection: Document selection. Default is "true", all documents.
+        :param wanted_document_count: Best effort number of documents to retrieve for each request.
+        :param field_set: Fields to return, e.g. "[id]" or "music:title,artist". Default is None, all fields.
+        :param max_concurrency: Maximum number of requests in-flight. Default is None, one per slice.
+        :param read_ahead: Maximum number of pages buffered for each concurrent request. Default is 2.
+        :param continuations: Continuation token of each slice to resume from. Slices with token None are done,
+            and slices that are missing start from the beginning. Default is None.
+        :param on_continuation: Called with the slice id and the continuation token of each consumed page. Signature
+            `on_continuation(slice_id:int, continuation:Optional[str])`. Default is None.
+        :param checkpoint_file: Path to a file where the continuation token of each slice is written after the documents of
+            each page are consumed. If the file exists, the visit resumes from it, and `continuations` is ignored. Default is None.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: Async generator of documents, each a Dict with the keys 'id' and 'fields'.
+        :raises RetryError: if a request of a slice failed three times.
+        """
+        if read_ahead < 1:
+            raise ValueError(f"read_ahead must be positive. Got {read_ahead} instead.")
+        if not namespace:
+            namespace = schema
+        target = "{}/{}/docid/".format(namespace, schema) if schema else ""
+        end_point = "{}/document/v1/{}".format(self.app.end_point, target)
+        checkpoint, checkpoint_continuations = _visit_checkpoint(
+            checkpoint_file, content_cluster_name, schema, namespace, slices, selection
         )
+        if checkpoint is not None:
+            continuations = checkpoint_continuations
+        continuations = continuations or {}
+        concurrency = min(slices, max_concurrency or slices)
+        semaphore = asyncio.Semaphore(concurrency)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=read_ahead * concurrency)
+
+        @retry(
+            retry=retry_if_exception_type(httpx.HTTPError), stop=stop_after_attempt(3)
+        )
+        async def visit_request(params: Dict[str, Any]) -> VespaVisitResponse:
+            async with semaphore:
+                r = await self.httpx_client.get(end_point, params=params)
+            r.raise_for_status()
+            return VespaVisitResponse(
+                json=self.codec.loads(r.content),
+                status_code=r.status_code,
+                url=str(r.url),
+            )
+
+        async def visit_slice(slice_id: int) -> None:
+            params = {
+                "cluster": content_cluster_name,
+                "selection": selection,
+                "wantedDocumentCount": wanted_document_count,
+                "slices": slices,
+                "sliceId": slice_id,
+                **kwargs,
+            }
+            if field_set is not None:
+                params["fieldSet"] = field_set
+            if continuations.get(slice_id):
+                params["continuation"] = continuations[slice_id]
+            try:
+                while True:
+                    result = await visit_request(params)
+                    await queue.put((slice_id, result))
+                    if not result.continuation:
+                        break
+                    params["continuation"] = result.continuation
+            except Exception as e:
+                await queue.put((slice_id, e))
+
+        remaining = [
+            slice_id
+            for slice_id in range(slices)
+            if slice_id not in continuations or continuations[slice_id]
+        ]
+        tasks = [asyncio.create_task(visit_slice(slice_id)) for slice_id in remaining]
+        try:
+            done = 0
+            while done < len(tasks):
+                slice_id, result = await queue.get()
+                if isinstance(result, Exception):
+                    raise result
+                for document in result.documents:
+                    yield document
+                if not result.continuation:
+                    done += 1
+                if checkpoint is not None:
+                    checkpoint.update(slice_id, result.continuation)
+                if on_continuation is not None:
+                    on_continuation(slice_id, result.continuation)
+        finally:
+            for task in tasks:
+                task.cancel()
 
     @retry(
         wait=wait_exponential(multiplier=1),
@@ -1641,10 +4937,12 @@ class VespaAsync(object):
         ),
         stop=stop_after_attempt(3),
         retry_error_callback=callback_docv1,
+        before_sleep=_instrument_retry,
     )
     @retry(
         wait=wait_random_exponential(multiplier=1, max=3),
         retry=retry_if_result(lambda x: x.get_status_code() == 429),
+        before_sleep=_instrument_retry,
     )
     async def feed_data_point(
         self,
@@ -1654,24 +4952,38 @@ class VespaAsync(object):
         namespace: Optional[str] = None,
         groupname: Optional[str] = None,
         semaphore: Optional[asyncio.Semaphore] = None,
+        number: Optional[str] = None,
+        stats: Optional[FeedStats] = None,
         **kwargs,
     ) -> VespaResponse:
         path = self.app.get_document_v1_path(
-            id=data_id, schema=schema, namespace=namespace, group=groupname
+            id=data_id,
+            schema=schema,
+            namespace=namespace,
+            group=groupname,
+            number=number,
         )
         end_point = "{}{}".format(self.app.end_point, path)
         vespa_format = {"fields": fields}
+        content, headers = await self._encode_body(vespa_format, "feed", stats)
         if semaphore:
             async with semaphore:
                 response = await self.httpx_client.post(
-                    end_point, json=vespa_format, params=kwargs
+                    end_point,
+                    content=content,
+                    headers=headers,
+                    params=kwargs,
                 )
         else:
             response = await self.httpx_client.post(
-                end_point, json=vespa_format, params=kwargs
+                end_point,
+                content=content,
+                headers=headers,
+                params=kwargs,
             )
+        self._record_response(response, stats)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="feed",
@@ -1685,10 +4997,12 @@ class VespaAsync(object):
         ),
         stop=stop_after_attempt(3),
         retry_error_callback=callback_docv1,
+        before_sleep=_instrument_retry,
     )
     @retry(
         wait=wait_exponential(multiplier=1, max=10),
         retry=retry_if_result(lambda x: x.get_status_code() == 429),
+        before_sleep=_instrument_retry,
     )
     async def delete_data(
         self,
@@ -1697,10 +5011,16 @@ class VespaAsync(object):
         namespace: str = None,
         groupname: str = None,
         semaphore: asyncio.Semaphore = None,
+        number: Optional[str] = None,
+        stats: Optional[FeedStats] = None,
         **kwargs,
     ) -> VespaResponse:
         path = self.app.get_document_v1_path(
-            id=data_id, schema=schema, namespace=namespace, group=groupname
+            id=data_id,
+            schema=schema,
+            namespace=namespace,
+            group=groupname,
+            number=number,
         )
         end_point = "{}{}".format(self.app.end_point, path)
         if semaphore:
@@ -1708,8 +5028,9 @@ class VespaAsync(object):
                 response = await self.httpx_client.delete(end_point, params=kwargs)
         else:
             response = await self.httpx_client.delete(end_point, params=kwargs)
+        self._record_response(response, stats)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="delete",
@@ -1723,10 +5044,12 @@ class VespaAsync(object):
         ),
         stop=stop_after_attempt(3),
         retry_error_callback=callback_docv1,
+        before_sleep=_instrument_retry,
     )
     @retry(
         wait=wait_exponential(multiplier=1, max=10),
         retry=retry_if_result(lambda x: x.get_status_code() == 429),
+        before_sleep=_instrument_retry,
     )
     async def get_data(
         self,
@@ -1747,12 +5070,58 @@ class VespaAsync(object):
         else:
             response = await self.httpx_client.get(end_point, params=kwargs)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="get",
         )
 
+    async def get_many(
+        self,
+        ids: Iterable[str],
+        schema: str,
+        namespace: str = None,
+        groupname: str = None,
+        fields: Optional[List[str]] = None,
+        max_workers: int = 64,
+        **kwargs,
+    ) -> List[VespaResponse]:
+        """
+        Get many data points from a Vespa app, multiplexed over the HTTP/2 connection(s) of this client.
+
+        Example usage::
+
+            async with app.asyncio() as async_app:
+                responses = await async_app.get_many(ids=ids, schema="music", max_workers=64)
+
+        :param ids: Unique ids of the documents to get.
+        :param schema: The schema that we are getting data from.
+        :param namespace: The namespace that we are getting data from. If no namespace is provided the schema is used.
+        :param groupname: The groupname that we are getting data from.
+        :param fields: Names of the fields to return. Default is None, all fields.
+        :param max_workers: Maximum number of requests in-flight.
+        :param kwargs: Additional HTTP request parameters (https://docs.vespa.ai/en/reference/document-v1-api-reference.html#request-parameters)
+        :return: Responses in the order of `ids`. Documents that are not found have status code 404, and
+            failed requests have status code 599 with the exception message in the JSON.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+        params = {**_field_set(schema, fields), **kwargs}
+
+        async def _get(data_id: str) -> VespaResponse:
+            try:
+                return await self.get_data(
+                    schema=schema,
+                    data_id=data_id,
+                    namespace=namespace,
+                    groupname=groupname,
+                    semaphore=semaphore,
+                    **params,
+                )
+            except Exception as e:
+                return _get_exception_response(e, data_id)
+
+        return list(await asyncio.gather(*(_get(data_id) for data_id in ids)))
+
     @retry(
         wait=wait_exponential(multiplier=1),
         retry=retry_any(
@@ -1761,10 +5130,12 @@ class VespaAsync(object):
         ),
         stop=stop_after_attempt(3),
         retry_error_callback=callback_docv1,
+        before_sleep=_instrument_retry,
     )
     @retry(
         wait=wait_exponential(multiplier=1, max=10),
         retry=retry_if_result(lambda x: x.get_status_code() == 429),
+        before_sleep=_instrument_retry,
     )
     async def update_data(
         self,
@@ -1776,10 +5147,16 @@ class VespaAsync(object):
         namespace: str = None,
         groupname: str = None,
         semaphore: asyncio.Semaphore = None,
+        number: Optional[str] = None,
+        stats: Optional[FeedStats] = None,
         **kwargs,
     ) -> VespaResponse:
         path = self.app.get_document_v1_path(
-            id=data_id, schema=schema, namespace=namespace, group=groupname
+            id=data_id,
+            schema=schema,
+            namespace=namespace,
+            group=groupname,
+            number=number,
         )
         end_point = "{}{}?create={}".format(
             self.app.end_point, path, str(create).lower()
@@ -1789,17 +5166,25 @@ class VespaAsync(object):
         else:
             # Can not send 'id' in fields for partial update
             vespa_format = {"fields": {k: v for k, v in fields.items() if k != "id"}}
+        content, headers = await self._encode_body(vespa_format, "update", stats)
         if semaphore:
             async with semaphore:
                 response = await self.httpx_client.put(
-                    end_point, json=vespa_format, params=kwargs
+                    end_point,
+                    content=content,
+                    headers=headers,
+                    params=kwargs,
                 )
         else:
             response = await self.httpx_client.put(
-                end_point, json=vespa_format, params=kwargs
+                end_point,
+                content=content,
+                headers=headers,
+                params=kwargs,
             )
+        self._record_response(response, stats)
         return VespaResponse(
-            json=response.json(),
+            json=self.codec.loads(response.content),
             status_code=response.status_code,
             url=str(response.url),
             operation_type="update",
@@ -1,5 +1,20 @@
+import json
+import math
+import re
+import threading
+import time
 import warnings
-from typing import Any, Optional, Dict, List
+from typing import (
+    Any,
+    Callable,
+    Generator,
+    Optional,
+    Dict,
+    List,
+    Iterable,
+    Tuple,
+    Union,
+)
 
 
 class VespaResponse(object):
@@ -77,6 +92,28 @@ class VespaQueryResponse(VespaResponse):
         """
         return self.json
 
+    def to_columns(
+        self, fields: Optional[List[str]] = None, meta_prefix: str = ""
+    ) -> Dict[str, Any]:
+        """
+        Convert the hits to a columnar structure of NumPy arrays. See :func:`hits_to_columns`.
+
+        :param fields: Names of the fields to extract. Default is all fields.
+        :param meta_prefix: Prefix of the `query_index`, `id` and `relevance` columns. Default is no prefix.
+        :return: Dict from column name to NumPy array.
+        """
+        return hits_to_columns(self, fields=fields, meta_prefix=meta_prefix)
+
+    def to_arrow(self, fields: Optional[List[str]] = None, meta_prefix: str = ""):
+        """
+        Convert the hits to a `pyarrow.Table`. See :func:`hits_to_arrow`.
+
+        :param fields: Names of the fields to extract. Default is all fields.
+        :param meta_prefix: Prefix of the `query_index`, `id` and `relevance` columns. Default is no prefix.
+        :return: pyarrow.Table with one row per hit.
+        """
+        return hits_to_arrow(self, fields=fields, meta_prefix=meta_prefix)
+
 
 class VespaVisitResponse(VespaResponse):
     def __init__(self, json, status_code, url) -> None:
@@ -99,3 +136,708 @@ class VespaVisitResponse(VespaResponse):
     @property
     def number_documents_retrieved(self) -> int:
         return self.json.get("documentCount", 0)
+
+
+class FeedStats(object):
+    # Relative width of the latency histogram buckets, percentiles are accurate to within 2%
+    LATENCY_BUCKET_GROWTH = 1.02
+
+    def __init__(self, interval: float = 1.0) -> None:
+        """
+        Statistics of a feed, returned by :func:`vespa.application.Vespa.feed_iterable`,
+        :func:`vespa.application.Vespa.feed_async_iterable` and :func:`vespa.application.Vespa.feed_file`,
+        and passed to their `progress` hook while the feed runs.
+
+        The statistics are updated from the threads or event loop of the feed. Memory usage does not grow with the number
+        of operations, latencies are kept in a histogram.
+
+        Example usage::
+
+            stats = app.feed_iterable(data, schema="schema_name")
+            print(stats.operations_per_second, stats.latency_percentiles(), stats.status_codes)
+
+        :param interval: Length in seconds of the intervals of :attr:`throughput`.
+        """
+        self.interval = interval
+        self.start_time = time.monotonic()
+        self.end_time: Optional[float] = None
+        #: Number of completed operations.
+        self.operations = 0
+        #: Number of completed operations by status code. 599 is used for operations that failed without a response.
+        self.status_codes: Dict[int, int] = {}
+        #: Number of HTTP requests, including retries.
+        self.requests = 0
+        #: Size in bytes of the request bodies before compression.
+        self.bytes_raw = 0
+        #: Size in bytes of the request bodies as sent.
+        self.bytes_sent = 0
+        #: Number of operations being sent.
+        self.in_flight = 0
+        #: Maximum number of operations sent concurrently.
+        self.peak_in_flight = 0
+        self._completions: Dict[int, int] = {}
+        self._latencies: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def on_operation_start(self) -> float:
+        """Record that an operation is sent. Returns the start time to pass to :func:`on_operation`."""
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return time.perf_counter()
+
+    def on_operation(self, status_code: int, start: Optional[float] = None) -> None:
+        """
+        Record a completed operation.
+
+        :param status_code: Status code of the operation.
+        :param start: Value returned by :func:`on_operation_start`, or None for operations that were never sent.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            self.operations += 1
+            self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+            slot = int((time.monotonic() - self.start_time) / self.interval)
+            self._completions[slot] = self._completions.get(slot, 0) + 1
+            if start is not None:
+                self.in_flight -= 1
+                bucket = math.floor(
+                    math.log(max(now - start, 1e-6), self.LATENCY_BUCKET_GROWTH)
+                )
+                self._latencies[bucket] = self._latencies.get(bucket, 0) + 1
+
+    def on_request(self) -> None:
+        """Record an HTTP request of an operation, including retries."""
+        with self._lock:
+            self.requests += 1
+
+    def on_body(self, raw_bytes: int, sent_bytes: int) -> None:
+        """Record the size of a request body before compression and as sent."""
+        with self._lock:
+            self.bytes_raw += raw_bytes
+            self.bytes_sent += sent_bytes
+
+    def finish(self) -> None:
+        """Mark the feed as completed."""
+        self.end_time = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the start of the feed, or the duration of a completed feed."""
+        end_time = self.end_time if self.end_time is not None else time.monotonic()
+        return end_time - self.start_time
+
+    @property
+    def operations_per_second(self) -> float:
+        """Average number of completed operations per second."""
+        elapsed = self.elapsed
+        return self.operations / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def retries(self) -> int:
+        """Number of HTTP requests beyond one per operation that got a response, e.g. after 429 or 503."""
+        with self._lock:
+            answered = self.operations - self.status_codes.get(499, 0)
+            return max(0, self.requests - answered)
+
+    @property
+    def throughput(self) -> List[Tuple[float, float]]:
+        """Completed operations per second over time, as (seconds since start, operations per second) for each interval."""
+        with self._lock:
+            completions = dict(self._completions)
+        if not completions:
+            return []
+        return [
+            (slot * self.interval, completions.get(slot, 0) / self.interval)
+            for slot in range(max(completions) + 1)
+        ]
+
+    def latency_percentiles(
+        self, percentiles: Tuple[float, ...] = (50, 95, 99)
+    ) -> Dict[str, float]:
+        """
+        Latency percentiles of the sent operations, in seconds, including retries.
+
+        :param percentiles: Percentiles to compute.
+        :return: Dict like {"p50": 0.01, "p95": 0.02, "p99": 0.05}. Empty if no operation was sent.
+        """
+        with self._lock:
+            buckets = sorted(self._latencies.items())
+        total = sum(count for _, count in buckets)
+        if total == 0:
+            return {}
+        result = {}
+        for percentile in percentiles:
+            rank = percentile / 100 * total
+            seen = 0
+            for bucket, count in buckets:
+                seen += count
+                if seen >= rank:
+                    break
+            result["p{:g}".format(percentile)] = self.LATENCY_BUCKET_GROWTH ** (
+                bucket + 1
+            )
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the statistics as a Dict, e.g. for logging as JSON."""
+        return {
+            "elapsed": self.elapsed,
+            "operations": self.operations,
+            "operations_per_second": self.operations_per_second,
+            "status_codes": dict(self.status_codes),
+            "requests": self.requests,
+            "retries": self.retries,
+            "latency": self.latency_percentiles(),
+            "bytes_raw": self.bytes_raw,
+            "bytes_sent": self.bytes_sent,
+            "peak_in_flight": self.peak_in_flight,
+            "throughput": self.throughput,
+        }
+
+    def __repr__(self) -> str:
+        return "FeedStats(operations={}, operations_per_second={:.1f}, status_codes={})".format(
+            self.operations, self.operations_per_second, self.status_codes
+        )
+
+
+class BulkOperationSummary(object):
+    def __init__(self, operation: str, selection: str, slices: int) -> None:
+        """
+        Progress and result of a selection-based bulk operation, returned by
+        :func:`vespa.application.Vespa.delete_where` and :func:`vespa.application.Vespa.delete_all_docs`,
+        and passed to their `progress` hook after each request.
+
+        Example usage::
+
+            summary = app.delete_where(content_cluster_name="content", schema="music", selection="music.year < 1990")
+            if not summary.succeeded:
+                print(summary.failed_slices)
+
+        :param operation: "delete" or "update".
+        :param selection: The document selection of the operation.
+        :param slices: Number of slices the operation runs in.
+        """
+        self.operation = operation
+        self.selection = selection
+        self.slices = slices
+        self.start_time = time.monotonic()
+        self.end_time: Optional[float] = None
+        #: Number of documents processed, as reported by Vespa.
+        self.documents = 0
+        #: Number of HTTP requests, including failed requests.
+        self.requests = 0
+        #: Number of documents processed by each slice.
+        self.slice_documents: Dict[int, int] = {}
+        #: Slices that completed.
+        self.completed_slices: List[int] = []
+        #: Error message of each slice that failed.
+        self.failed_slices: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def on_request(self) -> None:
+        """Record an HTTP request."""
+        with self._lock:
+            self.requests += 1
+
+    def on_page(self, slice_id: int, documents: int) -> None:
+        """Record that a request of a slice processed `documents` documents."""
+        with self._lock:
+            self.documents += documents
+            self.slice_documents[slice_id] = (
+                self.slice_documents.get(slice_id, 0) + documents
+            )
+
+    def on_slice_done(self, slice_id: int) -> None:
+        """Record that a slice completed."""
+        with self._lock:
+            self.completed_slices.append(slice_id)
+
+    def on_slice_failed(self, slice_id: int, error: str) -> None:
+        """Record that a slice gave up after an error."""
+        with self._lock:
+            self.failed_slices[slice_id] = error
+
+    def finish(self) -> None:
+        """Mark the operation as completed."""
+        self.end_time = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the start of the operation, or the duration of a completed operation."""
+        end_time = self.end_time if self.end_time is not None else time.monotonic()
+        return end_time - self.start_time
+
+    @property
+    def documents_per_second(self) -> float:
+        """Average number of processed documents per second."""
+        elapsed = self.elapsed
+        return self.documents / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def succeeded(self) -> bool:
+        """True if all slices completed."""
+        return not self.failed_slices and len(self.completed_slices) == self.slices
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the summary as a Dict, e.g. for logging as JSON."""
+        with self._lock:
+            return {
+                "operation": self.operation,
+                "selection": self.selection,
+                "elapsed": self.elapsed,
+                "documents": self.documents,
+                "documents_per_second": self.documents_per_second,
+                "requests": self.requests,
+                "slices": self.slices,
+                "completed_slices": sorted(self.completed_slices),
+                "failed_slices": dict(self.failed_slices),
+            }
+
+    def __repr__(self) -> str:
+        return "BulkOperationSummary(operation={}, documents={}, completed_slices={}/{}, failed_slices={})".format(
+            self.operation,
+            self.documents,
+            len(self.completed_slices),
+            self.slices,
+            len(self.failed_slices),
+        )
+
+
+_FEATURE_FIELDS = ("matchfeatures", "summaryfeatures")
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "numpy is required for columnar hit extraction. Install it with 'pip install numpy'."
+        )
+    return numpy
+
+
+def _tensor_values(value: Any) -> Optional[List]:
+    # Dense tensors are rendered in short form as {"type": ..., "values": [...]},
+    # possibly nested for tensors with more than one dimension.
+    if isinstance(value, dict) and isinstance(value.get("values"), list):
+        values = value["values"]
+        while values and isinstance(values[0], list):
+            values = [v for inner in values for v in inner]
+        return values
+    return None
+
+
+def hits_to_columns(
+    responses: Union[VespaQueryResponse, Iterable[VespaQueryResponse]],
+    fields: Optional[List[str]] = None,
+    meta_prefix: str = "",
+) -> Dict[str, Any]:
+    """
+    Convert the hits of one or more query responses to a columnar structure of NumPy arrays.
+
+    All hits are read in a single pass. The returned columns are:
+
+    - `query_index`: Index of the response the hit belongs to.
+    - `id` and `relevance` of each hit.
+    - One column per field in the hit `fields`. A field with the same name as one of the columns above raises a
+      ValueError, set `meta_prefix` to rename them. The entries of `matchfeatures` and `summaryfeatures` become one
+      column per feature. Features already seen in `matchfeatures` are not repeated from `summaryfeatures`.
+
+    Numeric columns are float64 arrays with NaN for missing values, or int64 if no value is missing. Dense tensors
+    with the same size in every hit, rendered in short form, become 2-D float64 arrays with one row per hit. Other values
+    become object arrays with None for missing values.
+
+    Example usage::
+
+        responses = [app.query(body=body) for body in bodies]
+        columns = hits_to_columns(responses)
+        X = np.column_stack([columns["bm25(title)"], columns["closeness(field,embedding)"]])
+        y = columns["relevance"]
+
+    :param responses: A query response, or an iterable of query responses.
+    :param fields: Names of the fields and features to extract. Default is all.
+    :param meta_prefix: Prefix of the `query_index`, `id` and `relevance` columns, e.g. "_" when the documents have
+        a field named `id`. Default is no prefix.
+    :return: Dict from column name to NumPy array, all with one entry per hit.
+    :raises ImportError: If numpy is not installed.
+    :raises ValueError: If a field or feature has the same name as a `query_index`, `id` or `relevance` column.
+    """
+    np = _import_numpy()
+    if isinstance(responses, VespaQueryResponse):
+        responses = [responses]
+    wanted = set(fields) if fields is not None else None
+
+    query_index_column: List = []
+    id_column: List = []
+    relevance_column: List = []
+    columns: Dict[str, List] = {
+        meta_prefix + "query_index": query_index_column,
+        meta_prefix + "id": id_column,
+        meta_prefix + "relevance": relevance_column,
+    }
+    meta_columns = set(columns)
+    num_hits = 0
+
+    def append(name: str, value: Any) -> None:
+        column = columns.get(name)
+        if column is None:
+            column = columns[name] = [None] * num_hits
+        elif name in meta_columns:
+            raise ValueError(
+                "Hit field '{}' has the same name as a meta column. Set meta_prefix, e.g. meta_prefix='_', "
+                "to rename the meta columns.".format(name)
+            )
+        if len(column) == num_hits:
+            column.append(value)
+
+    for query_index, response in enumerate(responses):
+        for hit in response.hits:
+            query_index_column.append(query_index)
+            id_column.append(hit.get("id"))
+            relevance_column.append(hit.get("relevance"))
+            for name, value in hit.get("fields", {}).items():
+                if name in _FEATURE_FIELDS and isinstance(value, dict):
+                    for feature, feature_value in value.items():
+                        if wanted is None or feature in wanted:
+                            append(feature, feature_value)
+                elif wanted is None or name in wanted:
+                    append(name, value)
+            num_hits += 1
+            for column in columns.values():
+                if len(column) < num_hits:
+                    column.append(None)
+
+    return {name: _to_array(np, values) for name, values in columns.items()}
+
+
+def _to_array(np, values: List) -> Any:
+    # Finds the type of the column in a single pass over the values: "int", "float",
+    # "tensor" for dense tensors of one size, else "object". None is a missing value.
+    kind = None
+    missing = False
+    tensors: List[Optional[List]] = []
+    size = None
+    for value in values:
+        if value is None:
+            missing = True
+            tensors.append(None)
+        elif isinstance(value, bool):
+            kind = "object"
+            break
+        elif isinstance(value, int) and kind in (None, "int", "float"):
+            kind = kind or "int"
+        elif isinstance(value, float) and kind in (None, "int", "float"):
+            kind = "float"
+        elif kind in (None, "tensor"):
+            tensor = _tensor_values(value)
+            if tensor is None or (size is not None and len(tensor) != size):
+                kind = "object"
+                break
+            kind = "tensor"
+            size = len(tensor)
+            tensors.append(tensor)
+        else:
+            kind = "object"
+            break
+    if kind == "int" and not missing:
+        return np.asarray(values, dtype=np.int64)
+    if kind in ("int", "float"):
+        # None becomes NaN
+        return np.asarray(values, dtype=np.float64)
+    if kind == "tensor":
+        matrix = np.full((len(values), size), np.nan, dtype=np.float64)
+        for i, tensor in enumerate(tensors):
+            if tensor is not None:
+                matrix[i] = tensor
+        return matrix
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "pyarrow is required for Arrow conversion. Install it with 'pip install pyarrow'."
+        )
+    return pyarrow
+
+
+def hits_to_arrow(
+    responses: Union[VespaQueryResponse, Iterable[VespaQueryResponse]],
+    fields: Optional[List[str]] = None,
+    meta_prefix: str = "",
+):
+    """
+    Convert the hits of one or more query responses to a `pyarrow.Table`.
+
+    The columns are the same as returned by :func:`hits_to_columns`. 2-D tensor columns become fixed size list columns.
+
+    :param responses: A query response, or an iterable of query responses.
+    :param fields: Names of the fields and features to extract. Default is all.
+    :param meta_prefix: Prefix of the `query_index`, `id` and `relevance` columns. Default is no prefix.
+    :return: pyarrow.Table with one row per hit.
+    :raises ImportError: If numpy or pyarrow is not installed.
+    """
+    pa = _import_pyarrow()
+    arrays = {}
+    for name, column in hits_to_columns(
+        responses, fields=fields, meta_prefix=meta_prefix
+    ).items():
+        if column.ndim == 2:
+            arrays[name] = pa.FixedSizeListArray.from_arrays(
+                pa.array(column.ravel()), column.shape[1]
+            )
+        elif column.dtype == object:
+            arrays[name] = pa.array(list(column))
+        else:
+            arrays[name] = pa.array(column)
+    return pa.table(arrays)
+
+
+_ARROW_PRIMITIVE_TYPES = {
+    "string": "string",
+    "uri": "string",
+    "raw": "string",
+    "bool": "bool_",
+    "byte": "int8",
+    "int": "int32",
+    "long": "int64",
+    "float": "float32",
+    "double": "float64",
+}
+_ARROW_TENSOR_CELL_TYPES = {
+    "float": "float32",
+    "double": "float64",
+    "bfloat16": "float32",
+    "int8": "int8",
+}
+_DENSE_TENSOR_TYPE = re.compile(r"^tensor(?:<(\w+)>)?\(\w+\[(\d+)\]\)$")
+_COLLECTION_TYPE = re.compile(r"^(array|weightedset|map)<(.+)>$")
+
+
+def _split_type_arguments(arguments: str) -> List[str]:
+    # Splits "string,array<int>" at top level commas
+    depth, start, parts = 0, 0, []
+    for i, char in enumerate(arguments):
+        if char in "<(":
+            depth += 1
+        elif char in ">)":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(arguments[start:i])
+            start = i + 1
+    parts.append(arguments[start:])
+    return parts
+
+
+def _arrow_field_type(pa, vespa_type: str) -> Any:
+    # Arrow type of a Vespa field type, or None for types that are stored as JSON strings
+    vespa_type = vespa_type.replace(" ", "")
+    if vespa_type in _ARROW_PRIMITIVE_TYPES:
+        return getattr(pa, _ARROW_PRIMITIVE_TYPES[vespa_type])()
+    dense_tensor = _DENSE_TENSOR_TYPE.match(vespa_type)
+    if dense_tensor:
+        cell_type = _ARROW_TENSOR_CELL_TYPES.get(dense_tensor.group(1) or "double")
+        if cell_type is not None:
+            return pa.list_(getattr(pa, cell_type)(), int(dense_tensor.group(2)))
+    collection = _COLLECTION_TYPE.match(vespa_type)
+    if collection:
+        kind = collection.group(1)
+        arguments = _split_type_arguments(collection.group(2))
+        types = [_arrow_field_type(pa, argument) for argument in arguments]
+        # Nested types are converted as is, so only allow primitive items
+        if all(t is not None and not pa.types.is_nested(t) for t in types):
+            if kind == "array" and len(types) == 1:
+                return pa.list_(types[0])
+            if kind == "weightedset" and len(types) == 1:
+                return pa.map_(types[0], pa.int32())
+            if kind == "map" and len(types) == 2:
+                return pa.map_(types[0], types[1])
+    return None
+
+
+def vespa_schema_to_arrow(schema: Any, fields: Optional[List[str]] = None):
+    """
+    Arrow schema for the documents of a Vespa schema, as returned by :func:`documents_to_record_batches`.
+
+    The first column is the document 'id', followed by the document fields. Primitive types, arrays, weighted sets,
+    maps and dense tensors with one indexed dimension get native Arrow types. Other fields, like structs, positions and
+    other tensors, are stored as JSON-encoded strings.
+
+    Example usage::
+
+        arrow_schema = vespa_schema_to_arrow(app_package.get_schema("music"), fields=["title", "year"])
+
+    :param schema: A :class:`vespa.package.Schema`.
+    :param fields: Names of the document fields to include. Default is all.
+    :return: pyarrow.Schema
+    :raises ImportError: If pyarrow is not installed.
+    """
+    pa = _import_pyarrow()
+    arrow_fields = [pa.field("id", pa.string())]
+    document_fields = {field.name: field for field in schema.document.fields}
+    for name in fields if fields is not None else list(document_fields):
+        if name not in document_fields:
+            raise ValueError(
+                "Field {} is not a document field of schema {}.".format(
+                    name, schema.name
+                )
+            )
+        arrow_type = _arrow_field_type(pa, document_fields[name].type)
+        if arrow_type is None:
+            arrow_fields.append(
+                pa.field(name, pa.string(), metadata={"vespa.json": "true"})
+            )
+        else:
+            arrow_fields.append(pa.field(name, arrow_type))
+    return pa.schema(arrow_fields)
+
+
+def documents_to_record_batches(
+    documents: Iterable[Dict[str, Any]],
+    schema: Any = None,
+    batch_size: int = 10000,
+) -> Generator[Any, None, None]:
+    """
+    Convert visited documents to `pyarrow.RecordBatch`es of at most `batch_size` rows, reading `documents` lazily.
+
+    Only one batch of documents is held in memory, so the memory usage does not depend on the number of documents.
+
+    :param documents: Documents as returned by :func:`vespa.application.Vespa.visit_documents`, Dicts with 'id' and 'fields'.
+    :param schema: A `pyarrow.Schema` from :func:`vespa_schema_to_arrow`. Default is None, which infers the schema from
+        the first batch, and uses it for all batches. Fields that are not in the first batch are then dropped.
+    :param batch_size: Maximum number of rows in each batch.
+    :return: Generator of pyarrow.RecordBatch.
+    :raises ImportError: If pyarrow is not installed.
+    """
+    pa = _import_pyarrow()
+    converters = None
+    if schema is not None:
+        converters = _record_batch_converters(pa, schema)
+    rows: List[Dict[str, Any]] = []
+
+    def batch():
+        nonlocal schema, converters
+        if schema is None:
+            # The first batch determines the schema of the following batches
+            record_batch = pa.RecordBatch.from_pylist(rows)
+            schema = record_batch.schema
+            converters = {name: (lambda v: v) for name in schema.names}
+            return record_batch
+        columns = {
+            name: [convert(row.get(name)) for row in rows]
+            for name, convert in converters.items()
+        }
+        return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+    for document in documents:
+        rows.append({"id": document.get("id"), **document.get("fields", {})})
+        if len(rows) >= batch_size:
+            yield batch()
+            rows = []
+    if rows:
+        yield batch()
+
+
+def _record_batch_converters(pa, schema: Any) -> Dict[str, Callable[[Any], Any]]:
+    # Converts values in the JSON document format to the types of the Arrow schema
+    converters = {}
+    for field in schema:
+        if field.metadata and field.metadata.get(b"vespa.json") == b"true":
+            converters[field.name] = lambda v: None if v is None else json.dumps(v)
+        elif pa.types.is_fixed_size_list(field.type):
+            converters[field.name] = lambda v: (
+                v if v is None or isinstance(v, list) else _tensor_values(v)
+            )
+        elif pa.types.is_map(field.type):
+            converters[field.name] = lambda v: None if v is None else list(v.items())
+        else:
+            converters[field.name] = lambda v: v
+    return converters
+
+
+# Compression codecs supported by each format of write_documents
+_WRITE_COMPRESSION = {
+    "parquet": ("none", "snappy", "gzip", "brotli", "lz4", "zstd"),
+    "arrow": ("lz4", "zstd"),
+}
+
+
+def write_documents(
+    documents: Iterable[Dict[str, Any]],
+    path: str,
+    schema: Any = None,
+    format: str = "parquet",
+    row_group_size: int = 10000,
+    compression: Optional[str] = "zstd",
+) -> int:
+    """
+    Write visited documents to a Parquet or Arrow IPC file, one row group or record batch of `row_group_size` rows at a time.
+
+    Example usage::
+
+        documents = app.visit_documents(content_cluster_name="content", schema="music", slices=8)
+        write_documents(documents, "music.parquet", schema=vespa_schema_to_arrow(app_package.get_schema("music")))
+
+    :param documents: Documents as returned by :func:`vespa.application.Vespa.visit_documents`, Dicts with 'id' and 'fields'.
+    :param path: Path of the file to write.
+    :param schema: A `pyarrow.Schema` from :func:`vespa_schema_to_arrow`. Default is None, which infers the schema from the
+        first row group. Without documents, a file with this schema and no rows is written, or with an empty schema if None.
+    :param format: "parquet" or "arrow" (Arrow IPC file format).
+    :param row_group_size: Number of rows in each row group or record batch.
+    :param compression: Compression codec. "zstd", "lz4" or None for both formats, and also "snappy", "gzip" or "brotli"
+        for "parquet". Default is "zstd".
+    :return: The number of documents written.
+    :raises ValueError: If `format` is unknown, or `compression` is not supported by `format`.
+    :raises ImportError: If pyarrow is not installed.
+    """
+    if format not in _WRITE_COMPRESSION:
+        raise ValueError(
+            "format must be 'parquet' or 'arrow'. Got {} instead.".format(format)
+        )
+    if compression is not None and (
+        not isinstance(compression, str)
+        or compression.lower() not in _WRITE_COMPRESSION[format]
+    ):
+        raise ValueError(
+            "compression must be one of {} or None for format '{}'. Got {} instead.".format(
+                ", ".join(_WRITE_COMPRESSION[format]), format, compression
+            )
+        )
+    pa = _import_pyarrow()
+    writer = None
+
+    def open_writer(arrow_schema):
+        if format == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.ParquetWriter(path, arrow_schema, compression=compression)
+        return pa.ipc.new_file(
+            path,
+            arrow_schema,
+            options=pa.ipc.IpcWriteOptions(compression=compression),
+        )
+
+    rows = 0
+    try:
+        for record_batch in documents_to_record_batches(
+            documents, schema=schema, batch_size=row_group_size
+        ):
+            if writer is None:
+                writer = open_writer(record_batch.schema)
+            if format == "parquet":
+                writer.write_batch(record_batch, row_group_size=row_group_size)
+            else:
+                writer.write_batch(record_batch)
+            rows += record_batch.num_rows
+        if writer is None:
+            # No documents, write an empty file with the schema
+            writer = open_writer(schema if schema is not None else pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows